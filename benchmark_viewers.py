@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Measure the detection frame rate while an increasing number of MJPEG viewers are connected.
+
+Start the server and a detection run first, then e.g.:
+    python benchmark_viewers.py --url http://localhost:8000 --viewers 0,1,2,4,8,16 --duration 20
+Run it once with the default separate pipeline process and once with PIPELINE_PROCESS=0
+to compare both process models.
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+
+
+class Viewer(threading.Thread):
+    """Reads the MJPEG stream as fast as it arrives and counts the received frames."""
+
+    def __init__(self, url):
+        super().__init__(daemon=True)
+        self.url = url
+        self.frames = 0
+        self.running = True
+
+    def run(self):
+        try:
+            with urllib.request.urlopen(self.url + "/api/video_stream", timeout=10) as stream:
+                while self.running:
+                    chunk = stream.read(65536)
+                    if not chunk:
+                        break
+                    self.frames += chunk.count(b"--frame\r\n")
+        except Exception as e:
+            print(f"Viewer error: {e}")
+
+
+def get_status(url):
+    with urllib.request.urlopen(url + "/api/status", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def measure(url, viewers, duration, warmup):
+    """
+    Connect `viewers` stream clients and sample the detection FPS once per second.
+
+    Returns:
+        dict: Viewer count, detection FPS mean/min/stdev and the mean stream FPS per viewer.
+    """
+    clients = [Viewer(url) for _ in range(viewers)]
+    for client in clients:
+        client.start()
+    time.sleep(warmup)
+
+    start_frames = [client.frames for client in clients]
+    samples = []
+    start = time.time()
+    while time.time() - start < duration:
+        time.sleep(1.0)
+        samples.append(get_status(url)["fps"])
+    elapsed = time.time() - start
+    stream_fps = [(client.frames - before) / elapsed for client, before in zip(clients, start_frames)]
+
+    for client in clients:
+        client.running = False
+    return {
+        "viewers": viewers,
+        "detection_fps": round(statistics.mean(samples), 2),
+        "detection_fps_min": round(min(samples), 2),
+        "detection_fps_stdev": round(statistics.pstdev(samples), 2),
+        "stream_fps_per_viewer": round(statistics.mean(stream_fps), 2) if stream_fps else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    parser.add_argument("--viewers", default="0,1,2,4,8,16", help="Comma-separated viewer counts to measure")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds measured per viewer count")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds to wait after connecting the viewers")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    status = get_status(args.url)
+    if not status.get("running"):
+        parser.error("detection is not running, start it first (POST /api/start)")
+    process = status.get("process")
+    print(f"Pipeline process: {'pid ' + str(process['pid']) if process else 'in-process'}")
+
+    results = []
+    print(f"{'viewers':>8} {'det fps':>8} {'min':>7} {'stdev':>6} {'stream fps':>11}")
+    for viewers in (int(v) for v in args.viewers.split(",") if v.strip()):
+        result = measure(args.url, viewers, args.duration, args.warmup)
+        results.append(result)
+        print(f"{result['viewers']:>8} {result['detection_fps']:>8} {result['detection_fps_min']:>7} "
+              f"{result['detection_fps_stdev']:>6} {str(result['stream_fps_per_viewer']):>11}")
+        # Let the closed connections drain before the next step
+        time.sleep(2.0)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"process": process, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
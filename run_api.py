@@ -13,13 +13,17 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 def main():
     """Main function to run the API server."""
-    from src.api_server import app
+    from src.api_server import app, socketio, start_pipeline_process
     print("Starting YOLOv11-Speed API server...")
+
+    # The detection pipeline runs in its own process unless PIPELINE_PROCESS=0
+    if os.environ.get("PIPELINE_PROCESS", "1") != "0":
+        start_pipeline_process()
     print("Access the web interface at: http://localhost:8000/")
     print("API endpoints available at: http://localhost:8000/api/")
     
-    # Start the API server
-    app.run(host='0.0.0.0', port=8000, debug=False, threaded=True)
+    # Start the API server (Socket.IO wraps the Flask app for the metadata channel)
+    socketio.run(app, host='0.0.0.0', port=8000, debug=False, allow_unsafe_werkzeug=True)
 
 if __name__ == "__main__":
     main()
@@ -3,7 +3,9 @@
 REST API server for YOLOv11 object detection with tracking and speed estimation.
 Provides endpoints for controlling detection parameters and streaming video.
 """
+import copy
 import json
+import math
 import threading
 import time
 import queue
@@ -11,15 +13,14 @@ import os
 import sys
 from flask import Flask, jsonify, request, Response, send_from_directory
 from flask_cors import CORS
+from flask_socketio import SocketIO
 import cv2
 import numpy as np
 
 # Add src to path for importing modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
-# Global variables to manage the detection process
-is_running = False
-stop_event = threading.Event()  # Event to signal stop
+# Configuration of the default stream; other streams start from a copy of the defaults
 current_config = {
     "video_source": "camera",           # "camera" or video file path
     "confidence_threshold": 0.5,       # 0.0 to 1.0 (can be updated while running)
@@ -28,43 +29,226 @@ current_config = {
     "enable_speed_estimation": True,     # requires restart
     "target_labels": ["person", "car"], # requires restart
     "enable_loitering_detection": False, # can be updated in real-time
-    "loitering_threshold": 10.0         # seconds, can be updated in real-time
+    "loitering_threshold": 10.0,        # seconds, can be updated in real-time
+    "counting_lines": [],               # [{"name": str, "points": [[x1, y1], [x2, y2]]}], can be updated in real-time
+    "lanes": [],                        # [{"name": str, "polygon": [[x, y], ...]}], can be updated in real-time
+    "track_summary_path": None,         # JSON Lines file receiving finished track summaries, requires restart
+    "overlay_mode": "server",           # "server" draws overlays into the stream, "client" leaves them to the browser
+    "stream_scale": 1.0,                # downscale factor of the stream in client overlay mode (0.1 to 1.0)
+    "headless": False,                  # metadata only: no rendering, frame copies or encoding, requires restart
+    "results_path": None,               # JSON Lines file receiving per-frame results and events, requires restart
+    "queue_mode": "auto",               # "live", "offline" or "auto" (live for the camera), requires restart
+    "queue_policies": {},               # per-queue overrides of QUEUE_PRESETS, e.g. {"output": {"maxsize": 2}}, requires restart
+    "postprocess_workers": None,        # decode/render worker threads, None for one per core (up to 4), requires restart
+    "shm_ring": None,                   # shared memory name receiving annotated frames and metadata for local readers, requires restart
+    "inference_weight": 1.0,            # share of the accelerator relative to streams of the same priority, can be updated in real-time
+    "inference_priority": 0,            # 0 to 31, streams with a higher priority are served first, can be updated in real-time
+    "target_fps": None,                 # maximum inference rate of the stream, None for no limit, can be updated in real-time
+    "inference_policy": "auto",         # "drop" or "defer" frames under overload, "auto" follows the queue mode, can be updated in real-time
+    "mosaic_group": None,               # name of a group of streams whose frames are tiled into one model input, requires restart
+    "mosaic_grid": 2                    # tiles per row and per column of the mosaic group (2 to 4), requires restart
 }
 
-# Video frame queue for streaming (increased size to reduce flickering)
-frame_queue = queue.Queue(maxsize=30)
-last_config_update = time.time()
+# Inter-stage queue settings: live sources drop frames to keep latency bounded, offline
+# sources (video files, images) apply lossless backpressure to the capture loop
+QUEUE_PRESETS = {
+    "live": {
+        "input": {"maxsize": 2, "policy": "drop_oldest", "max_age_ms": 200},
+        "output": {"maxsize": 4, "policy": "drop_oldest", "max_age_ms": 300}
+    },
+    "offline": {
+        "input": {"maxsize": 8, "policy": "block", "max_age_ms": None},
+        "output": {"maxsize": 8, "policy": "block", "max_age_ms": None}
+    }
+}
 
-# Configuration locks for thread safety
-config_lock = threading.Lock()
+# Frame hub broadcasting the annotated stream: frames are published once, encoded once
+# and every viewer reads the latest JPEG without consuming it for the others
+from utils.frame_hub import FrameHub
+from utils.pipeline_metrics import PipelineMetrics
+# Per-stage latency histograms, frame/drop counters and queue depths, exported on /metrics
+pipeline_metrics = PipelineMetrics()
+# Per-frame traces (capture to encode) for glass-to-glass latency and on-demand Chrome trace recording
+from utils.frame_trace import FrameTracer
+frame_tracer = FrameTracer()
+frame_hub = FrameHub(jpeg_quality=70, metrics=pipeline_metrics, tracer=frame_tracer)
+# On-demand sampling profiler over all threads (pipeline stages, encoder, stream generators)
+from utils.sampling_profiler import SamplingProfiler
+sampling_profiler = SamplingProfiler()
+# Sizes of long-lived pipeline structures and tracemalloc snapshot diffs, for finding slow leaks
+from utils.memory_introspection import MemoryInspector
+memory_inspector = MemoryInspector()
+frame_hub.start()
+# Seconds between re-sends of the cached JPEG when no new frame arrives (keeps idle connections alive)
+STREAM_KEEPALIVE_INTERVAL = 2.0
+
+# Finished track summaries, kept across pipeline restarts
+from track_summary import MemorySummarySink
+track_summary_sink = MemorySummarySink(maxlen=1000)
+
+# Rolling counts/speeds time series, bounded in memory and kept across pipeline restarts
+from time_series import TimeSeriesStore
+time_series_store = TimeSeriesStore()
 
 app = Flask(__name__, static_folder='../frontend')
 CORS(app)  # Enable CORS for cross-origin requests
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+
+# Push channel for per-frame detection/track metadata and events (line crossings, finished tracks)
+from metadata_channel import MetadataHub
+metadata_hub = MetadataHub(socketio)
+
+from utils.frame_queue import QUEUE_POLICIES
+
+# Detection streams (cameras or videos), each with its own pipeline, tracker, analytics, config and
+# outputs. The default stream owns the hubs above and backs the endpoints without a stream id; the
+# others are added through /api/streams and served under /api/streams/<id>/...
+from stream_registry import DEFAULT_STREAM, DetectionStream, StreamRegistry
+STREAM_CONFIG_DEFAULTS = copy.deepcopy(current_config)
+MAX_STREAMS = 4
+default_stream = DetectionStream(DEFAULT_STREAM, current_config, frame_hub, metadata_hub, track_summary_sink,
+                                 time_series_store)
+# Socket.IO client sid -> metadata hub of the stream it receives
+client_hubs = {}
+
+# One model shared by the pipelines of all streams: opened by the first running stream, closed
+# with the last one, so the accelerator is configured once for any number of streams. Jobs are
+# dispatched by weight, priority and target FPS of their stream (see configure_stream_inference)
+from utils.inference_backend import InferenceScheduler
 
-def create_detection_pipeline(config):
-    """Create a detection pipeline that can handle real-time configuration updates."""
-    global is_running, stop_event
+
+def open_inference_model():
+    """Initialize Hailo inference (imported here, the web process of a pipeline process doesn't need it)."""
+    from utils.hailo_inference import HailoInfer
+    return HailoInfer("src/models/yolov11n.hef", 1)
+
+
+inference_backend = InferenceScheduler(open_inference_model)
+
+
+def frame_captured_at(item):
+    """Capture time of a captured (frame, trace) item, if it is traced."""
+    return item[1].captured_at if item[1] is not None else None
+
+
+def result_captured_at(item):
+    """Capture time of an inference result's frame, if it is traced."""
+    return item[2].captured_at if item[2] is not None else None
+
+# Stage heartbeats, stall and queue backlog alarms with recovery actions; events also go to metadata clients
+from utils.pipeline_watchdog import PipelineWatchdog
+pipeline_watchdog = PipelineWatchdog(sinks=[metadata_hub.publish_event])
+pipeline_watchdog.start()
+# Seconds without a heartbeat before a stage counts as stalled
+WATCHDOG_STALL_SECONDS = 5.0
+
+# Separate pipeline process (see start_pipeline_process). In the web process `pipeline_process`
+# forwards the API and reads the frame rings; in the pipeline process `process_link` carries
+# replies and events back and the publish stage writes into `frame_ring` (the default stream's,
+# other streams get their own ring, announced to the web process when it is created)
+pipeline_process = None
+process_link = None
+frame_ring = None
+# Slots and capacities of the frame ring between the processes; larger frames are downscaled to fit
+FRAME_RING_SLOTS = 4
+FRAME_RING_FRAME_BYTES = 1920 * 1080 * 3
+FRAME_RING_METADATA_BYTES = 256 * 1024
+# Named rings of annotated frames and metadata for other local processes (the shm_ring option of each
+# stream) are kept across pipeline runs so readers stay attached, and owned by the process running the pipeline
+# Endpoints the web process serves itself; all other requests are forwarded to the pipeline process
+LOCAL_ENDPOINTS = {"index", "static", "video_stream", "snapshot", "upload_video", "health_check"}
+# Response headers passed back with forwarded requests
+FORWARDED_HEADERS = ("Content-Disposition", "Cache-Control", "X-Frame-Sequence")
+# Seconds to wait for a forwarded request, covering the longest blocking endpoint (/api/profile, 120 s)
+PROCESS_REQUEST_TIMEOUT = 150.0
+
+
+def register_stream_memory(stream, register=True):
+    """Report (or stop reporting) the long-lived structures of a stream in /api/memory."""
+    probes = {
+        "frame_hub": stream.frame_hub.get_memory_stats,
+        "track_summaries": lambda: {"records": len(stream.track_summary_sink.records)},
+        "time_series": stream.time_series_store.get_memory_stats,
+        "metadata_clients": lambda: {
+            "clients": len(stream.metadata_hub.clients),
+            "pending_events": sum(len(c.pending_events) for c in list(stream.metadata_hub.clients.values()))
+        }
+    }
+    if not register:
+        # Also the probes of the stream's last pipeline (tracker, queues, ...)
+        prefix = stream.qualify("")
+        probes = {name[len(prefix):]: None for name in list(memory_inspector.probes) if name.startswith(prefix)}
+    for name, probe in probes.items():
+        memory_inspector.register(stream.qualify(name), probe if register else None)
+
+
+def create_stream(stream_id, config):
+    """Create a stream with its own stream hub, metadata hub, track summaries and time series."""
+    hub = FrameHub(jpeg_quality=70, metrics=pipeline_metrics, tracer=frame_tracer)
+    if process_link is None:
+        # In the pipeline process the web process encodes the stream
+        hub.start()
+    stream_metadata_hub = MetadataHub(socketio, labels=metadata_hub.labels)
+    stream = DetectionStream(stream_id, dict(copy.deepcopy(STREAM_CONFIG_DEFAULTS), **config), hub,
+                             stream_metadata_hub, MemorySummarySink(maxlen=1000), TimeSeriesStore())
+    register_stream_memory(stream)
+    return stream
+
+
+stream_registry = StreamRegistry(create_stream, default_stream, max_streams=MAX_STREAMS)
+register_stream_memory(default_stream)
+
+
+def create_detection_pipeline(stream):
+    """Run the detection pipeline of a stream; it handles real-time updates of the stream's configuration."""
     from utils.toolbox import get_labels, load_json_file
     from functools import partial
     from types import SimpleNamespace
-    import queue as q
     import threading
     from tracker.byte_tracker import BYTETracker
-    from utils.hailo_inference import HailoInfer
-    from utils.toolbox import init_input_source, preprocess, visualize, FrameRateTracker
-    from object_detection_post_process import inference_result_handler
+    from utils.toolbox import init_input_source, default_preprocess, validate_images, FrameRateTracker
+    from utils.mosaic import tile_size
+    from utils.pipeline_engine import Pipeline
+    from object_detection_post_process import inference_result_handler, extract_detections, render_overlays
+    from object_detection_post_process import record_render_time
     from speed_estimation import SpeedEstimationManager
-
+    from line_crossing import LineCrossingManager
+    from lane_statistics import LaneStatisticsManager
+    from occupancy_heatmap import OccupancyHeatmapManager
+    from track_summary import TrackSummaryManager, JsonLinesSummarySink
+    from overlay_renderer import OverlayRenderer
+    from metadata_channel import JsonLinesMetadataSink, MetadataFanout, FrameMetadataBuffer
+
+    config = stream.config
     # Convert pixel distance from mm to m for the detection pipeline
     pixel_distance_m = config["pixel_distance_mm"] / 1000.0
 
     # Initialize cap variable to avoid UnboundLocalError in finally block
     cap = None
+    summary_manager = None
+    summary_file_sink = None
+    results_sink = None
+    tracker = None
+    pipeline = None
+    inference = None
+    inference_lock = threading.Lock()
+    # Scopes the stream's scheduler registration to this run, so a late cleanup can't remove a newer run's
+    run_token = object()
+
+    def release_inference():
+        """Release the shared model once, from the end of the inference stage or on an early exit."""
+        nonlocal inference
+        with inference_lock:
+            acquired, inference = inference, None
+        if acquired is not None:
+            acquired.remove_stream(stream.id, owner=run_token)
+            acquired.release()
 
     try:
         # Get labels
         labels_path = "src/config/coco.txt"
         labels = get_labels(labels_path)
+        stream.metadata_hub.set_labels(labels)
 
         # Load base config
         config_path = "src/config/config.json"
@@ -84,10 +268,24 @@ def create_detection_pipeline(config):
         if config["enable_tracking"]:
             tracker_config = base_config_data.get("visualization_params", {}).get("tracker", {})
             tracker = BYTETracker(SimpleNamespace(**tracker_config))
+            # Track ids are allocated per stream and continue from the previous run
+            tracker.track_count = stream.track_count
 
         fps_tracker = FrameRateTracker()
-        input_queue = q.Queue()
-        output_queue = q.Queue()
+
+        # Bounded input/output channels of the inference stage; frames are aged by their capture time
+        queue_mode = config.get("queue_mode", "auto")
+        if queue_mode not in QUEUE_PRESETS:
+            queue_mode = "live" if video_source == "camera" else "offline"
+        queue_settings = {
+            name: dict(settings, **(config.get("queue_policies") or {}).get(name, {}))
+            for name, settings in QUEUE_PRESETS[queue_mode].items()
+        }
+
+        # The capture source reopens the video source at its next failed read when the watchdog
+        # flags it as stalled (a blocked read can't be interrupted safely)
+        capture_reopen = threading.Event()
+        pipeline_watchdog.add_stage(stream.qualify("capture"), WATCHDOG_STALL_SECONDS, on_stall=lambda stage: capture_reopen.set())
 
         # Initialize speed estimation if needed
         speed_manager = None
@@ -106,34 +304,119 @@ def create_detection_pipeline(config):
         loitering_manager = LoiteringDetectionManager(loitering_threshold=config.get("loitering_threshold", 10.0),
                                                        fps=fps_for_loitering)
 
-        # Create a callback that can access the global config for real-time updates
-        def post_process_callback_with_realtime_config(original_frame, infer_results):
-            # Check if stop was requested
-            if stop_event.is_set():
-                return original_frame  # Return original frame if stopping
+        # Structured per-frame results go to the Socket.IO channel and, if configured, a JSON Lines file
+        headless = config.get("headless", False)
+        metadata_publishers = [stream.metadata_hub]
+        if config.get("results_path"):
+            results_sink = JsonLinesMetadataSink(config["results_path"], labels=labels)
+            metadata_publishers.append(results_sink)
+        # Raw frames and their metadata are handed over through shared memory: to the web process when
+        # running as the pipeline process, and to local consumers if a shared ring is configured
+        process_ring = open_process_frame_ring(stream)
+        shared_ring = open_shared_frame_ring(stream, config.get("shm_ring"))
+        frame_rings = [ring for ring in (process_ring, shared_ring) if ring is not None]
+        frame_metadata = None
+        if frame_rings:
+            # Metadata waits for its frame; events go straight to the web process over the pipe,
+            # tagged with the stream whose clients receive them
+            frame_metadata = FrameMetadataBuffer(on_event=(
+                lambda event: process_link.publish_event(dict(event, stream=stream.id))
+            ) if process_link else None)
+            metadata_publishers.append(frame_metadata)
+        metadata_publisher = MetadataFanout(metadata_publishers)
+
+        # Line crossing counts, lane statistics and heatmaps are fed by tracker footpoints
+        line_counter = None
+        lane_manager = None
+        heatmap = None
+        if config["enable_tracking"]:
+            line_counter = LineCrossingManager(lines=config.get("counting_lines", []))
+            lane_manager = LaneStatisticsManager(lanes=config.get("lanes", []))
+            heatmap = OccupancyHeatmapManager()
+
+            # Emit a per-track summary whenever the tracker removes a track
+            summary_sinks = [stream.track_summary_sink, metadata_publisher]
+            if config.get("track_summary_path"):
+                summary_file_sink = JsonLinesSummarySink(config["track_summary_path"])
+                summary_sinks.append(summary_file_sink)
+            summary_manager = TrackSummaryManager(sinks=summary_sinks)
+            tracker.on_track_removed = summary_manager.on_track_removed
+        stream.line_crossing_manager = line_counter
+        stream.lane_statistics_manager = lane_manager
+        stream.heatmap_manager = heatmap
+
+        # Post-processing is split so that only the tracker-dependent part is sequential: detections
+        # are decoded and overlays rendered by a pool of workers, with the frame order restored
+        # before tracking and before publishing
+        postprocess_workers = max(1, int(config.get("postprocess_workers") or min(4, os.cpu_count() or 1)))
+        # Glyph sprites and static line/lane layers are cached across frames, by one renderer per
+        # render worker since the caches aren't thread-safe
+        render_local = threading.local()
+        overlay_renderers = []
+
+        # Per-track state of this pipeline, reported by /api/memory under the stream's names
+        memory_inspector.register(stream.qualify("tracker"), tracker.get_memory_stats if tracker else None)
+        memory_inspector.register(stream.qualify("speed_estimation"),
+                                  speed_manager.get_memory_stats if speed_manager else None)
+        memory_inspector.register(stream.qualify("loitering"), loitering_manager.get_memory_stats)
+        memory_inspector.register(stream.qualify("overlay_renderer"), lambda: {
+            "renderers": [renderer.get_memory_stats() for renderer in list(overlay_renderers)]
+        })
+        memory_inspector.register(stream.qualify("line_crossing"), (lambda: {
+            "counted_pairs": len(line_counter.counted), "events": len(line_counter.events)
+        }) if line_counter else None)
+        memory_inspector.register(stream.qualify("heatmap"), (lambda: {
+            "layers": len(heatmap.layers), "layer_bytes": sum(g.nbytes for g in list(heatmap.layers.values()))
+        }) if heatmap else None)
+        memory_inspector.register(stream.qualify("track_summary_manager"), (lambda: {
+            "open_summaries": len(summary_manager.summaries)
+        }) if summary_manager else None)
+
+        def decode_frame(item, emit):
+            """Decode the raw model outputs of a frame (stateless, runs on several workers)."""
+            original_frame, infer_results, frame_trace = item
+            with stream.config_lock:
+                current_confidence = config["confidence_threshold"]
+                current_target_labels = config.get("target_labels", ["person", "car"])
+
+            # Update config data with current confidence
+            config_data = base_config_data.copy()
+            config_data["visualization_params"] = dict(config_data.get("visualization_params", {}),
+                                                       score_thres=current_confidence)
+            detections = extract_detections(original_frame, infer_results, config_data, labels, current_target_labels)
+            emit((original_frame, detections, frame_trace))
+
+        def track_frame(item, emit):
+            """Track, estimate speeds, update the analytics and publish the metadata, in frame order."""
+            original_frame, detections, frame_trace = item
 
             # Get current config values for this processing
-            with config_lock:
-                current_confidence = current_config["confidence_threshold"]
-                current_pixel_distance = current_config["pixel_distance_mm"] / 1000.0  # Convert to meters
-                current_target_labels = current_config.get("target_labels", ["person", "car"])
-                current_loitering_threshold = current_config.get("loitering_threshold", 10.0)
-                current_loitering_enabled = current_config.get("enable_loitering_detection", False)
+            with stream.config_lock:
+                current_pixel_distance = config["pixel_distance_mm"] / 1000.0  # Convert to meters
+                current_target_labels = config.get("target_labels", ["person", "car"])
+                current_loitering_threshold = config.get("loitering_threshold", 10.0)
+                current_loitering_enabled = config.get("enable_loitering_detection", False)
+                current_counting_lines = config.get("counting_lines", [])
+                current_lanes = config.get("lanes", [])
+                current_overlay_mode = config.get("overlay_mode", "server")
+
+            # Rebuild the counting lines if they were replaced through the config endpoint
+            if line_counter is not None and current_counting_lines is not line_counter.lines_config:
+                line_counter.set_lines(current_counting_lines)
+            if lane_manager is not None and current_lanes is not lane_manager.lanes_config:
+                lane_manager.set_lanes(current_lanes)
 
             # Update loitering manager threshold if changed
             fps_for_update = speed_manager.fps if speed_manager else 30.0
             loitering_manager.fps = fps_for_update  # Update the FPS used by the loitering manager
             loitering_manager.loitering_threshold = current_loitering_threshold  # This will automatically update frame_threshold
 
-            # Update config data with current confidence
-            config_data = base_config_data.copy()
-            if "visualization_params" not in config_data:
-                config_data["visualization_params"] = {}
-            config_data["visualization_params"]["score_thres"] = current_confidence
-
-            # Process the frame with the actual detection pipeline
-            processed_frame = inference_result_handler(
-                original_frame, infer_results, labels, config_data,
+            # Overlays are only collected here and drawn by the render workers
+            render = not headless and current_overlay_mode != "client"
+            overlay_items = ([], [], [], [], []) if render else None
+            cpu_start = time.thread_time()
+            inference_result_handler(
+                original_frame, None, labels, base_config_data,
                 tracker=tracker, camera_width=640, camera_height=480,
                 pixel_distance=current_pixel_distance,  # Use current pixel distance
                 speed_estimation=config["enable_speed_estimation"],
@@ -142,228 +425,234 @@ def create_detection_pipeline(config):
                 loitering_detection=current_loitering_enabled,
                 loitering_manager=loitering_manager,
                 loitering_threshold=current_loitering_threshold,
-                enable_person_only=False  # Loitering detection is now handled specifically for person labels in the post-processing logic
+                enable_person_only=False,  # Loitering detection is now handled specifically for person labels in the post-processing logic
+                line_counter=line_counter,
+                lane_manager=lane_manager,
+                heatmap_manager=heatmap,
+                summary_manager=summary_manager,
+                time_series=stream.time_series_store,
+                metadata_publisher=metadata_publisher,
+                render=render,
+                detections=detections,
+                overlay_items=overlay_items
             )
-
-            # Put the processed frame in our queue for streaming
+            cpu_ms = (time.thread_time() - cpu_start) * 1000.0
+            fps_tracker.increment()
+            stream.stats["frames"] += 1
+
+            # Tagged with the sequence number its metadata was just published under.
+            # Headless: results were already emitted, the frame is never copied or encoded
+            mode = "headless" if headless else ("server" if render else "client")
+            emit((None if headless else original_frame, overlay_items, mode, cpu_ms, stream.metadata_hub.seq,
+                  frame_trace))
+
+        def render_frame(item, emit):
+            """Draw the collected overlays and scale the frame for the stream (runs on several workers)."""
+            frame, overlay_items, mode, cpu_ms, seq, frame_trace = item
+            cpu_start = time.thread_time()
+            if overlay_items is not None:
+                renderer = getattr(render_local, "renderer", None)
+                if renderer is None:
+                    renderer = render_local.renderer = OverlayRenderer()
+                    overlay_renderers.append(renderer)
+                render_start = time.perf_counter()
+                # Zone counts are read now, so they can be a frame or two ahead of the tracked boxes
+                render_overlays(frame, overlay_items, renderer, line_counter=line_counter, lane_manager=lane_manager)
+                record_render_time(time.perf_counter() - render_start, True, pipeline_metrics, frame_trace)
+
+            # Without server-side overlays the stream can be downscaled; boxes are scaled by the client
+            if mode == "client":
+                with stream.config_lock:
+                    stream_scale = min(max(float(config.get("stream_scale", 1.0)), 0.1), 1.0)
+                if stream_scale < 1.0:
+                    frame = cv2.resize(frame, None, fx=stream_scale, fy=stream_scale, interpolation=cv2.INTER_AREA)
+
+            # Post-processing CPU time of the frame across the tracking and render workers
+            cpu_ms += (time.thread_time() - cpu_start) * 1000.0
+            previous = stream.overlay_cpu_ms[mode]
+            stream.overlay_cpu_ms[mode] = cpu_ms if previous is None else 0.95 * previous + 0.05 * cpu_ms
+            emit((frame, seq, frame_trace))
+
+        batch_size = 1
+        if images is not None:
             try:
-                if not frame_queue.full():
-                    frame_queue.put_nowait(processed_frame.copy())
-                else:
-                    # Drop oldest frame if queue is full
-                    try:
-                        frame_queue.get_nowait()
-                        frame_queue.put_nowait(processed_frame.copy())
-                    except:
-                        pass
-            except:
-                pass  # Queue is full, skip frame
-
-            return processed_frame
-
-        # For real-time config updates, we'll need to modify the core object detection pipeline
-        # which is complex. Instead, we'll restart the pipeline when config changes are received
-        # but for the confidence and pixel distance, we'll implement a dynamic callback
-
-        # Initialize Hailo inference
-        hailo_inference = HailoInfer("src/models/yolov11n.hef", 1)
-        height, width, _ = hailo_inference.get_input_shape()
-
-        # Create processing threads (modified to support real-time updates)
-        preprocess_thread = threading.Thread(
-            target=preprocess,
-            args=(images, cap, 1, input_queue, width, height)
-        )
-
-        def run_visualize_with_updates(output_queue, cap, save_stream_output, output_dir, fps_tracker):
-            """Run visualization loop with ability to update config"""
-            while is_running and not stop_event.is_set():
-                try:
-                    item = output_queue.get(timeout=0.5)  # shorter timeout
-                    if item is None:  # End signal
-                        break
-
-                    original_frame, infer_results = item
-                    processed_frame = post_process_callback_with_realtime_config(original_frame, infer_results)
-
-                    # Check if stop was requested
-                    if stop_event.is_set():
-                        break
-
-                    # Ensure frame gets to the stream even if there are processing delays
-                    try:
-                        if not frame_queue.full():
-                            frame_queue.put_nowait(processed_frame.copy())
-                        else:
-                            # Drop oldest frame if queue is full
-                            try:
-                                frame_queue.get_nowait()
-                                frame_queue.put_nowait(processed_frame.copy())
-                            except:
-                                pass
-                    except:
-                        pass  # Queue is full, skip frame
-
-                except q.Empty:
-                    continue  # Check is_running again
-                except Exception as e:
-                    print(f"Visualization error: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    break
-
-        postprocess_thread = threading.Thread(
-            target=run_visualize_with_updates,
-            args=(output_queue, cap, False, "./output", fps_tracker)
-        )
-
-        def infer_with_updates(hailo_inference, input_queue, output_queue):
-            """Inference function with config updates support."""
-            from functools import partial
-
-            def inference_callback(
-                completion_info,
-                bindings_list: list,
-                input_batch: list,
-                output_queue: q.Queue
-            ) -> None:
-                """Process inference results and put them in output queue."""
-                if completion_info.exception:
-                    print(f'Inference error: {completion_info.exception}')
-                else:
-                    for i, bindings in enumerate(bindings_list):
-                        if len(bindings._output_names) == 1:
-                            result = bindings.output().get_buffer()
-                        else:
-                            result = {
-                                name: np.expand_dims(
-                                    bindings.output(name).get_buffer(), axis=0
-                                )
-                                for name in bindings._output_names
-                            }
-                        output_queue.put((input_batch[i], result))
-
-            while is_running and not stop_event.is_set():
-                try:
-                    next_batch = input_queue.get(timeout=1)  # Use timeout to allow checking is_running
-                    if not next_batch:
-                        break  # Stop signal received
-
-                    input_batch, preprocessed_batch = next_batch
-
-                    # Prepare the callback for handling the inference result
-                    inference_callback_fn = partial(
-                        inference_callback,
-                        input_batch=input_batch,
-                        output_queue=output_queue
-                    )
-
-                    # Check if stop was requested before running inference
-                    if stop_event.is_set():
-                        break
-
-                    # Run async inference
-                    hailo_inference.run(preprocessed_batch, inference_callback_fn)
-
-                except q.Empty:
-                    continue  # Check is_running again
-                except Exception as e:
-                    print(f"Inference error: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    break
-
-            # Release resources and context
-            try:
-                hailo_inference.close()
-            except:
-                pass
-
-        infer_thread = threading.Thread(
-            target=infer_with_updates,
-            args=(hailo_inference, input_queue, output_queue)
-        )
-
-        # Create a separate thread for the preprocess function that can be interrupted
-        def preprocess_with_stop(images, cap, batch_size, input_queue, width, height):
-            """Preprocess with stop signal support."""
-            from utils.toolbox import preprocess_images, preprocess_from_cap, default_preprocess
-            from utils.toolbox import validate_images, divide_list_to_batches
-            import cv2
-            import queue
-
-            preprocess_fn = default_preprocess
-
-            if images is not None:
-                # Handle images case
-                try:
-                    validate_images(images, batch_size)
-                except ValueError as e:
-                    print(f"Image validation error: {e}")
+                validate_images(images, batch_size)
+            except ValueError as e:
+                print(f"Image validation error: {e}")
+                return
+
+        # Shared Hailo inference, opened by the first running stream
+        inference = inference_backend.acquire()
+        configure_stream_inference(stream, owner=run_token)
+        height, width, _ = inference_backend.get_input_shape()
+        if config.get("mosaic_group"):
+            # Frames are preprocessed to one tile of the mosaic the scheduler composes with the other streams
+            width, height = tile_size(width, height, config.get("mosaic_grid", 2))
+
+        # Stage graph: capture -> preprocess -> batch -> inference -> postprocess (decoding) -> tracking
+        # -> render -> publish. Items are tuples ending with the frame trace, which the engine marks
+        # with each stage's timing
+        pipeline = Pipeline(metrics=pipeline_metrics, watchdog=pipeline_watchdog, stall_after=WATCHDOG_STALL_SECONDS,
+                            trace_fn=lambda item: item[-1:] if isinstance(item, tuple) else ())
+
+        def capture_frames():
+            """Read frames from the camera or video file until the pipeline stops."""
+            nonlocal cap
+            while pipeline.running:
+                capture_start = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    if video_source != "camera":
+                        # End of the video file: the source ends and the pipeline drains; without
+                        # heartbeats the capture stage would otherwise be flagged as stalled
+                        pipeline_watchdog.remove([stream.qualify("capture")])
+                        return
+                    # No item means no heartbeat: the watchdog flags the stall and requests a reopen,
+                    # e.g. after the camera was disconnected
+                    if capture_reopen.is_set():
+                        capture_reopen.clear()
+                        cap = reopen_capture(cap)
+                    time.sleep(0.1)
+                    continue
+                captured_at = time.perf_counter()
+                pipeline_metrics.observe("capture", captured_at - capture_start)
+                # Latency is measured from the moment the frame was handed over by the capture device
+                trace = frame_tracer.new_trace(captured_at=captured_at)
+                trace.mark("capture", capture_start, captured_at)
+                yield frame, trace
+
+        def image_frames():
+            """Yield the loaded images once."""
+            for image in images:
+                if not pipeline.running:
                     return
-                preprocess_images(images, batch_size, input_queue, width, height, preprocess_fn)
-            else:
-                # Handle camera/video case - implement stop signal support
-                frames = []
-                processed_frames = []
-
-                while is_running and not stop_event.is_set():
-                    ret, frame = cap.read()
-                    if not ret:
-                        # Try to reinitialize the camera if read fails
-                        # This can happen if the camera is disconnected or has an error
-                        time.sleep(0.1)
-                        continue
-
-                    frames.append(frame)
-                    processed_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    processed_frame = preprocess_fn(processed_frame, width, height)
-                    processed_frames.append(processed_frame)
-
-                    if len(frames) == batch_size:
-                        try:
-                            # Check stop event before putting to queue
-                            if stop_event.is_set():
-                                break
-                            input_queue.put((frames, processed_frames), timeout=0.5)
-                            processed_frames, frames = [], []
-                        except queue.Full:
-                            # If queue is full, skip this batch
-                            processed_frames, frames = [], []
-                            continue
-                        except:
-                            # Other exception, continue the loop
-                            processed_frames, frames = [], []
-                            continue
-
-        preprocess_thread = threading.Thread(
-            target=preprocess_with_stop,
-            args=(images, cap, 1, input_queue, width, height)
-        )
-
-        # Start threads
-        preprocess_thread.start()
-        postprocess_thread.start()
-        infer_thread.start()
+                yield image, frame_tracer.new_trace()
 
+        def reopen_capture(previous):
+            """Release the capture and open the video source again; keeps the old one if that fails."""
+            nonlocal cap
+            try:
+                new_cap, _ = init_input_source(video_source, 1, "hd")
+            except (Exception, SystemExit) as e:  # init_input_source exits when the camera is missing
+                pipeline_watchdog.emit("capture_reopen_failed", source=video_source, error=str(e))
+                return previous
+            try:
+                previous.release()
+            except Exception as e:
+                print(f"Error releasing capture: {e}")
+            cap = new_cap
+            pipeline_watchdog.emit("capture_reopened", source=video_source)
+            return new_cap
+
+        def preprocess_frame(item, emit):
+            frame, trace = item
+            processed_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            emit((frame, default_preprocess(processed_frame, width, height), trace))
+
+        def inference_callback(completion_info, bindings_list: list, input_batch: list, traces: list,
+                               submitted_at: float, emit, results_list: list = None) -> None:
+            """
+            Pass the inference results of a batch on to post-processing. In a mosaic group the scheduler
+            passes `results_list`, the detections of this stream's tile.
+            """
+            if completion_info.exception:
+                print(f'Inference error: {completion_info.exception}')
+                pipeline_metrics.drop("inference", len(input_batch))
+                return
+            # Submit-to-completion latency, shared by all frames of the batch
+            completed_at = time.perf_counter()
+            for trace in traces:
+                pipeline_metrics.observe("inference", completed_at - submitted_at)
+                if trace is not None:
+                    trace.mark("inference", submitted_at, completed_at)
+            if results_list is not None:
+                for i, result in enumerate(results_list):
+                    emit((input_batch[i], result, traces[i]))
+                return
+            for i, bindings in enumerate(bindings_list):
+                if len(bindings._output_names) == 1:
+                    result = bindings.output().get_buffer()
+                else:
+                    result = {
+                        name: np.expand_dims(
+                            bindings.output(name).get_buffer(), axis=0
+                        )
+                        for name in bindings._output_names
+                    }
+                emit((input_batch[i], result, traces[i]))
+
+        def run_inference(batch, emit):
+            """
+            Queue a batch with the inference scheduler; results are emitted from the completion callback.
+            The inference latency includes the time the batch waited for its turn.
+            """
+            frames, preprocessed_batch, traces = (list(column) for column in zip(*batch))
+            inference_backend.submit(stream.id, preprocessed_batch, partial(
+                inference_callback, input_batch=frames, traces=traces, submitted_at=time.perf_counter(), emit=emit
+            ), on_drop=lambda n: pipeline_metrics.drop(stream.qualify("inference"), n), owner=run_token)
+
+        def close_inference(emit):
+            """Wait for this stream's queued and running inference jobs and release the shared model."""
+            if not inference_backend.flush(stream.id, timeout=10.0, owner=run_token):
+                print(f"Inference jobs of stream {stream.id} did not complete within 10 s")
+            release_inference()
+
+        def publish_frame(item, emit):
+            processed_frame, seq, frame_trace = item
+            if frame_rings:
+                publish_start = time.perf_counter()
+                metadata = frame_metadata.take(seq)
+                # Serialized once for all rings
+                metadata = json.dumps(metadata).encode() if metadata is not None else None
+                for ring in frame_rings:
+                    ring.write(fit_ring_frame(processed_frame, ring), metadata, seq)
+                if frame_trace is not None:
+                    frame_trace.mark("publish", publish_start)
+            if process_ring is not None:
+                # Pipeline process: the web process encodes the stream, the hub only keeps the frame
+                # for heatmap overlays
+                if processed_frame is not None:
+                    stream.frame_hub.publish(processed_frame, seq=seq)
+                frame_tracer.finish(frame_trace)
+                return
+            if processed_frame is None:
+                frame_tracer.finish(frame_trace)
+                return
+            # Single handoff to the stream: the hub takes ownership of the buffer, so no copy is needed
+            stream.frame_hub.publish(processed_frame, seq=seq, trace=frame_trace)
+
+        # Stage and channel names are qualified with the stream id in the shared watchdog and metrics;
+        # stage latencies are recorded under the common stage names, across all streams
+        name = stream.qualify
+        pipeline.add_source(name("capture"), image_frames if images is not None else capture_frames)
+        pipeline.add_stage(name("preprocess"), preprocess_frame, metric="preprocess",
+                           channel=dict(queue_settings["input"], name=name("input"), timestamp_fn=frame_captured_at))
+        pipeline.batch_stage(name("batch"), batch_size, channel={"maxsize": 2})
+        pipeline.add_stage(name("inference"), run_inference, on_end=close_inference, channel={"maxsize": 2})
+        pipeline.add_stage(name("postprocess"), decode_frame, workers=postprocess_workers, ordered=True,
+                           metric="postprocess",
+                           channel=dict(queue_settings["output"], name=name("output"), timestamp_fn=result_captured_at))
+        pipeline.add_stage(name("tracking"), track_frame, metric="tracking",
+                           channel={"maxsize": 2 * postprocess_workers})
+        pipeline.add_stage(name("render"), render_frame, workers=postprocess_workers, ordered=True,
+                           channel={"maxsize": 2 * postprocess_workers})
+        pipeline.add_stage(name("publish"), publish_frame, channel={"maxsize": 2, "policy": "drop_oldest"})
+
+        stream.graph = pipeline
+        for channel_name, channel in pipeline.channels.items():
+            pipeline_metrics.set_gauge(channel_name, channel.qsize)
+        memory_inspector.register(name("queues"), lambda: {n: c.qsize() for n, c in pipeline.channels.items()})
+
+        pipeline.start()
         fps_tracker.start()
 
-        # Wait for completion with stop support
-        preprocess_thread.join(timeout=1)  # Use timeout to allow interruption
-        if stop_event.is_set():
-            # Force stop all threads when stop event is set
-            try:
-                # Signal postprocess thread to exit by pushing None to output queue
-                output_queue.put(None, timeout=1)  # Signal process thread to exit
-                preprocess_thread.join(timeout=1)  # Wait for preprocess thread to finish
-                infer_thread.join(timeout=1)      # Wait for inference thread to finish
-                postprocess_thread.join(timeout=1)  # Wait for postprocess thread to finish
-            except:
-                pass  # If any thread doesn't stop gracefully, continue
-        else:
-            infer_thread.join()
-            output_queue.put(None)  # Signal process thread to exit
-            postprocess_thread.join()
+        # Sources end with the video/images or when stopped; a stop discards the queued frames
+        while not pipeline.join(timeout=0.5):
+            if stream.stop_event.is_set():
+                pipeline.cancel()
+                if not pipeline.join(timeout=5.0):
+                    print("Pipeline stages did not stop within 5 s")
+                break
 
         if fps_tracker:
             print(fps_tracker.frame_rate_summary())
@@ -373,22 +662,123 @@ def create_detection_pipeline(config):
         import traceback
         traceback.print_exc()
     finally:
+        # Emit summaries of the tracks that were still alive
+        if summary_manager is not None:
+            summary_manager.flush()
+        if summary_file_sink is not None:
+            summary_file_sink.close()
+        if results_sink is not None:
+            results_sink.close()
+        if tracker is not None:
+            stream.track_count = tracker.track_count
+        if pipeline is not None:
+            for channel_name in pipeline.channels:
+                pipeline_metrics.set_gauge(channel_name, None)
+            pipeline.unregister()
+        memory_inspector.register(stream.qualify("queues"), None)
+        pipeline_watchdog.remove([stream.qualify("capture")])
+        # The inference stage normally released the model; covers a pipeline that failed before it ran
+        if pipeline is None or pipeline.join(timeout=0):
+            release_inference()
+        stream.stats["stopped_at"] = time.time()
+
         # Release camera capture if it exists
         if cap is not None:
             try:
                 cap.release()
-            except:
-                pass
-        is_running = False
-        stop_event.clear()  # Reset the stop event
+            except Exception as e:
+                print(f"Error releasing capture: {e}")
+        stream.is_running = False
+        stream.stop_event.clear()  # Reset the stop event
+
+
+def open_shared_frame_ring(stream, name):
+    """
+    Get the named frame ring of a stream for local readers, (re)creating it when the configured name changed.
+
+    Args:
+        stream (DetectionStream): Stream publishing into the ring.
+        name (str or None): Shared memory name, None to remove the ring.
 
+    Returns:
+        FrameRing or None: The ring, or None if not configured or it couldn't be created.
+    """
+    from utils.frame_ring import FrameRing
+    import atexit
 
-def enforce_tracking_speed_estimation_rule(config):
+    if stream.shared_frame_ring is not None and stream.shared_frame_ring.name != name:
+        close_stream_frame_rings(stream, process_ring=False)
+    if name and stream.shared_frame_ring is None:
+        try:
+            stream.shared_frame_ring = FrameRing.create(name, slots=FRAME_RING_SLOTS,
+                                                        frame_capacity=FRAME_RING_FRAME_BYTES,
+                                                        metadata_capacity=FRAME_RING_METADATA_BYTES)
+        except (OSError, ValueError) as e:
+            print(f"Error creating shared frame ring '{name}': {e}")
+            return None
+        atexit.unregister(close_frame_rings)
+        atexit.register(close_frame_rings)
+    return stream.shared_frame_ring
+
+
+def open_process_frame_ring(stream):
+    """
+    In the pipeline process, get the ring carrying a stream's frames to the web process. The default
+    stream uses the ring created by the web process; the others create theirs on their first run and
+    announce it, so the web process attaches a reader.
+
+    Returns:
+        FrameRing or None: The ring, or None when the pipeline runs in the web server's process.
+    """
+    from utils.frame_ring import FrameRing
+    import atexit
+
+    if frame_ring is None:
+        return None
+    if stream.frame_ring is None:
+        stream.frame_ring = FrameRing.create(f"{frame_ring.name}_{stream.id}", slots=FRAME_RING_SLOTS,
+                                             frame_capacity=FRAME_RING_FRAME_BYTES,
+                                             metadata_capacity=FRAME_RING_METADATA_BYTES)
+        process_link.announce_ring(stream.id, stream.frame_ring.name)
+        atexit.unregister(close_frame_rings)
+        atexit.register(close_frame_rings)
+    return stream.frame_ring
+
+
+def close_stream_frame_rings(stream, process_ring=True):
+    """Remove the rings a stream created; attached readers keep their mapping until they close it."""
+    rings = [stream.shared_frame_ring]
+    stream.shared_frame_ring = None
+    if process_ring and stream.frame_ring is not frame_ring:
+        rings.append(stream.frame_ring)
+        stream.frame_ring = None
+    for ring in rings:
+        if ring is not None:
+            ring.close()
+            ring.unlink()
+
+
+def close_frame_rings():
+    """Remove the rings created by the streams of this process."""
+    for stream in stream_registry.list():
+        close_stream_frame_rings(stream)
+
+
+def fit_ring_frame(frame, ring):
+    """Downscale a frame that is larger than the slots of a frame ring (None passes through)."""
+    if frame is None or frame.nbytes <= ring.frame_capacity:
+        return frame
+    scale = 0.99 * (ring.frame_capacity / frame.nbytes) ** 0.5
+    return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def enforce_tracking_speed_estimation_rule(config, stream_config):
     """
     Enforce the rule: if speed estimation is enabled, tracking must also be enabled.
 
     Args:
         config (dict): Configuration dictionary to validate and adjust
+        stream_config (dict): Current configuration of the stream it applies to
 
     Returns:
         dict: Adjusted configuration following the rule
@@ -397,7 +787,7 @@ def enforce_tracking_speed_estimation_rule(config):
 
     # Determine the final speed estimation state based on the new config and current config
     final_speed_estimation = config.get('enable_speed_estimation',
-                                       current_config.get('enable_speed_estimation', False))
+                                       stream_config.get('enable_speed_estimation', False))
 
     # If speed estimation will be enabled (either being set or already is), tracking must also be enabled
     if final_speed_estimation:
@@ -406,50 +796,327 @@ def enforce_tracking_speed_estimation_rule(config):
     return updated_config
 
 
-def update_config_realtime(config_updates):
-    """Update configuration parameters that can be changed in real-time."""
-    global current_config, last_config_update
+def validate_queue_config(config):
+    """
+    Check the queue mode and per-queue policy overrides of a config update.
 
+    Returns:
+        str or None: Error message, or None if the settings are valid
+    """
+    if config.get("queue_mode", "auto") not in ("auto", *QUEUE_PRESETS):
+        return f"queue_mode must be auto or one of {list(QUEUE_PRESETS)}"
+    for name, settings in (config.get("queue_policies") or {}).items():
+        if name not in ("input", "output") or not isinstance(settings, dict):
+            return "queue_policies must map input/output to settings objects"
+        if settings.get("policy", "block") not in QUEUE_POLICIES:
+            return f"queue policy must be one of {list(QUEUE_POLICIES)}"
+        maxsize = settings.get("maxsize", 1)
+        if not isinstance(maxsize, int) or maxsize < 1:
+            return "queue maxsize must be a positive integer"
+        if set(settings) - {"maxsize", "policy", "max_age_ms"}:
+            return "queue settings only accept maxsize, policy and max_age_ms"
+    return None
+
+def validate_overlay_config(config):
+    """
+    Check the overlay mode and stream scale of a config update.
+
+    Returns:
+        str or None: Error message, or None if the settings are valid
+    """
+    if config.get("overlay_mode", "server") not in ("server", "client"):
+        return "overlay_mode must be server or client"
+    stream_scale = config.get("stream_scale", 1.0)
+    if (isinstance(stream_scale, bool) or not isinstance(stream_scale, (int, float))
+            or not 0.1 <= stream_scale <= 1.0):
+        return "stream_scale must be a number from 0.1 to 1.0"
+    return None
+
+def validate_analytics_config(config):
+    """
+    Check the counting lines and lanes of a config update, so a malformed one is rejected
+    here instead of failing in the tracking stage.
+
+    Returns:
+        str or None: Error message, or None if the settings are valid
+    """
+    from line_crossing import parse_lines
+    from lane_statistics import parse_lanes
+    try:
+        if "counting_lines" in config:
+            parse_lines(config["counting_lines"])
+        if "lanes" in config:
+            parse_lanes(config["lanes"])
+    except ValueError as e:
+        return str(e)
+    return None
+
+def validate_shm_ring_config(config, stream):
+    """
+    Check the shared frame ring name of a config update.
+
+    Returns:
+        str or None: Error message, or None if the name is valid and not used by another stream
+    """
+    shm_ring = config.get("shm_ring")
+    if shm_ring is None:
+        return None
+    if not isinstance(shm_ring, str) or not shm_ring or "/" in shm_ring:
+        return "shm_ring must be a shared memory name without slashes"
+    for other in stream_registry.list():
+        if other is not stream and other.config.get("shm_ring") == shm_ring:
+            return f"shm_ring '{shm_ring}' is already used by stream '{other.id}'"
+    return None
+
+def validate_inference_config(config):
+    """
+    Check the inference scheduling settings of a config update.
+
+    Returns:
+        str or None: Error message, or None if the settings are valid
+    """
+    weight = config.get("inference_weight", 1.0)
+    if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+        return "inference_weight must be a positive number"
+    priority = config.get("inference_priority", 0)
+    if (isinstance(priority, bool) or not isinstance(priority, int)
+            or not 0 <= priority <= InferenceScheduler.MAX_PRIORITY):
+        return f"inference_priority must be an integer from 0 to {InferenceScheduler.MAX_PRIORITY}"
+    target_fps = config.get("target_fps")
+    if target_fps is not None and (isinstance(target_fps, bool) or not isinstance(target_fps, (int, float))
+                                   or target_fps <= 0):
+        return "target_fps must be a positive number or null"
+    if config.get("inference_policy", "auto") not in ("auto", *InferenceScheduler.POLICIES):
+        return f"inference_policy must be auto or one of {list(InferenceScheduler.POLICIES)}"
+    return None
+
+def validate_mosaic_config(config, stream):
+    """
+    Check the mosaic settings of a stream config; when starting `stream`, also check that its
+    group has a free tile and the same grid as the running members.
+
+    Returns:
+        str or None: Error message, or None if the settings are valid
+    """
+    group = config.get("mosaic_group")
+    grid = config.get("mosaic_grid", 2)
+    if group is not None and (not isinstance(group, str) or not group):
+        return "mosaic_group must be a non-empty name or null"
+    if isinstance(grid, bool) or not isinstance(grid, int) or not 2 <= grid <= InferenceScheduler.MAX_GRID:
+        return f"mosaic_grid must be an integer from 2 to {InferenceScheduler.MAX_GRID}"
+    if group is None or stream is None:
+        return None
+    members = [other for other in stream_registry.list()
+               if other is not stream and (other.is_running or other.is_pipeline_alive())
+               and other.config.get("mosaic_group") == group]
+    for other in members:
+        if other.config.get("mosaic_grid", 2) != grid:
+            return f"mosaic_group '{group}' runs with mosaic_grid {other.config.get('mosaic_grid', 2)}"
+    if len(members) >= grid * grid:
+        return f"mosaic_group '{group}' already has {grid * grid} running streams"
+    return None
+
+def configure_stream_inference(stream, owner=None):
+    """
+    Apply the scheduling settings of a stream to the inference scheduler.
+
+    Args:
+        stream (DetectionStream): Stream to register or update.
+        owner (object, optional): Token of the pipeline run registering the stream; None updates its registration.
+    """
+    with stream.config_lock:
+        config = dict(stream.config)
+    policy = config.get("inference_policy", "auto")
+    if policy == "auto":
+        # Live sources drop their oldest waiting frame, offline sources wait for their turn
+        queue_mode = config.get("queue_mode", "auto")
+        if queue_mode not in QUEUE_PRESETS:
+            queue_mode = "live" if config["video_source"] == "camera" else "offline"
+        policy = "drop" if queue_mode == "live" else "defer"
+    inference_backend.configure_stream(stream.id, weight=config.get("inference_weight", 1.0),
+                                       priority=config.get("inference_priority", 0),
+                                       target_fps=config.get("target_fps"), policy=policy,
+                                       mosaic_group=config.get("mosaic_group"),
+                                       mosaic_grid=config.get("mosaic_grid", 2), owner=owner)
+
+def update_config_realtime(stream, config_updates):
+    """Update configuration parameters of a stream that can be changed in real-time."""
     # These parameters can be updated in real-time
-    real_time_params = ['confidence_threshold', 'pixel_distance_mm', 'target_labels']
+    real_time_params = ['confidence_threshold', 'pixel_distance_mm', 'target_labels', 'counting_lines', 'lanes',
+                        'overlay_mode', 'stream_scale', 'inference_weight', 'inference_priority', 'target_fps',
+                        'inference_policy']
+    scheduling_params = {'inference_weight', 'inference_priority', 'target_fps', 'inference_policy'}
 
-    with config_lock:
+    with stream.config_lock:
         for param, value in config_updates.items():
             if param in real_time_params:
-                current_config[param] = value
+                stream.config[param] = value
 
-    last_config_update = time.time()
+    stream.last_config_update = time.time()
+    if stream.is_running and scheduling_params & set(config_updates):
+        configure_stream_inference(stream)
+
+def start_pipeline_process():
+    """
+    Run the detection pipeline in a separate process, so HTTP clients, stream encoding and
+    metadata fan-out can't take GIL time from it. Called by the entry points before serving;
+    without it the pipeline runs in the web server's process.
+
+    The web process keeps the MJPEG stream, snapshots, uploads, static files and the Socket.IO
+    channel; every other request is forwarded to the pipeline process over a pipe.
+    """
+    global pipeline_process
+    import atexit
+    from utils.frame_ring import FrameRing
+    from utils.pipeline_process import PipelineProcess
+    from utils.toolbox import get_labels
+
+    # Labels for the subscription filters of metadata clients, which connect to this process
+    metadata_hub.set_labels(get_labels("src/config/coco.txt"))
+    ring = FrameRing.create(slots=FRAME_RING_SLOTS, frame_capacity=FRAME_RING_FRAME_BYTES,
+                            metadata_capacity=FRAME_RING_METADATA_BYTES)
+    pipeline_process = PipelineProcess(run_pipeline_worker, ring, on_frame=publish_ring_frame,
+                                       on_event=publish_process_event)
+    pipeline_process.start()
+    atexit.register(pipeline_process.stop)
+
+
+def run_pipeline_worker(conn, ring_name):
+    """Entry point of the pipeline process: serve the forwarded requests until the web process goes away."""
+    global process_link, frame_ring
+    from utils.frame_ring import FrameRing
+    from utils.pipeline_process import PipelineProcessLink
+
+    # Frames are encoded by the web process
+    frame_hub.stop()
+    # Spawned by the web process, so the ring is already tracked by the shared resource tracker
+    frame_ring = FrameRing.attach(ring_name, untrack=False)
+    default_stream.frame_ring = frame_ring
+    process_link = PipelineProcessLink(conn)
+    pipeline_watchdog.sinks.append(process_link.publish_event)
+    process_link.serve(handle_forwarded_request)
+
+    streams = stream_registry.list()
+    for stream in streams:
+        stream.stop_event.set()
+    deadline = time.time() + 5.0
+    while any(stream.is_pipeline_alive() for stream in streams) and time.time() < deadline:
+        time.sleep(0.1)
+    close_frame_rings()
+    frame_ring.close()
+
+
+def handle_forwarded_request(payload):
+    """Run a request forwarded by the web process through the Flask app and return the response parts."""
+    response = app.test_client().open(payload["path"], method=payload["method"], query_string=payload["query"],
+                                      data=payload["data"], content_type=payload["content_type"])
+    return {
+        "status": response.status_code,
+        "mimetype": response.mimetype,
+        "headers": {name: value for name, value in response.headers.items() if name in FORWARDED_HEADERS},
+        "body": response.get_data()
+    }
+
+
+def publish_ring_frame(stream_id, item):
+    """Hand a frame read from a ring of the pipeline process to its stream and metadata clients."""
+    stream = default_stream if stream_id is None else stream_registry.get_or_create(stream_id)
+    if item.metadata is not None:
+        stream.metadata_hub.publish_frame(item.metadata, item.frame_seq)
+    if item.frame is not None:
+        # The reader copied the frame out of shared memory, so the hub can take ownership
+        stream.frame_hub.publish(item.frame, seq=item.frame_seq)
+
+
+def publish_process_event(event):
+    """Hand an event of the pipeline process to the clients of its stream (the default one for watchdog events)."""
+    stream_registry.get_or_create(event.get("stream", DEFAULT_STREAM)).metadata_hub.publish_event(event)
+
+
+def forget_process_stream(stream_id):
+    """In the web process, drop a stream removed by the pipeline process, with its ring reader and hubs."""
+    try:
+        stream = stream_registry.remove(stream_id)
+    except (KeyError, ValueError):
+        return
+    pipeline_process.detach_ring(stream_id)
+    register_stream_memory(stream, register=False)
+    stream.frame_hub.stop()
+
+
+@app.before_request
+def forward_to_pipeline_process():
+    """In the web process, forward the API requests the pipeline process is responsible for."""
+    if pipeline_process is None or request.endpoint is None or request.endpoint in LOCAL_ENDPOINTS:
+        return None
+    try:
+        reply = pipeline_process.call({
+            "method": request.method,
+            "path": request.path,
+            "query": request.query_string,
+            "data": request.get_data(),
+            "content_type": request.content_type
+        }, timeout=PROCESS_REQUEST_TIMEOUT)
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+
+    stream_id = (request.view_args or {}).get("stream_id")
+    if reply["status"] == 200 and request.endpoint == "get_status":
+        # Stream and metadata clients are served here
+        stream = stream_registry.get_or_create(stream_id)
+        status = json.loads(reply["body"])
+        status.update(stream=stream.frame_hub.get_stats(), metadata_clients=stream.metadata_hub.get_stats(),
+                      process=pipeline_process.get_stats())
+        return jsonify(status)
+    if reply["status"] == 200 and request.endpoint == "stop_detection":
+        stream_registry.get_or_create(stream_id).frame_hub.clear()
+    if reply["status"] == 201 and request.endpoint == "add_stream":
+        stream_registry.get_or_create(json.loads(reply["body"])["stream"]["id"])
+    if reply["status"] == 200 and request.endpoint == "remove_stream":
+        forget_process_stream(stream_id)
+
+    response = Response(reply["body"], status=reply["status"], mimetype=reply["mimetype"])
+    for name, value in reply["headers"].items():
+        response.headers[name] = value
+    return response
+
+def mjpeg_part(seq, frame_bytes):
+    """
+    Format one MJPEG multipart part. The sequence header lets clients that draw the overlays
+    themselves match the frame with its metadata; plain <img> viewers ignore it.
+    """
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n'
+            b'X-Frame-Sequence: ' + str(seq).encode() + b'\r\n'
+            b'Content-Length: ' + str(len(frame_bytes)).encode() + b'\r\n\r\n' + frame_bytes + b'\r\n')
 
 # Video stream generator
-def generate_video_stream():
-    """Generator function to create an MJPEG video stream."""
-    # Keep track of the last frame to send if new frames are not available
-    last_frame = None
+def generate_video_stream(hub):
+    """Generator function to create an MJPEG video stream from a stream's hub."""
+    # Start from the latest encoded frame so a new viewer sees an image immediately
+    last_seq, frame_bytes = hub.get_latest_jpeg()
+    if frame_bytes is not None:
+        yield mjpeg_part(last_seq, frame_bytes)
+        hub.record_delivery()
+
     while True:
         try:
-            if not frame_queue.empty():
-                frame = frame_queue.get_nowait()  # Use nowait to avoid blocking
-                last_frame = frame  # Keep the last frame for consistency
-
-                # Encode frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                if ret:
-                    frame_bytes = buffer.tobytes()
-
-                    # Yield the frame in multipart format for MJPEG stream
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+            # Block until the encoder publishes a newer frame; other viewers are unaffected
+            result = hub.wait_for_jpeg(last_seq, timeout=STREAM_KEEPALIVE_INTERVAL)
+            keepalive = result is None
+            if keepalive:
+                # Idle source: resend the cached bytes (never re-encode) as a low-rate keepalive
+                _, frame_bytes = hub.get_latest_jpeg()
             else:
-                # If no new frame is available but we have a previous frame, reuse it
-                if last_frame is not None:
-                    ret, buffer = cv2.imencode('.jpg', last_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                    if ret:
-                        frame_bytes = buffer.tobytes()
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                last_seq, frame_bytes = result
+            if frame_bytes is None:
+                continue
 
-                # Small delay to control frame rate if no new frames
-                time.sleep(0.033)  # ~30 FPS when no new frames
+            # Yield the frame in multipart format for MJPEG stream
+            yield mjpeg_part(last_seq, frame_bytes)
+            hub.record_delivery(keepalive=keepalive)
 
         except Exception as e:
             print(f"Stream generation error: {e}")
@@ -464,43 +1131,114 @@ def index():
         # Return a simple error page if frontend files don't exist
         return '<h1>Frontend files not found. Please ensure the frontend directory exists with index.html</h1>'
 
-@app.route('/api/status')
-def get_status():
-    """Get the current detection status and configuration."""
-    global is_running, current_config
-    
-    # Calculate approximate FPS (in a real implementation, this would come from the detection process)
-    fps_value = 30.0 if is_running else 0.0
-    
+def unknown_stream(stream_id):
+    """Error response for a stream id that isn't registered."""
+    return jsonify({"error": f"Unknown stream '{stream_id}'"}), 404
+
+@app.route('/api/status', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/status')
+def get_status(stream_id):
+    """Get the current detection status and configuration of a stream."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+
+    # Processed frame rate over the last complete second
+    fps_value = stream.get_recent_fps()
+
+    # Metrics, latency and watchdog state are shared by all streams (stage and queue names of
+    # other streams are prefixed with their id)
+    inference = inference_backend.get_stats()
     return jsonify({
-        "running": is_running,
-        "config": current_config,
-        "fps": fps_value
+        "id": stream.id,
+        "running": stream.is_running,
+        "config": stream.config,
+        "fps": fps_value,
+        "stream": stream.frame_hub.get_stats(),
+        "metadata_clients": stream.metadata_hub.get_stats(),
+        "overlay": get_overlay_stats(stream),
+        "throughput": get_throughput_stats(stream, fps_value),
+        "metrics": pipeline_metrics.summary(),
+        "latency": frame_tracer.latency_percentiles(),
+        "watchdog": pipeline_watchdog.get_status(),
+        "stages": stream.graph.get_stats() if stream.graph is not None else {},
+        # Achieved inference FPS, queueing delay and drops of this stream under the scheduler
+        "scheduling": inference["per_stream"].get(stream.id),
+        "inference": inference
     })
 
-@app.route('/api/start', methods=['POST'])
-def start_detection():
-    """Start the detection pipeline."""
-    global is_running, current_config, stop_event
-
-    if is_running:
+def get_throughput_stats(stream, recent_fps):
+    """Summarize the processing throughput of the current (or last) pipeline of a stream."""
+    started_at = stream.stats["started_at"]
+    ended_at = stream.stats["stopped_at"] or time.time()
+    uptime = ended_at - started_at if started_at is not None else 0.0
+    frames = stream.stats["frames"]
+    headless = stream.config.get("headless", False)
+    mode = "headless" if headless else stream.config.get("overlay_mode", "server")
+    cpu_ms = stream.overlay_cpu_ms.get(mode)
+    return {
+        "headless": headless,
+        "frames_processed": frames,
+        "uptime_s": round(uptime, 1),
+        "avg_fps": round(frames / uptime, 2) if uptime > 0 else 0.0,
+        "recent_fps": recent_fps,
+        "postprocess_cpu_ms": None if cpu_ms is None else round(cpu_ms, 3)
+    }
+
+def get_overlay_stats(stream):
+    """Summarize the per-frame post-processing CPU cost of server vs client overlay rendering of a stream."""
+    overlay_cpu_ms = stream.overlay_cpu_ms
+    server_ms, client_ms = overlay_cpu_ms["server"], overlay_cpu_ms["client"]
+    saved_ms = None
+    if server_ms is not None and client_ms is not None:
+        saved_ms = round(server_ms - client_ms, 3)
+    return {
+        "mode": stream.config.get("overlay_mode", "server"),
+        "postprocess_cpu_ms": {
+            mode: None if value is None else round(value, 3) for mode, value in overlay_cpu_ms.items()
+        },
+        "saved_cpu_ms_per_frame": saved_ms
+    }
+
+@app.route('/api/start', methods=['POST'], defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/start', methods=['POST'])
+def start_detection(stream_id):
+    """Start the detection pipeline of a stream."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+
+    if stream.is_running:
         return jsonify({"error": "Detection is already running"}), 400
+    if stream.is_pipeline_alive():
+        # The stopped run still releases its inference registration, rings and sinks
+        return jsonify({"error": "Detection is still stopping, try again shortly"}), 409
 
     # Reset the stop event when starting
-    stop_event.clear()
+    stream.stop_event.clear()
 
     # Update config from request
     new_config = request.json or {}
 
     # Enforce the rule: if speed estimation is enabled, tracking must also be enabled
-    new_config = enforce_tracking_speed_estimation_rule(new_config)
+    new_config = enforce_tracking_speed_estimation_rule(new_config, stream.config)
+
+    config_error = (validate_queue_config(new_config) or validate_shm_ring_config(new_config, stream)
+                    or validate_overlay_config(new_config) or validate_analytics_config(new_config)
+                    or validate_inference_config(new_config)
+                    or validate_mosaic_config(dict(stream.config, **new_config), stream))
+    if config_error:
+        return jsonify({"error": config_error}), 400
 
-    current_config.update(new_config)
+    stream.config.update(new_config)
 
     # Start the actual detection pipeline in a separate thread
-    is_running = True
-    detection_thread = threading.Thread(target=create_detection_pipeline, args=(current_config,))
+    stream.is_running = True
+    stream.stats.update(started_at=time.time(), stopped_at=None, frames=0)
+    detection_thread = threading.Thread(target=create_detection_pipeline, args=(stream,),
+                                        name=stream.qualify("pipeline"))
     detection_thread.daemon = True
+    stream.pipeline_thread = detection_thread
     detection_thread.start()
 
     return jsonify({
@@ -508,60 +1246,384 @@ def start_detection():
         "status": "running"
     })
 
-@app.route('/api/stop', methods=['POST'])
-def stop_detection():
-    """Stop the detection pipeline."""
-    global is_running, stop_event
+@app.route('/api/stop', methods=['POST'], defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/stop', methods=['POST'])
+def stop_detection(stream_id):
+    """Stop the detection pipeline of a stream."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
 
-    if not is_running:
+    if not stream.is_running:
         return jsonify({"error": "Detection is not running"}), 400
 
     # Set the stop event to signal all threads to stop
-    stop_event.set()
-    is_running = False
+    stream.stop_event.set()
+    stream.is_running = False
 
-    # Clear the frame queue to clear old frames
-    try:
-        while not frame_queue.empty():
-            frame_queue.get_nowait()
-    except:
-        pass
+    # Drop the last frame so new viewers don't see a stale image
+    stream.frame_hub.clear()
 
     return jsonify({
         "message": "Detection stopped successfully",
         "status": "stopped"
     })
 
-@app.route('/api/config', methods=['GET', 'POST'])
-def handle_config():
-    """Get or update the current configuration."""
-    global current_config
-    
+@app.route('/api/config', methods=['GET', 'POST'], defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/config', methods=['GET', 'POST'])
+def handle_config(stream_id):
+    """Get or update the current configuration of a stream."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+
     if request.method == 'GET':
-        return jsonify(current_config)
-    
+        return jsonify(stream.config)
+
     elif request.method == 'POST':
         # Update configuration with real-time parameters
         new_config = request.json or {}
 
         # Enforce the rule: if speed estimation is enabled, tracking must also be enabled
-        new_config = enforce_tracking_speed_estimation_rule(new_config)
+        new_config = enforce_tracking_speed_estimation_rule(new_config, stream.config)
+
+        config_error = (validate_overlay_config(new_config) or validate_analytics_config(new_config)
+                        or validate_inference_config(new_config))
+        if config_error:
+            return jsonify({"error": config_error}), 400
 
-        update_config_realtime(new_config)
+        update_config_realtime(stream, new_config)
 
         return jsonify({
             "message": "Configuration updated",
-            "config": current_config
+            "config": stream.config
         })
 
-@app.route('/api/video_stream')
-def video_stream():
+@app.route('/api/streams')
+def list_streams():
+    """List the streams with their running state and frame rate, and the frame rate summed over all of them."""
+    streams = [stream.get_info() for stream in stream_registry.list()]
+    return jsonify({
+        "streams": streams,
+        "running": sum(info["running"] for info in streams),
+        "aggregate_fps": sum(info["fps"] for info in streams),
+        "max_streams": MAX_STREAMS,
+        "inference": inference_backend.get_stats()
+    })
+
+@app.route('/api/streams', methods=['POST'])
+def add_stream():
+    """
+    Add a stream, e.g. {"id": "gate", "config": {"video_source": "videos/gate.mp4"}}. Settings missing
+    from the config take the defaults; start it with /api/streams/<id>/start.
+    """
+    body = request.json or {}
+    config = body.get("config") or {}
+    if not isinstance(config, dict):
+        return jsonify({"error": "config must be an object"}), 400
+
+    # Enforce the rule: if speed estimation is enabled, tracking must also be enabled
+    config = enforce_tracking_speed_estimation_rule(config, STREAM_CONFIG_DEFAULTS)
+    config_error = (validate_queue_config(config) or validate_shm_ring_config(config, None)
+                    or validate_overlay_config(config) or validate_analytics_config(config)
+                    or validate_inference_config(config) or validate_mosaic_config(config, None))
+    if config_error:
+        return jsonify({"error": config_error}), 400
+
+    try:
+        stream = stream_registry.create(body.get("id"), config)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Stream created", "stream": stream.get_info()}), 201
+
+@app.route('/api/streams/<stream_id>', methods=['DELETE'])
+def remove_stream(stream_id):
+    """Remove a stopped stream with its outputs; the default stream can't be removed."""
+    stream = stream_registry.get(stream_id)
+    if stream is not None and not stream.is_running and stream.is_pipeline_alive():
+        return jsonify({"error": f"Stream '{stream_id}' is still stopping, try again shortly"}), 409
+    try:
+        stream = stream_registry.remove(stream_id)
+    except KeyError:
+        return unknown_stream(stream_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    register_stream_memory(stream, register=False)
+    close_stream_frame_rings(stream)
+    stream.frame_hub.stop()
+    return jsonify({"message": "Stream removed"})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text-format metrics: per-stage latency histograms, frame and drop counters, queue depths."""
+    streams = stream_registry.list()
+    running = [stream for stream in streams if stream.is_running]
+    extra_gauges = {
+        "pipeline_running": ("Whether a detection pipeline is running.", 1 if running else 0),
+        "pipeline_streams_running": ("Number of streams whose detection pipeline is running.", len(running)),
+        "pipeline_fps": ("Frames processed over the last complete second, summed over the streams.",
+                         sum(stream.get_recent_fps() for stream in running)),
+        "stream_encode_cpu_ms": ("Moving average of the JPEG encoder CPU time per frame, summed over the streams.",
+                                 sum(stream.frame_hub.get_stats()["encode_cpu_ms"] or 0.0 for stream in streams))
+    }
+    return Response(pipeline_metrics.render_prometheus(extra_gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/latency')
+def get_latency():
+    """Glass-to-glass latency percentiles (capture to encoded, or to post-processed when headless)."""
+    percentiles = request.args.get('percentiles', default='50,90,99')
+    try:
+        percentiles = [float(p) for p in percentiles.split(',') if p.strip()]
+    except ValueError:
+        return jsonify({"error": "percentiles must be a comma-separated list of numbers"}), 400
+    return jsonify(frame_tracer.latency_percentiles(percentiles))
+
+@app.route('/api/trace')
+def record_trace():
+    """
+    Record per-frame stage timings for `duration` seconds (default 5, max 60) and return them
+    as a Chrome trace-event JSON file. The request blocks while recording.
+    """
+    duration = min(max(request.args.get('duration', default=5.0, type=float), 0.1), 60.0)
+    try:
+        traces = frame_tracer.record(duration)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+    trace = frame_tracer.to_chrome_trace(traces)
+    trace["otherData"] = {"duration_s": duration, "frames": len(traces),
+                          "latency": frame_tracer.percentiles_of([t.latency for t in traces])}
+    response = Response(json.dumps(trace), mimetype='application/json')
+    response.headers['Content-Disposition'] = f'attachment; filename=trace-{int(time.time())}.json'
+    return response
+
+@app.route('/api/profile')
+def profile():
+    """
+    Sample all threads for `duration` seconds (default 10, max 120) and return collapsed stacks.
+
+    Query parameters: interval (seconds between samples, default 0.01), thread (only stacks of
+    threads whose name contains it), format ("collapsed" for flamegraph.pl/speedscope input, or
+    "json" for per-thread sample counts and top functions). The request blocks while sampling.
+    """
+    duration = min(max(request.args.get('duration', default=10.0, type=float), 0.1), 120.0)
+    interval = min(max(request.args.get('interval', default=0.01, type=float), 0.001), 1.0)
+    thread = request.args.get('thread')
+    output_format = request.args.get('format', default='collapsed').lower()
+    if output_format not in ('collapsed', 'json'):
+        return jsonify({"error": "format must be collapsed or json"}), 400
+
+    try:
+        result = sampling_profiler.profile(duration, interval)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+    if output_format == 'json':
+        threads = {name: info for name, info in result["threads"].items() if thread is None or thread in name}
+        return jsonify({"samples": result["samples"], "duration": result["duration"],
+                        "interval": result["interval"], "threads": threads})
+    return Response(sampling_profiler.collapsed(result["stacks"], thread), mimetype='text/plain')
+
+@app.route('/api/watchdog')
+def get_watchdog():
+    """Stage heartbeats, stall/restart counts, queue depths and alarms, plus the most recent watchdog events."""
+    limit = min(max(request.args.get('limit', default=20, type=int), 0), 500)
+    return jsonify(dict(pipeline_watchdog.get_status(), events=pipeline_watchdog.get_events(limit)))
+
+@app.route('/api/watchdog/events')
+def get_watchdog_events():
+    """Watchdog events (stalls, backlogs, restarts, recovery actions), oldest first; `since` is the last seen id."""
+    limit = min(max(request.args.get('limit', default=100, type=int), 0), 500)
+    since = request.args.get('since', type=int)
+    return jsonify({"events": pipeline_watchdog.get_events(limit, since)})
+
+@app.route('/api/memory')
+def get_memory():
+    """Process RSS, GC counts, sizes of the pipeline's long-lived structures and tracemalloc status."""
+    return jsonify(memory_inspector.report())
+
+@app.route('/api/memory/snapshot', methods=['POST', 'DELETE'])
+def memory_snapshot():
+    """
+    POST starts tracemalloc (if needed) and takes the baseline snapshot for /api/memory/diff.
+    DELETE drops the baseline and stops tracing, since tracing slows every allocation.
+    """
+    if request.method == 'DELETE':
+        memory_inspector.stop_tracing()
+        return jsonify({"message": "Memory tracing stopped"})
+    frames = min(max(request.args.get('frames', default=10, type=int), 1), 50)
+    memory_inspector.take_baseline(frames)
+    return jsonify({"message": "Baseline snapshot taken", "frames": frames})
+
+@app.route('/api/memory/diff')
+def memory_diff():
+    """Top allocation sites by growth since the baseline snapshot (group_by: lineno, filename or traceback)."""
+    limit = min(max(request.args.get('limit', default=20, type=int), 1), 200)
+    group_by = request.args.get('group_by', default='lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({"error": "group_by must be lineno, filename or traceback"}), 400
+    try:
+        return jsonify(memory_inspector.diff(limit, group_by))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+@app.route('/api/video_stream', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/video_stream')
+def video_stream(stream_id):
     """MJPEG video stream endpoint."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
     return Response(
-        generate_video_stream(),
+        generate_video_stream(stream.frame_hub),
         mimetype='multipart/x-mixed-replace; boundary=frame'
     )
 
+@app.route('/api/counts', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/counts')
+def get_counts(stream_id):
+    """Get the running line crossing counts and the most recent crossing events."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    line_crossing_manager = stream.line_crossing_manager
+    if line_crossing_manager is None:
+        return jsonify({"lines": {}, "events": []})
+
+    limit = request.args.get('limit', default=100, type=int)
+    return jsonify({
+        "lines": line_crossing_manager.get_counts(),
+        "events": line_crossing_manager.get_events(limit)
+    })
+
+@app.route('/api/counts/reset', methods=['POST'], defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/counts/reset', methods=['POST'])
+def reset_counts(stream_id):
+    """Reset the line crossing counts while keeping the configured lines."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    if stream.line_crossing_manager is None:
+        return jsonify({"error": "Line crossing counting is not active"}), 400
+
+    stream.line_crossing_manager.reset_counts()
+    return jsonify({"message": "Counts reset"})
+
+@app.route('/api/lanes', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/lanes')
+def get_lane_statistics(stream_id):
+    """Get rolling per-lane flow, occupancy and speed statistics."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    lane_statistics_manager = stream.lane_statistics_manager
+    if lane_statistics_manager is None:
+        return jsonify({"lanes": {}})
+
+    percentiles = request.args.get('percentiles', default='50,85')
+    try:
+        percentiles = [float(p) for p in percentiles.split(',') if p.strip()]
+    except ValueError:
+        return jsonify({"error": "percentiles must be a comma-separated list of numbers"}), 400
+    if not all(0 <= p <= 100 for p in percentiles):
+        return jsonify({"error": "percentiles must be between 0 and 100"}), 400
+
+    return jsonify({"lanes": lane_statistics_manager.get_statistics(percentiles)})
+
+@app.route('/api/heatmap', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/heatmap')
+def get_heatmap(stream_id):
+    """Render the occupancy heatmap as an image, optionally overlaid on the latest frame."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    heatmap_manager = stream.heatmap_manager
+    if heatmap_manager is None:
+        return jsonify({"error": "Heatmap is not available, tracking must be enabled"}), 404
+
+    class_name = request.args.get('class')
+    overlay = request.args.get('overlay', default='false').lower() in ('1', 'true', 'yes')
+    alpha = request.args.get('alpha', default=0.5, type=float)
+    if not (math.isfinite(alpha) and 0.0 <= alpha <= 1.0):
+        return jsonify({"error": "alpha must be a number from 0 to 1"}), 400
+    image_format = request.args.get('format', default='png').lower()
+    if image_format not in ('png', 'jpg', 'jpeg'):
+        return jsonify({"error": "format must be png or jpg"}), 400
+
+    background = stream.frame_hub.get_latest_frame() if overlay else None
+    image = heatmap_manager.render(class_name, background=background, alpha=alpha)
+    if image is None:
+        return jsonify({"error": "No occupancy data accumulated yet"}), 404
+
+    extension = '.png' if image_format == 'png' else '.jpg'
+    ret, buffer = cv2.imencode(extension, image)
+    if not ret:
+        return jsonify({"error": "Failed to encode heatmap"}), 500
+
+    mimetype = 'image/png' if image_format == 'png' else 'image/jpeg'
+    return Response(buffer.tobytes(), mimetype=mimetype)
+
+@app.route('/api/heatmap/classes', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/heatmap/classes')
+def get_heatmap_classes(stream_id):
+    """List the classes that have a heatmap layer."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    if stream.heatmap_manager is None:
+        return jsonify({"classes": []})
+    return jsonify({"classes": stream.heatmap_manager.get_classes()})
+
+@app.route('/api/track_summaries', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/track_summaries')
+def get_track_summaries(stream_id):
+    """Get the most recent finished track summaries."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    limit = request.args.get('limit', default=100, type=int)
+    return jsonify({"summaries": stream.track_summary_sink.get_records(limit)})
+
+@app.route('/api/timeseries', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/timeseries')
+def get_time_series(stream_id):
+    """
+    Query the rolling time series.
+
+    Query parameters: start/end (unix seconds, default the last 5 minutes),
+    resolution (1, 60 or 3600 seconds, default picked from the range).
+    """
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    end = request.args.get('end', default=time.time(), type=float)
+    start = request.args.get('start', default=end - 300.0, type=float)
+    resolution = request.args.get('resolution', default=None, type=float)
+    if not all(math.isfinite(value) for value in (start, end, resolution) if value is not None):
+        return jsonify({"error": "start, end and resolution must be finite numbers"}), 400
+
+    try:
+        return jsonify(stream.time_series_store.query(start, end, resolution))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/snapshot', defaults={'stream_id': DEFAULT_STREAM})
+@app.route('/api/streams/<stream_id>/snapshot')
+def snapshot(stream_id):
+    """Return the latest encoded frame as a single JPEG."""
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return unknown_stream(stream_id)
+    seq, frame_bytes = stream.frame_hub.get_latest_jpeg()
+    if frame_bytes is None:
+        return jsonify({"error": "No frame available"}), 404
+
+    response = Response(frame_bytes, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Frame-Sequence'] = str(seq)
+    return response
+
 @app.route('/api/upload_video', methods=['POST'])
 def upload_video():
     """Upload video file to the server."""
@@ -603,6 +1665,48 @@ def upload_video():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@socketio.on('connect')
+def metadata_connect():
+    """Register a metadata channel client with the default stream; nothing is sent until it subscribes."""
+    client_hubs[request.sid] = metadata_hub
+    metadata_hub.connect(request.sid)
+
+@socketio.on('disconnect')
+def metadata_disconnect():
+    client_hubs.pop(request.sid, metadata_hub).disconnect(request.sid)
+
+@socketio.on('subscribe')
+def metadata_subscribe(options=None):
+    """
+    Subscribe to the metadata channel.
+
+    Options: stream (stream id, default "default"), encoding ("json", "binary" or "delta"),
+    classes (list of class names), min_speed (km/h), frames (bool), events (bool or list of
+    event types), max_fps. The returned acknowledgement carries the class table and the row layout.
+    Clients acknowledge each frame message (its Socket.IO ack callback); the next frame is sent
+    after the ack, or after 1 s without one, so a slow client gets fewer, fresher frames.
+    """
+    options = options or {}
+    stream_id = options.get("stream", DEFAULT_STREAM)
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        return {"success": False, "error": f"Unknown stream '{stream_id}'"}
+    # A client receives the metadata of one stream at a time
+    hub = client_hubs.get(request.sid, metadata_hub)
+    if hub is not stream.metadata_hub:
+        hub.disconnect(request.sid)
+        stream.metadata_hub.connect(request.sid)
+        client_hubs[request.sid] = stream.metadata_hub
+    try:
+        return {"success": True, "stream": stream.id, **stream.metadata_hub.subscribe(request.sid, options)}
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+@socketio.on('unsubscribe')
+def metadata_unsubscribe():
+    client_hubs.get(request.sid, metadata_hub).unsubscribe(request.sid)
+    return {"success": True}
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint."""
@@ -612,4 +1716,6 @@ def health_check():
     })
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
+    if os.environ.get("PIPELINE_PROCESS", "1") != "0":
+        start_pipeline_process()
+    socketio.run(app, host='0.0.0.0', port=5000, debug=False, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,361 @@
+"""
+Per-lane traffic statistics using a precomputed lane label raster
+"""
+import time
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+LANE_COLOR = (255, 128, 0)
+
+
+def parse_lanes(lanes: List[dict]) -> Tuple[List[str], List[np.ndarray]]:
+    """
+    Parse lane definitions
+
+    Args:
+        lanes (list): Lane definitions, each a dict with "name" and "polygon" ([[x, y], ...])
+
+    Returns:
+        tuple: Lane names and one (K, 2) polygon array per lane
+
+    Raises:
+        ValueError: If the lanes are not a list of such dicts with at least 3 polygon points
+    """
+    if not isinstance(lanes, list):
+        raise ValueError("lanes must be a list")
+    if len(lanes) > 255:
+        raise ValueError("At most 255 lanes are supported")
+    names, polygons = [], []
+    for i, lane in enumerate(lanes):
+        if not isinstance(lane, dict):
+            raise ValueError(f"lane {i} must be an object")
+        try:
+            polygon = np.asarray(lane.get("polygon"), dtype=np.float64)
+        except (TypeError, ValueError):
+            polygon = None
+        if (polygon is None or polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3
+                or not np.all(np.isfinite(polygon))):
+            raise ValueError(f"lane {i} must have a polygon of at least 3 points [[x, y], ...]")
+        names.append(str(lane.get("name", f"lane_{i}")))
+        polygons.append(polygon)
+    return names, polygons
+
+
+class LaneStatisticsManager:
+    """
+    Maintains rolling per-lane flow, occupancy and speed statistics.
+
+    Lane polygons are compiled once into a downsampled lane-id raster (0 = no lane),
+    so binning all track footpoints to lanes is a single fancy-indexing lookup.
+    Aggregates are kept in fixed-size ring buffers of time buckets together with
+    running window totals, so queries never scan history.
+    """
+    def __init__(self, lanes: Optional[List[dict]] = None, window_seconds: float = 60.0,
+                 bucket_seconds: float = 1.0, cell_size: int = 4, speed_bin_width: float = 2.0,
+                 max_speed: float = 200.0, stale_frames: int = 30):
+        """
+        Initialize lane statistics manager
+
+        Args:
+            lanes (list): Lane definitions, each a dict with "name" and "polygon" ([[x, y], ...])
+            window_seconds (float): Length of the rolling window in seconds
+            bucket_seconds (float): Length of one ring buffer bucket in seconds
+            cell_size (int): Pixel size of one lane raster cell
+            speed_bin_width (float): Width of one speed histogram bin in km/h
+            max_speed (float): Upper edge of the speed histogram in km/h (faster speeds go to the last bin)
+            stale_frames (int): Frames a track may be missing before its lane assignment is forgotten
+        """
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = max(1, int(round(window_seconds / bucket_seconds)))
+        self.cell_size = cell_size
+        self.speed_bin_width = speed_bin_width
+        self.num_speed_bins = max(1, int(np.ceil(max_speed / speed_bin_width)))
+        self.stale_frames = stale_frames
+        self.lock = threading.Lock()
+        self.version = 0  # Bumped by set_lanes, e.g. for renderers caching the drawn lanes
+
+        self.set_lanes(lanes or [])
+
+    def set_lanes(self, lanes: List[dict]):
+        """
+        Replace the lane definitions and reset all statistics
+
+        Args:
+            lanes (list): Lane definitions, each a dict with "name" and "polygon" ([[x, y], ...])
+
+        Raises:
+            ValueError: If a lane is malformed; the current lanes and statistics are kept
+        """
+        names, polygons = parse_lanes(lanes)
+        with self.lock:
+            self.lanes_config = lanes
+            self.version += 1
+            self.names = names
+            self.polygons = polygons
+            self.raster = None  # Built lazily once the frame size is known
+            self.raster_frame_shape = None
+
+            num_lanes, num_buckets = len(lanes), self.num_buckets
+            # Ring buffers, one column per time bucket
+            self.entries = np.zeros((num_lanes, num_buckets), dtype=np.int64)
+            self.occupancy = np.zeros((num_lanes, num_buckets), dtype=np.float64)
+            self.speed_sum = np.zeros((num_lanes, num_buckets), dtype=np.float64)
+            self.speed_count = np.zeros((num_lanes, num_buckets), dtype=np.int64)
+            self.speed_hist = np.zeros((num_lanes, num_buckets, self.num_speed_bins), dtype=np.int64)
+            # Running totals over the whole window
+            self.total_entries = np.zeros(num_lanes, dtype=np.int64)
+            self.total_occupancy = np.zeros(num_lanes, dtype=np.float64)
+            self.total_speed_sum = np.zeros(num_lanes, dtype=np.float64)
+            self.total_speed_count = np.zeros(num_lanes, dtype=np.int64)
+            self.total_speed_hist = np.zeros((num_lanes, self.num_speed_bins), dtype=np.int64)
+            self.current_counts = np.zeros(num_lanes, dtype=np.int64)
+
+            self.current_bucket = None
+            self.start_time = None
+            self.last_timestamp = None
+            self.current_frame = 0
+            self.track_lanes: Dict[int, int] = {}  # track_id -> lane id (0 = no lane)
+            self.last_seen: Dict[int, int] = {}  # track_id -> frame number
+
+    def _build_raster(self, frame_shape: Tuple[int, ...]):
+        """
+        Rasterize the lane polygons into a lane-id grid for the given frame size
+
+        Args:
+            frame_shape: Shape of the frames the footpoints refer to (height, width, ...)
+        """
+        height, width = frame_shape[:2]
+        rows = -(-height // self.cell_size)
+        cols = -(-width // self.cell_size)
+        raster = np.zeros((rows, cols), dtype=np.uint8)
+        # Later lanes win where polygons overlap
+        for lane_id, polygon in enumerate(self.polygons, start=1):
+            cells = np.round(polygon / self.cell_size).astype(np.int32)
+            cv2.fillPoly(raster, [cells], lane_id)
+        self.raster = raster
+        self.raster_frame_shape = tuple(frame_shape[:2])
+
+    def _advance(self, timestamp: float) -> int:
+        """
+        Move the ring buffers forward to the bucket of the given timestamp, expiring old buckets
+
+        Returns:
+            int: Ring buffer slot of the current bucket
+        """
+        bucket = int(timestamp // self.bucket_seconds)
+        if self.current_bucket is None:
+            self.current_bucket = bucket
+        elif bucket > self.current_bucket:
+            steps = min(bucket - self.current_bucket, self.num_buckets)
+            slots = (self.current_bucket + np.arange(1, steps + 1)) % self.num_buckets
+            self.total_entries -= self.entries[:, slots].sum(axis=1)
+            self.total_occupancy -= self.occupancy[:, slots].sum(axis=1)
+            self.total_speed_sum -= self.speed_sum[:, slots].sum(axis=1)
+            self.total_speed_count -= self.speed_count[:, slots].sum(axis=1)
+            self.total_speed_hist -= self.speed_hist[:, slots].sum(axis=1)
+            self.entries[:, slots] = 0
+            self.occupancy[:, slots] = 0
+            self.speed_sum[:, slots] = 0
+            self.speed_count[:, slots] = 0
+            self.speed_hist[:, slots] = 0
+            self.current_bucket = bucket
+        return self.current_bucket % self.num_buckets
+
+    def update(self, track_ids: Sequence[int], footpoints: np.ndarray, speeds: Sequence[Optional[float]],
+               frame_shape: Tuple[int, ...], timestamp: Optional[float] = None):
+        """
+        Bin the footpoints of all active tracks to lanes and update the rolling aggregates
+
+        Args:
+            track_ids: Track IDs of the active tracks
+            footpoints: Array of shape (N, 2) with the current footpoint of each track
+            speeds: Speed in km/h of each track, or None if unknown
+            frame_shape: Shape of the frame the footpoints refer to
+            timestamp: Timestamp of the frame, if None uses current time
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.lock:
+            num_lanes = len(self.names)
+            if num_lanes == 0:
+                return
+
+            self.current_frame += 1
+            if self.raster is None or self.raster_frame_shape != tuple(frame_shape[:2]):
+                self._build_raster(frame_shape)
+            if self.start_time is None:
+                self.start_time = timestamp
+
+            slot = self._advance(timestamp)
+            dt = 0.0
+            if self.last_timestamp is not None:
+                dt = min(max(timestamp - self.last_timestamp, 0.0), self.bucket_seconds)
+            self.last_timestamp = timestamp
+
+            points = np.asarray(footpoints, dtype=np.float64).reshape(-1, 2)
+            # Footpoints outside the frame are in no lane rather than in the lane of the nearest edge cell
+            height, width = self.raster_frame_shape
+            inside = (points[:, 0] >= 0) & (points[:, 0] < width) & (points[:, 1] >= 0) & (points[:, 1] < height)
+            cells = (points[inside] // self.cell_size).astype(np.int64)
+            lane_ids = np.zeros(len(points), dtype=np.int64)
+            lane_ids[inside] = self.raster[cells[:, 1], cells[:, 0]]
+
+            in_lane = lane_ids > 0
+            lane_idx = lane_ids[in_lane] - 1
+
+            # Occupancy: time during which each lane holds at least one object
+            self.current_counts = np.bincount(lane_idx, minlength=num_lanes)
+            occupied = self.current_counts > 0
+            self.occupancy[occupied, slot] += dt
+            self.total_occupancy[occupied] += dt
+
+            # Flow: tracks entering a lane they were not in on their previous observation
+            entered = []
+            for tid, lane_id in zip(track_ids, lane_ids.tolist()):
+                if lane_id and self.track_lanes.get(tid) != lane_id:
+                    entered.append(lane_id - 1)
+                self.track_lanes[tid] = lane_id
+                self.last_seen[tid] = self.current_frame
+            if entered:
+                entry_counts = np.bincount(entered, minlength=num_lanes)
+                self.entries[:, slot] += entry_counts
+                self.total_entries += entry_counts
+
+            # Speeds of tracks inside a lane
+            speed_values = np.array([np.nan if s is None else s for s in speeds], dtype=np.float64).reshape(-1)
+            valid = in_lane & ~np.isnan(speed_values)
+            if valid.any():
+                valid_lanes = lane_ids[valid] - 1
+                valid_speeds = speed_values[valid]
+                sums = np.bincount(valid_lanes, weights=valid_speeds, minlength=num_lanes)
+                counts = np.bincount(valid_lanes, minlength=num_lanes)
+                self.speed_sum[:, slot] += sums
+                self.speed_count[:, slot] += counts
+                self.total_speed_sum += sums
+                self.total_speed_count += counts
+                bins = np.clip((valid_speeds / self.speed_bin_width).astype(np.int64), 0, self.num_speed_bins - 1)
+                np.add.at(self.speed_hist, (valid_lanes, slot, bins), 1)
+                np.add.at(self.total_speed_hist, (valid_lanes, bins), 1)
+
+            self._cleanup_stale_tracks()
+
+    def _cleanup_stale_tracks(self):
+        """
+        Forget lane assignments of tracks not seen for more than `stale_frames` frames
+        """
+        stale_ids = [tid for tid, frame in self.last_seen.items()
+                     if self.current_frame - frame > self.stale_frames]
+        for tid in stale_ids:
+            del self.last_seen[tid]
+            del self.track_lanes[tid]
+
+    def get_track_lanes(self, track_ids: Sequence[int]) -> List[Optional[str]]:
+        """
+        Get the lane each track was last binned to
+
+        Args:
+            track_ids: Track IDs to look up
+
+        Returns:
+            list: Lane name of each track, or None outside any lane
+        """
+        with self.lock:
+            lanes = [self.track_lanes.get(tid, 0) for tid in track_ids]
+            return [self.names[lane_id - 1] if lane_id else None for lane_id in lanes]
+
+    def _percentile(self, hist: np.ndarray, total: int, q: float) -> Optional[float]:
+        """
+        Estimate a speed percentile from a histogram, interpolating linearly within the bin
+
+        Args:
+            hist: Speed histogram of one lane
+            total: Number of samples in the histogram
+            q: Percentile in [0, 100]
+
+        Returns:
+            float: Estimated speed in km/h, or None if the histogram is empty
+        """
+        if total <= 0:
+            return None
+        target = total * q / 100.0
+        cumulative = np.cumsum(hist)
+        idx = int(np.searchsorted(cumulative, target))
+        idx = min(idx, len(hist) - 1)
+        below = cumulative[idx - 1] if idx > 0 else 0
+        fraction = (target - below) / hist[idx] if hist[idx] > 0 else 0.0
+        return (idx + fraction) * self.speed_bin_width
+
+    def get_statistics(self, percentiles: Sequence[float] = (50, 85)) -> Dict[str, dict]:
+        """
+        Get the rolling statistics for all lanes
+
+        Args:
+            percentiles: Speed percentiles to report, each in [0, 100]
+
+        Returns:
+            dict: lane name -> statistics over the rolling window
+        """
+        with self.lock:
+            window = self.num_buckets * self.bucket_seconds
+            if self.start_time is not None and self.last_timestamp is not None:
+                window = min(window, max(self.last_timestamp - self.start_time, self.bucket_seconds))
+
+            stats = {}
+            for i, name in enumerate(self.names):
+                speed_count = int(self.total_speed_count[i])
+                stats[name] = {
+                    "current_count": int(self.current_counts[i]),
+                    "flow": int(self.total_entries[i]),
+                    "flow_per_minute": round(float(self.total_entries[i]) * 60.0 / window, 2),
+                    "occupancy_seconds": round(float(self.total_occupancy[i]), 2),
+                    "occupancy_ratio": round(min(float(self.total_occupancy[i]) / window, 1.0), 3),
+                    "mean_speed": round(float(self.total_speed_sum[i]) / speed_count, 2) if speed_count else None,
+                    "speed_percentiles": {
+                        f"p{q:g}": (None if speed_count == 0 else
+                                       round(self._percentile(self.total_speed_hist[i], speed_count, q), 2))
+                        for q in percentiles
+                    },
+                    "window_seconds": round(window, 2)
+                }
+            return stats
+
+    def get_count_labels(self) -> List[Tuple[str, Tuple[int, int]]]:
+        """
+        Get the current object count label of each lane
+
+        Returns:
+            list: (text, (x, y) text origin) per lane
+        """
+        with self.lock:
+            names, polygons, current_counts = self.names, self.polygons, self.current_counts
+        labels = []
+        for i, (name, polygon) in enumerate(zip(names, polygons)):
+            count = int(current_counts[i]) if i < len(current_counts) else 0
+            origin = (int(polygon[:, 0].min()) + 4, int(polygon[:, 1].min()) + 16)
+            labels.append((f"{name}: {count}", origin))
+        return labels
+
+    def draw_lanes(self, frame: np.ndarray, draw_counts: bool = True) -> np.ndarray:
+        """
+        Draw the lane outlines and their current object counts on the frame
+
+        Args:
+            frame: Image frame to draw on
+            draw_counts: Whether to draw the count labels (False draws the static outlines only)
+
+        Returns:
+            Frame with lanes drawn
+        """
+        with self.lock:
+            polygons = self.polygons
+        for polygon in polygons:
+            cv2.polylines(frame, [polygon.astype(np.int32)], True, LANE_COLOR, 2)
+        if draw_counts:
+            for text, origin in self.get_count_labels():
+                cv2.putText(frame, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2, cv2.LINE_AA)
+                cv2.putText(frame, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.5, LANE_COLOR, 1, cv2.LINE_AA)
+        return frame
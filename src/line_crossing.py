@@ -0,0 +1,256 @@
+"""
+Virtual line-crossing counters for tracked objects
+"""
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+LINE_COLOR = (0, 255, 255)
+
+
+def parse_lines(lines: List[dict]) -> Tuple[List[str], np.ndarray]:
+    """
+    Parse counting line definitions
+
+    Args:
+        lines (list): Line definitions, each a dict with "name" and "points" ([[x1, y1], [x2, y2]])
+
+    Returns:
+        tuple: Line names and an array of shape (M, 2, 2) with the line endpoints
+
+    Raises:
+        ValueError: If the lines are not a list of such dicts
+    """
+    if not isinstance(lines, list):
+        raise ValueError("counting_lines must be a list")
+    names, points = [], []
+    for i, line in enumerate(lines):
+        if not isinstance(line, dict):
+            raise ValueError(f"counting line {i} must be an object")
+        try:
+            line_points = np.asarray(line.get("points"), dtype=np.float64)
+        except (TypeError, ValueError):
+            line_points = None
+        if line_points is None or line_points.shape != (2, 2) or not np.all(np.isfinite(line_points)):
+            raise ValueError(f"counting line {i} must have two points [[x1, y1], [x2, y2]]")
+        names.append(str(line.get("name", f"line_{i}")))
+        points.append(line_points)
+    return names, np.asarray(points, dtype=np.float64).reshape(-1, 2, 2)
+
+
+class LineCrossingManager:
+    """
+    Counts tracked objects crossing configurable virtual lines.
+
+    Each frame, the segments between every active track's previous and current
+    footpoint (bottom-center of the box) are tested against every counting line
+    in a single vectorized pass. A track is counted at most once per line.
+    """
+    def __init__(self, lines: Optional[List[dict]] = None, stale_frames: int = 30, max_events: int = 1000):
+        """
+        Initialize line crossing manager
+
+        Args:
+            lines (list): Line definitions, each a dict with "name" and "points" ([[x1, y1], [x2, y2]])
+            stale_frames (int): Frames a track may be missing before its state is forgotten
+            max_events (int): Maximum number of recent crossing events to keep
+        """
+        self.stale_frames = stale_frames
+        self.current_frame = 0
+        self.lock = threading.Lock()
+
+        self.last_footpoints: Dict[int, tuple] = {}  # track_id -> (x, y)
+        self.last_seen: Dict[int, int] = {}  # track_id -> frame number
+        self.counted = set()  # (track_id, line_index) pairs already counted
+        self.events = deque(maxlen=max_events)
+        self.version = 0  # Bumped by set_lines, e.g. for renderers caching the drawn lines
+
+        self.set_lines(lines or [])
+
+    def set_lines(self, lines: List[dict]):
+        """
+        Replace the counting lines and reset their counts
+
+        Args:
+            lines (list): Line definitions, each a dict with "name" and "points" ([[x1, y1], [x2, y2]])
+
+        Raises:
+            ValueError: If a line is malformed; the current lines and counts are kept
+        """
+        names, points = parse_lines(lines)
+        with self.lock:
+            self.lines_config = lines
+            self.version += 1
+            self.names = names
+            self.starts = points[:, 0]  # (M, 2)
+            self.directions = points[:, 1] - points[:, 0]  # (M, 2)
+            self.counts = [{"in": 0, "out": 0, "by_class": {}} for _ in lines]
+            self.counted.clear()
+            self.events.clear()
+
+    def update(self, track_ids: Sequence[int], footpoints: np.ndarray, class_names: Sequence[str],
+               speeds: Sequence[Optional[float]], timestamp: Optional[float] = None) -> List[dict]:
+        """
+        Test the movement of all active tracks against all lines and record crossings
+
+        Args:
+            track_ids: Track IDs of the active tracks
+            footpoints: Array of shape (N, 2) with the current footpoint of each track
+            class_names: Class name of each track
+            speeds: Speed in km/h of each track, or None if unknown
+            timestamp: Timestamp of the frame, if None uses current time
+
+        Returns:
+            list: Crossing events recorded in this frame
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        new_events = []
+
+        with self.lock:
+            self.current_frame += 1
+            num_lines = len(self.names)
+            if num_lines and len(track_ids):
+                current = np.asarray(footpoints, dtype=np.float64).reshape(-1, 2)
+                previous = np.array([self.last_footpoints.get(tid, (np.nan, np.nan)) for tid in track_ids])
+
+                # Orientation of the previous/current footpoint relative to each line, shape (N, M)
+                d = self.directions[None, :, :]
+                prev_rel = previous[:, None, :] - self.starts[None, :, :]
+                curr_rel = current[:, None, :] - self.starts[None, :, :]
+                side_prev = d[..., 0] * prev_rel[..., 1] - d[..., 1] * prev_rel[..., 0]
+                side_curr = d[..., 0] * curr_rel[..., 1] - d[..., 1] * curr_rel[..., 0]
+
+                # Orientation of the line endpoints relative to each movement segment, shape (N, M)
+                move = (current - previous)[:, None, :]
+                start_rel = self.starts[None, :, :] - previous[:, None, :]
+                end_rel = start_rel + d
+                side_start = move[..., 0] * start_rel[..., 1] - move[..., 1] * start_rel[..., 0]
+                side_end = move[..., 0] * end_rel[..., 1] - move[..., 1] * end_rel[..., 0]
+
+                # NaN comparisons are False, so tracks without a previous footpoint never cross
+                crossed = ((side_prev > 0) != (side_curr > 0)) & ~np.isnan(side_prev) & (side_start * side_end <= 0)
+
+                for track_idx, line_idx in zip(*np.nonzero(crossed)):
+                    track_id, line_idx = int(track_ids[track_idx]), int(line_idx)
+                    if (track_id, line_idx) in self.counted:
+                        continue
+                    self.counted.add((track_id, line_idx))
+
+                    direction = "in" if side_curr[track_idx, line_idx] > 0 else "out"
+                    class_name = class_names[track_idx]
+                    counts = self.counts[line_idx]
+                    counts[direction] += 1
+                    class_counts = counts["by_class"].setdefault(class_name, {"in": 0, "out": 0})
+                    class_counts[direction] += 1
+
+                    speed = speeds[track_idx]
+                    event = {
+                        "timestamp": timestamp,
+                        "line": self.names[line_idx],
+                        "track_id": track_id,
+                        "direction": direction,
+                        "class": class_name,
+                        "speed": None if speed is None else round(float(speed), 2)
+                    }
+                    self.events.append(event)
+                    new_events.append(event)
+
+            for tid, point in zip(track_ids, np.asarray(footpoints).reshape(-1, 2).tolist()):
+                self.last_footpoints[tid] = tuple(point)
+                self.last_seen[tid] = self.current_frame
+
+            self._cleanup_stale_tracks()
+
+        return new_events
+
+    def _cleanup_stale_tracks(self):
+        """
+        Forget tracks that have not been seen for more than `stale_frames` frames
+        """
+        stale_ids = [tid for tid, frame in self.last_seen.items()
+                     if self.current_frame - frame > self.stale_frames]
+        if not stale_ids:
+            return
+        stale = set(stale_ids)
+        for tid in stale_ids:
+            del self.last_footpoints[tid]
+            del self.last_seen[tid]
+        self.counted = {key for key in self.counted if key[0] not in stale}
+
+    def get_counts(self) -> dict:
+        """
+        Get the running counts for all lines
+
+        Returns:
+            dict: line name -> {"in", "out", "total", "by_class"}
+        """
+        with self.lock:
+            return {
+                name: {
+                    "in": counts["in"],
+                    "out": counts["out"],
+                    "total": counts["in"] + counts["out"],
+                    "by_class": {cls: dict(c) for cls, c in counts["by_class"].items()}
+                }
+                for name, counts in zip(self.names, self.counts)
+            }
+
+    def get_events(self, limit: int = 100) -> List[dict]:
+        """
+        Get the most recent crossing events
+
+        Args:
+            limit: Maximum number of events to return
+
+        Returns:
+            list: Crossing events, oldest first
+        """
+        with self.lock:
+            return list(self.events)[-limit:]
+
+    def reset_counts(self):
+        """
+        Reset all counts and recent events while keeping the lines
+        """
+        self.set_lines(self.lines_config)
+
+    def get_count_labels(self) -> List[Tuple[str, Tuple[int, int]]]:
+        """
+        Get the in/out count label of each line
+
+        Returns:
+            list: (text, (x, y) text origin) per line
+        """
+        with self.lock:
+            return [(f"{name}: in {counts['in']} out {counts['out']}", (int(start[0]) + 4, int(start[1]) - 6))
+                    for name, start, counts in zip(self.names, self.starts, self.counts)]
+
+    def draw_lines(self, frame: np.ndarray, draw_counts: bool = True) -> np.ndarray:
+        """
+        Draw the counting lines and their counts on the frame
+
+        Args:
+            frame: Image frame to draw on
+            draw_counts: Whether to draw the count labels (False draws the static lines only)
+
+        Returns:
+            Frame with counting lines drawn
+        """
+        with self.lock:
+            # set_lines replaces both arrays, so take them together
+            starts, directions = self.starts, self.directions
+        for start, direction in zip(starts, directions):
+            p1 = tuple(int(v) for v in start)
+            p2 = tuple(int(v) for v in start + direction)
+            cv2.line(frame, p1, p2, LINE_COLOR, 2)
+        if draw_counts:
+            for text, origin in self.get_count_labels():
+                cv2.putText(frame, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2, cv2.LINE_AA)
+                cv2.putText(frame, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.5, LINE_COLOR, 1, cv2.LINE_AA)
+        return frame
@@ -0,0 +1,487 @@
+"""
+WebSocket (Socket.IO) channel pushing per-frame detection/track metadata and discrete events
+"""
+import json
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Row layout of one object in the JSON and delta encodings
+ROW_FIELDS = ["id", "x1", "y1", "x2", "y2", "cls", "score", "speed", "loitering"]
+
+# Binary encoding: little-endian header followed by one fixed-size record per object
+BINARY_MAGIC = b"YM"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<2sBxIdH")  # magic, version, pad, seq, timestamp, object count
+BINARY_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("x1", "<i2"), ("y1", "<i2"), ("x2", "<i2"), ("y2", "<i2"),
+    ("cls", "<u2"),
+    ("score", "u1"),    # percent
+    ("flags", "u1"),    # bit 0: loitering, bit 1: tracked (id is valid)
+    ("speed", "<u2"),   # km/h * 10, 0xFFFF when unknown
+])
+BINARY_NO_SPEED = 0xFFFF
+
+ENCODINGS = ("json", "binary", "delta")
+
+
+def build_frame_metadata(track_ids: Optional[Sequence[int]], boxes: Sequence[Sequence[float]],
+                         class_ids: Sequence[int], scores: Sequence[float],
+                         speeds: Optional[Sequence[Optional[float]]] = None,
+                         loitering: Optional[Sequence[bool]] = None,
+                         timestamp: Optional[float] = None,
+                         frame_shape: Optional[Sequence[int]] = None) -> dict:
+    """
+    Pack the objects of one frame into the compact row format shared by all encodings.
+
+    Args:
+        track_ids: Track ID of each object, or None for untracked detections.
+        boxes: [xmin, ymin, xmax, ymax] of each object.
+        class_ids: Class index of each object.
+        scores: Confidence of each object in [0, 1].
+        speeds: Speed in km/h of each object, or None if unknown.
+        loitering: Loitering flag of each object.
+        timestamp: Frame timestamp, if None uses current time.
+        frame_shape: Shape of the frame the boxes refer to, reported as "size" [width, height]
+            so clients can scale boxes onto a downscaled stream.
+
+    Returns:
+        dict: {"ts": float, "rows": [[id, x1, y1, x2, y2, cls, score, speed, loitering], ...]}
+    """
+    rows = []
+    for i, box in enumerate(boxes):
+        speed = speeds[i] if speeds is not None else None
+        rows.append([
+            int(track_ids[i]) if track_ids is not None else None,
+            int(box[0]), int(box[1]), int(box[2]), int(box[3]),
+            int(class_ids[i]),
+            round(float(scores[i]), 2),
+            None if speed is None else round(float(speed), 1),
+            bool(loitering[i]) if loitering is not None else False
+        ])
+    metadata = {"ts": time.time() if timestamp is None else timestamp, "rows": rows}
+    if frame_shape is not None:
+        metadata["size"] = [int(frame_shape[1]), int(frame_shape[0])]
+    return metadata
+
+
+class ClientState:
+    """
+    Subscription filters and pending (coalesced) output of one connected client
+    """
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.connected = True
+        self.subscribed = False
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+
+        # Filters
+        self.encoding = "json"
+        self.classes = None  # set of class indices, or None for all
+        self.min_speed = None
+        self.frames = True
+        self.events = True  # True, False or a set of event types
+        self.min_interval = 0.0
+
+        # Pending output: only the latest frame is kept (latest wins), events are bounded
+        self.pending_frame = None
+        self.pending_events = deque(maxlen=256)
+        self.last_frame_sent = 0.0
+        # A frame sent but not yet acknowledged by the client; the next one waits for its ack
+        self.awaiting_ack = False
+        self.last_frame_seq = None
+
+        # Delta encoding baseline
+        self.last_rows: Dict[int, list] = {}
+        self.frames_since_key = 0
+
+        # Counters
+        self.sent_frames = 0
+        self.coalesced_frames = 0
+        self.dropped_events = 0
+        self.ack_timeouts = 0
+
+    def configure(self, options: dict, labels: Sequence[str]):
+        """
+        Apply subscription options sent by the client
+        """
+        encoding = options.get("encoding", "json")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}', must be one of {ENCODINGS}")
+        min_speed = options.get("min_speed")
+        if min_speed is not None and (isinstance(min_speed, bool) or not isinstance(min_speed, (int, float))
+                                      or not min_speed >= 0):
+            raise ValueError("min_speed must be a non-negative number")
+        max_fps = options.get("max_fps")
+        if max_fps is not None and (isinstance(max_fps, bool) or not isinstance(max_fps, (int, float))
+                                    or not max_fps > 0):
+            raise ValueError("max_fps must be a positive number")
+
+        with self.lock:
+            self.encoding = encoding
+            classes = options.get("classes")
+            self.classes = None if not classes else {labels.index(c) for c in classes if c in labels}
+            self.min_speed = min_speed
+            self.frames = bool(options.get("frames", True))
+            events = options.get("events", True)
+            self.events = set(events) if isinstance(events, list) else bool(events)
+            self.min_interval = 1.0 / max_fps if max_fps else 0.0
+            self.last_rows = {}
+            self.frames_since_key = 0
+            self.subscribed = True
+
+    def wants_event(self, event: dict) -> bool:
+        if self.events is True:
+            return True
+        if self.events is False:
+            return False
+        return event.get("type") in self.events
+
+
+class MetadataHub:
+    """
+    Fans out per-frame metadata and events to Socket.IO clients.
+
+    Each client has its own delivery task. The pipeline never blocks on a client:
+    a new frame replaces any frame still pending for that client (latest wins), so a
+    slow client receives fewer, fresher frames instead of an unbounded backlog.
+
+    Emitting only queues a message in the server, so a frame is sent once the client
+    acknowledged the previous one (the Socket.IO ack callback of the frame message);
+    until then new frames coalesce. A client that doesn't acknowledge gets one frame
+    per `ack_timeout`.
+    """
+    def __init__(self, socketio, labels: Sequence[str] = (), key_frame_interval: int = 30,
+                 ack_timeout: float = 1.0):
+        """
+        Args:
+            socketio (flask_socketio.SocketIO): Server used to emit messages and start delivery tasks.
+            labels (list): Class names, indexed by class id.
+            key_frame_interval (int): Frames between full key frames in delta encoding.
+            ack_timeout (float): Seconds to wait for the acknowledgement of a frame before sending the next.
+        """
+        self.socketio = socketio
+        self.labels = list(labels)
+        self.key_frame_interval = key_frame_interval
+        self.ack_timeout = ack_timeout
+        self.clients: Dict[str, ClientState] = {}
+        self.lock = threading.Lock()
+        self.seq = 0
+
+    def set_labels(self, labels: Sequence[str]):
+        self.labels = list(labels)
+
+    def connect(self, sid: str):
+        client = ClientState(sid)
+        with self.lock:
+            self.clients[sid] = client
+        self.socketio.start_background_task(self._deliver, client)
+
+    def disconnect(self, sid: str):
+        with self.lock:
+            client = self.clients.pop(sid, None)
+        if client is not None:
+            client.connected = False
+            client.wake.set()
+
+    def subscribe(self, sid: str, options: dict) -> dict:
+        """
+        Apply the subscription filters of a client
+
+        Returns:
+            dict: Acknowledgement including the class table and row layout
+        """
+        client = self.clients.get(sid)
+        if client is None:
+            raise ValueError("Unknown client")
+        client.configure(options or {}, self.labels)
+        return {"encoding": client.encoding, "classes": self.labels, "fields": ROW_FIELDS}
+
+    def unsubscribe(self, sid: str):
+        client = self.clients.get(sid)
+        if client is not None:
+            with client.lock:
+                client.subscribed = False
+                client.pending_frame = None
+                client.awaiting_ack = False
+                client.pending_events.clear()
+
+    def publish_frame(self, metadata: dict, seq: Optional[int] = None) -> int:
+        """
+        Offer one frame of metadata to all subscribed clients
+
+        Args:
+            metadata (dict): Output of `build_frame_metadata`.
+            seq (int, optional): Frame sequence number, defaults to an internal counter.
+
+        Returns:
+            int: Sequence number assigned to the frame.
+        """
+        with self.lock:
+            self.seq = seq if seq is not None else self.seq + 1
+            frame = dict(metadata, seq=self.seq)
+            clients = list(self.clients.values())
+
+        for client in clients:
+            if not client.subscribed or not client.frames:
+                continue
+            with client.lock:
+                if client.pending_frame is not None:
+                    client.coalesced_frames += 1
+                client.pending_frame = frame
+            client.wake.set()
+        return frame["seq"]
+
+    def publish_event(self, event: dict):
+        """
+        Queue a discrete event (e.g. a line crossing) for all interested clients
+
+        Args:
+            event (dict): Event payload, with a "type" key.
+        """
+        with self.lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            if not client.subscribed or not client.wants_event(event):
+                continue
+            with client.lock:
+                if len(client.pending_events) == client.pending_events.maxlen:
+                    client.dropped_events += 1
+                client.pending_events.append(event)
+            client.wake.set()
+
+    def __call__(self, record: dict):
+        """Track summary sink: forward finished tracks as events."""
+        self.publish_event(dict(record, type="track_ended"))
+
+    def get_stats(self) -> List[dict]:
+        with self.lock:
+            clients = list(self.clients.values())
+        return [{
+            "sid": c.sid,
+            "subscribed": c.subscribed,
+            "encoding": c.encoding,
+            "sent_frames": c.sent_frames,
+            "coalesced_frames": c.coalesced_frames,
+            "dropped_events": c.dropped_events,
+            "ack_timeouts": c.ack_timeouts
+        } for c in clients]
+
+    def _filter_rows(self, client: ClientState, rows: List[list]) -> List[list]:
+        if client.classes is None and client.min_speed is None:
+            return rows
+        result = []
+        for row in rows:
+            if client.classes is not None and row[5] not in client.classes:
+                continue
+            if client.min_speed is not None and (row[7] is None or row[7] < client.min_speed):
+                continue
+            result.append(row)
+        return result
+
+    def _encode_binary(self, frame: dict, rows: List[list]) -> bytes:
+        records = np.zeros(len(rows), dtype=BINARY_DTYPE)
+        for i, row in enumerate(rows):
+            records[i] = (
+                row[0] or 0,
+                row[1], row[2], row[3], row[4],
+                row[5],
+                int(round(row[6] * 100)),
+                (1 if row[8] else 0) | (2 if row[0] is not None else 0),
+                BINARY_NO_SPEED if row[7] is None else min(int(round(row[7] * 10)), BINARY_NO_SPEED - 1)
+            )
+        header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, frame["seq"] & 0xFFFFFFFF, frame["ts"], len(rows))
+        return header + records.tobytes()
+
+    def _encode_delta(self, client: ClientState, frame: dict, rows: List[list]) -> dict:
+        key = client.frames_since_key == 0
+        client.frames_since_key = (client.frames_since_key + 1) % self.key_frame_interval
+
+        tracked = {row[0]: row for row in rows if row[0] is not None}
+        untracked = [row for row in rows if row[0] is None]
+        if key:
+            updates = list(tracked.values())
+            removed = []
+        else:
+            updates = [row for tid, row in tracked.items() if client.last_rows.get(tid) != row]
+            removed = [tid for tid in client.last_rows if tid not in tracked]
+        client.last_rows = tracked
+        return {"seq": frame["seq"], "ts": frame["ts"], "size": frame.get("size"), "key": key,
+                "upd": updates, "del": removed, "dets": untracked}
+
+    def _deliver(self, client: ClientState):
+        """Delivery task of one client: send the latest pending frame and queued events."""
+        timeout = 1.0
+        while client.connected:
+            client.wake.wait(timeout=timeout)
+            client.wake.clear()
+            if not client.connected:
+                break
+            timeout = 1.0
+
+            with client.lock:
+                events = list(client.pending_events)
+                client.pending_events.clear()
+                frame = None
+                now = time.time()
+                if client.awaiting_ack and now - client.last_frame_sent >= self.ack_timeout:
+                    client.awaiting_ack = False
+                    client.ack_timeouts += 1
+                if client.pending_frame is not None and client.awaiting_ack:
+                    # The client is still busy with the previous frame: come back on its ack
+                    timeout = self.ack_timeout - (now - client.last_frame_sent)
+                elif client.pending_frame is not None and now - client.last_frame_sent >= client.min_interval:
+                    frame, client.pending_frame = client.pending_frame, None
+                    client.last_frame_sent = now
+                    client.last_frame_seq = frame["seq"]
+                    client.awaiting_ack = True
+                elif client.pending_frame is not None:
+                    # Rate-limited: come back once the interval has passed
+                    timeout = client.min_interval - (now - client.last_frame_sent)
+
+            try:
+                for event in events:
+                    self.socketio.emit("event", event, to=client.sid)
+
+                if frame is not None:
+                    rows = self._filter_rows(client, frame["rows"])
+                    acked = partial(self._acknowledged, client, frame["seq"])
+                    if client.encoding == "binary":
+                        self.socketio.emit("frame_bin", self._encode_binary(frame, rows), to=client.sid,
+                                           callback=acked)
+                    elif client.encoding == "delta":
+                        self.socketio.emit("frame_delta", self._encode_delta(client, frame, rows), to=client.sid,
+                                           callback=acked)
+                    else:
+                        self.socketio.emit("frame", dict(frame, rows=rows), to=client.sid, callback=acked)
+                    client.sent_frames += 1
+            except Exception as e:
+                with client.lock:
+                    client.awaiting_ack = False
+                print(f"Metadata delivery error for {client.sid}: {e}")
+
+    def _acknowledged(self, client: ClientState, seq: int, *args):
+        """Ack callback of a frame message: the next pending frame can be sent."""
+        with client.lock:
+            if client.awaiting_ack and client.last_frame_seq == seq:
+                client.awaiting_ack = False
+        client.wake.set()
+
+
+class JsonLinesMetadataSink:
+    """
+    Appends per-frame metadata and events to a JSON Lines file, one object per line
+    """
+    def __init__(self, path: str, labels: Sequence[str] = ()):
+        """
+        Args:
+            path (str): Path of the file to append to.
+            labels (list): Class names, used to write class names instead of indices.
+        """
+        self.path = path
+        self.labels = list(labels)
+        self.lock = threading.Lock()
+        # Line-buffered, so readers see each record at once and a terminated process loses at most one line
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def publish_frame(self, metadata: dict, seq: Optional[int] = None) -> Optional[int]:
+        rows = [dict(zip(ROW_FIELDS, row)) for row in metadata["rows"]]
+        if self.labels:
+            for row in rows:
+                row["cls"] = self.labels[row["cls"]]
+        self._write(dict(metadata, type="frame", seq=seq, rows=rows))
+        return seq
+
+    def publish_event(self, event: dict):
+        self._write(event)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def _write(self, record: dict):
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(json.dumps(record) + "\n")
+
+
+class FrameMetadataBuffer:
+    """
+    Keeps the metadata of recent frames until it is written out next to its frame, e.g. into
+    a shared-memory frame ring by the publish stage. Entries of frames that never get there
+    (dropped on the way) are evicted oldest first.
+    """
+    def __init__(self, on_event: Optional[Callable[[dict], None]] = None, max_frames: int = 64):
+        """
+        Args:
+            on_event (Callable, optional): Receives the events, which are not buffered.
+            max_frames (int): Number of frames whose metadata is kept.
+        """
+        self.on_event = on_event
+        self.max_frames = max_frames
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        self.seq = 0
+
+    def publish_frame(self, metadata: dict, seq: Optional[int] = None) -> int:
+        with self.lock:
+            self.seq = seq if seq is not None else self.seq + 1
+            self.frames[self.seq] = dict(metadata, seq=self.seq)
+            while len(self.frames) > self.max_frames:
+                self.frames.popitem(last=False)
+            return self.seq
+
+    def publish_event(self, event: dict):
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def take(self, seq: int) -> Optional[dict]:
+        """
+        Remove and return the metadata of a frame
+
+        Args:
+            seq (int): Frame sequence number.
+
+        Returns:
+            dict or None: The metadata, or None if it was evicted or never published.
+        """
+        with self.lock:
+            return self.frames.pop(seq, None)
+
+
+class MetadataFanout:
+    """
+    Forwards metadata to several publishers. The first publisher assigns the frame
+    sequence number, which is passed on so all outputs agree on it.
+    """
+    def __init__(self, publishers: Sequence):
+        """
+        Args:
+            publishers (list): Objects with `publish_frame(metadata, seq)` and `publish_event(event)`.
+        """
+        self.publishers = list(publishers)
+
+    @property
+    def seq(self) -> int:
+        return self.publishers[0].seq
+
+    def publish_frame(self, metadata: dict, seq: Optional[int] = None) -> int:
+        seq = self.publishers[0].publish_frame(metadata, seq)
+        for publisher in self.publishers[1:]:
+            publisher.publish_frame(metadata, seq)
+        return seq
+
+    def publish_event(self, event: dict):
+        for publisher in self.publishers:
+            publisher.publish_event(event)
+
+    def __call__(self, record: dict):
+        """Track summary sink: forward finished tracks as events."""
+        self.publish_event(dict(record, type="track_ended"))
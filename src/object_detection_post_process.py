@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 from utils.toolbox import id_to_color
 from speed_estimation import SpeedEstimationManager
+from metadata_channel import build_frame_metadata
 import time
 from collections import defaultdict
 
@@ -89,6 +90,16 @@ class LoiteringDetectionManager:
         time_elapsed = current_time - self.track_start_times[track_id]
         return time_elapsed > self._loitering_threshold
 
+    def get_memory_stats(self):
+        """
+        Get the number of tracks held in the loitering maps
+        """
+        return {
+            "track_start_frames": len(self.track_start_frames),
+            "track_start_times": len(self.track_start_times),
+            "current_frame": self.current_frame
+        }
+
     def cleanup_missing_tracks(self, current_track_ids):
         """
         Remove tracks that are no longer present
@@ -112,7 +123,10 @@ def inference_result_handler(original_frame, infer_results, labels, config_data,
                             pixel_distance=0.01, speed_estimation=False, speed_manager=None,
                             target_labels=None, loitering_detection=False,
                             loitering_manager=None, loitering_threshold=10.0,
-                            enable_person_only=False):
+                            enable_person_only=False, line_counter=None, lane_manager=None,
+                            heatmap_manager=None, summary_manager=None, time_series=None,
+                            metadata_publisher=None, render=True, overlay_renderer=None, metrics=None,
+                            frame_trace=None, detections=None, overlay_items=None):
     """
     Processes inference results and draw detections (with optional tracking).
 
@@ -126,6 +140,20 @@ def inference_result_handler(original_frame, infer_results, labels, config_data,
         camera_height (int): Camera resolution height in pixels.
         pixel_distance (float): Real-world distance per pixel in meters.
         speed_estimation (bool): Whether to enable speed estimation.
+        line_counter (LineCrossingManager, optional): Counter for virtual line crossings.
+        lane_manager (LaneStatisticsManager, optional): Per-lane traffic statistics.
+        heatmap_manager (OccupancyHeatmapManager, optional): Occupancy heatmap accumulator.
+        summary_manager (TrackSummaryManager, optional): Per-track running summaries.
+        time_series (TimeSeriesStore, optional): Rolling count and speed time series.
+        metadata_publisher (MetadataHub, optional): Channel receiving per-frame metadata and events.
+        render (bool): Whether to draw overlays; False leaves drawing to the client.
+        overlay_renderer (OverlayRenderer, optional): Cached renderer used instead of per-object drawing.
+        metrics (PipelineMetrics, optional): Receives the tracking and render stage latencies.
+        frame_trace (FrameTrace, optional): Trace of this frame, receives the tracking and render spans.
+        detections (dict, optional): Detections already decoded by `extract_detections`; infer_results is
+            then ignored.
+        overlay_items (tuple, optional): Lists filled with the overlays instead of drawing them, see
+            `draw_detections`.
 
     Returns:
         np.ndarray: Frame with detections or tracks drawn.
@@ -152,7 +180,8 @@ def inference_result_handler(original_frame, infer_results, labels, config_data,
         if enable_person_only and person_class_index == -1:
             loitering_detection = False
 
-    detections = extract_detections(original_frame, infer_results, config_data, labels, target_labels)  #should return dict with boxes, classes, scores
+    if detections is None:
+        detections = extract_detections(original_frame, infer_results, config_data, labels, target_labels)  #should return dict with boxes, classes, scores
     frame_with_detections = draw_detections(detections, original_frame, labels,
                                           tracker=tracker, speed_manager=speed_manager,
                                           target_labels=target_labels,
@@ -160,28 +189,34 @@ def inference_result_handler(original_frame, infer_results, labels, config_data,
                                           loitering_manager=loitering_manager,
                                           loitering_threshold=loitering_threshold,
                                           enable_person_only=enable_person_only,
-                                          person_class_index=person_class_index)
+                                          person_class_index=person_class_index,
+                                          line_counter=line_counter,
+                                          lane_manager=lane_manager,
+                                          heatmap_manager=heatmap_manager,
+                                          summary_manager=summary_manager,
+                                          time_series=time_series,
+                                          metadata_publisher=metadata_publisher,
+                                          render=render,
+                                          overlay_renderer=overlay_renderer,
+                                          metrics=metrics,
+                                          frame_trace=frame_trace,
+                                          overlay_items=overlay_items)
     return frame_with_detections
 
 
-def draw_detection(image: np.ndarray, box: list, labels: list, score: float, color: tuple, track=False, speed=None, is_loitering=False):
+def detection_texts(labels: list, score: float, track=False, speed=None):
     """
-    Draw box and label for one detection.
+    Compose the label texts drawn for one detection.
 
     Args:
-        image (np.ndarray): Image to draw on.
-        box (list): Bounding box coordinates.
         labels (list): List of labels (1 or 2 elements).
-        score (float): Detection score.
-        color (tuple): Color for the bounding box.
+        score (float): Detection score in percent.
         track (bool): Whether to include tracking info.
         speed (float): Speed in km/h, if available.
-    """
-    ymin, xmin, ymax, xmax = map(int, box)
-    cv2.rectangle(image, (xmin, ymin), (xmax, ymax), color, 2)
-    font = cv2.FONT_HERSHEY_SIMPLEX
 
-    # Compose texts
+    Returns:
+        tuple: Top text and bottom text (None when not tracking).
+    """
     # Include speed in the top text if available
     if speed is not None:
         top_text = f"{labels[0]}: {score:.1f}% {speed:.1f}km/h" if not track or len(labels) == 2 else f"{score:.1f}% {speed:.1f}km/h"
@@ -196,6 +231,29 @@ def draw_detection(image: np.ndarray, box: list, labels: list, score: float, col
         else:
             bottom_text = labels[0]
 
+    return top_text, bottom_text
+
+
+def draw_detection(image: np.ndarray, box: list, labels: list, score: float, color: tuple, track=False, speed=None, is_loitering=False):
+    """
+    Draw box and label for one detection.
+
+    Args:
+        image (np.ndarray): Image to draw on.
+        box (list): Bounding box coordinates.
+        labels (list): List of labels (1 or 2 elements).
+        score (float): Detection score.
+        color (tuple): Color for the bounding box.
+        track (bool): Whether to include tracking info.
+        speed (float): Speed in km/h, if available.
+    """
+    ymin, xmin, ymax, xmax = map(int, box)
+    cv2.rectangle(image, (xmin, ymin), (xmax, ymax), color, 2)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+
+    # Compose texts
+    top_text, bottom_text = detection_texts(labels, score, track=track, speed=speed)
+
     # Set colors
     text_color = (255, 255, 255)  # white
     border_color = (0, 0, 0)      # black
@@ -314,7 +372,10 @@ def extract_detections(image: np.ndarray, detections: list, config_data, labels,
 
 
 def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None, speed_manager=None, target_labels=None,
-                    loitering_detection=False, loitering_manager=None, loitering_threshold=10.0, enable_person_only=False, person_class_index=-1):
+                    loitering_detection=False, loitering_manager=None, loitering_threshold=10.0, enable_person_only=False, person_class_index=-1,
+                    line_counter=None, lane_manager=None, heatmap_manager=None, summary_manager=None,
+                    time_series=None, metadata_publisher=None, render=True, overlay_renderer=None,
+                    metrics=None, frame_trace=None, overlay_items=None):
     """
     Draw detections or tracking results on the image.
 
@@ -326,6 +387,22 @@ def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None,
         tracker (BYTETracker, optional): ByteTrack tracker instance.
         speed_manager (SpeedEstimationManager, optional): Speed estimation manager for speed calculation.
         target_labels (list): List of class names to detect.
+        line_counter (LineCrossingManager, optional): Counter for virtual line crossings.
+        lane_manager (LaneStatisticsManager, optional): Per-lane traffic statistics.
+        heatmap_manager (OccupancyHeatmapManager, optional): Occupancy heatmap accumulator.
+        summary_manager (TrackSummaryManager, optional): Per-track running summaries.
+        time_series (TimeSeriesStore, optional): Rolling count and speed time series.
+        metadata_publisher (MetadataHub, optional): Channel receiving per-frame metadata and events.
+        render (bool): Whether to draw overlays. When False the frame is left untouched and
+            clients draw the overlays from the published metadata instead.
+        overlay_renderer (OverlayRenderer, optional): Cached renderer drawing all overlays of the frame
+            in one batch instead of per-object `draw_detection` calls.
+        metrics (PipelineMetrics, optional): Receives the tracking and render stage latencies.
+        frame_trace (FrameTrace, optional): Trace of this frame, receives the tracking and render spans.
+            Drawing is spread over the function, so the render span is its summed time ending here.
+        overlay_items (tuple, optional): Five lists (boxes, colours, top texts, bottom texts, loitering
+            flags) receiving the objects to draw instead of drawing them, so the frame can be rendered
+            later with `render_overlays`, e.g. by another thread. Requires render=True.
 
     Returns:
         np.ndarray: Annotated image.
@@ -365,6 +442,29 @@ def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None,
     classes = target_classes_filtered
     num_detections = len(target_boxes)
 
+    # Time spent drawing, summed over the frame for the render stage metric
+    render_start = time.perf_counter()
+    render_time = 0.0
+
+    # Overlays are only collected when the caller renders them later
+    deferred = overlay_items is not None
+    batched = deferred or overlay_renderer is not None
+
+    # Draw counting lines first so they stay visible on frames without detections
+    if render and not deferred and overlay_renderer is not None:
+        overlay_renderer.draw_zones(img_out, line_counter=line_counter, lane_manager=lane_manager)
+    elif render and not deferred:
+        if line_counter is not None:
+            line_counter.draw_lines(img_out)
+        if lane_manager is not None:
+            lane_manager.draw_lanes(img_out)
+
+    render_time += time.perf_counter() - render_start
+
+    # Objects queued for the cached renderer: boxes, colours, top/bottom texts, loitering flags
+    if not deferred:
+        overlay_items = ([], [], [], [], [])
+
     if tracker:
         dets_for_tracker = []
 
@@ -374,12 +474,27 @@ def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None,
             score = scores[idx]
             dets_for_tracker.append([*box, score])
 
-        #skip tracking if no detections passed
+        #skip track analytics if no detections passed
         if not dets_for_tracker:
+            # The tracker still ages its lost tracks, so they are removed (and summarized) while the scene is empty
+            tracker.update(np.empty((0, 5)))
+            # An empty frame still counts towards the analytics' time windows
+            update_track_analytics(img_out.shape, [], [], [], [], line_counter=line_counter,
+                                   lane_manager=lane_manager, heatmap_manager=heatmap_manager,
+                                   time_series=time_series, metadata_publisher=metadata_publisher)
+            if metadata_publisher is not None:
+                metadata_publisher.publish_frame(build_frame_metadata([], [], [], [], frame_shape=img_out.shape))
+            record_render_time(render_time, render and not deferred, metrics, frame_trace)
             return img_out
 
         #run BYTETracker and get active tracks
+        tracking_start = time.perf_counter()
         online_targets = tracker.update(np.array(dets_for_tracker))
+        tracking_end = time.perf_counter()
+        if metrics is not None:
+            metrics.observe("tracking", tracking_end - tracking_start)
+        if frame_trace is not None:
+            frame_trace.mark("tracking", tracking_start, tracking_end)
 
         # Update loitering manager with the current frame count
         if loitering_manager:
@@ -387,6 +502,8 @@ def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None,
 
         #draw tracked bounding boxes with ID labels
         current_track_ids = set()
+        track_ids, footpoints, track_classes, track_speeds, track_loitering = [], [], [], [], []
+        track_boxes, track_class_ids, track_scores = [], [], []
         for track in online_targets:
             track_id = track.track_id  #unique tracker ID
             x1, y1, x2, y2 = track.tlbr  #bounding box (top-left, bottom-right)
@@ -426,24 +543,180 @@ def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None,
                     if smoothed_speed is not None:
                         display_speed = smoothed_speed
 
+                # Collect footpoint (bottom-center) for the per-frame track analytics.
+                # Boxes keep the model's [ymin, xmin, ymax, xmax] order, so x is the mean of
+                # the 2nd/4th values and the bottom edge is the 3rd.
+                track_ids.append(track_id)
+                footpoints.append(((y1 + y2) / 2, x2))
+                track_classes.append(labels[classes[best_idx]])
+                track_speeds.append(display_speed)
+                track_loitering.append(is_loitering)
+                # Metadata boxes are in image [x1, y1, x2, y2] order
+                track_boxes.append([ymin, xmin, ymax, xmax])
+                track_class_ids.append(classes[best_idx])
+                track_scores.append(track.score)
+
                 # Only draw pedestrian detections with tracking info and speed
-                draw_detection(img_out, [xmin, ymin, xmax, ymax], [labels[classes[best_idx]], f"ID {track_id}"],
-                               track.score * 100.0, color, track=True, speed=display_speed, is_loitering=is_loitering)
+                render_start = time.perf_counter()
+                if render and batched:
+                    queue_overlay_item(overlay_items, [ymin, xmin, ymax, xmax], color,
+                                       detection_texts([labels[classes[best_idx]], f"ID {track_id}"], track.score * 100.0,
+                                                       track=True, speed=display_speed), is_loitering)
+                elif render:
+                    draw_detection(img_out, [xmin, ymin, xmax, ymax], [labels[classes[best_idx]], f"ID {track_id}"],
+                                   track.score * 100.0, color, track=True, speed=display_speed, is_loitering=is_loitering)
+                render_time += time.perf_counter() - render_start
 
         # Clean up the loitering manager with tracks that are no longer present
         if loitering_manager:
             loitering_manager.cleanup_missing_tracks(current_track_ids)
 
+        update_track_analytics(img_out.shape, track_ids, footpoints, track_classes, track_speeds,
+                               track_loitering=track_loitering, line_counter=line_counter,
+                               lane_manager=lane_manager, heatmap_manager=heatmap_manager,
+                               summary_manager=summary_manager, time_series=time_series,
+                               metadata_publisher=metadata_publisher)
+
+        if metadata_publisher is not None:
+            metadata_publisher.publish_frame(build_frame_metadata(
+                track_ids, track_boxes, track_class_ids, track_scores,
+                speeds=track_speeds, loitering=track_loitering, frame_shape=img_out.shape))
 
     else:
         #No tracking — draw raw model detections (only pedestrians and cars)
-        for idx in range(num_detections):
+        render_start = time.perf_counter()
+        for idx in range(num_detections if render else 0):
             color = (0, 255, 0)  # Green color for all normal detections
-            draw_detection(img_out, boxes[idx], [labels[classes[idx]]], scores[idx] * 100.0, color, is_loitering=False)
+            if batched:
+                box = boxes[idx]
+                queue_overlay_item(overlay_items, [box[1], box[0], box[3], box[2]], color,
+                                   detection_texts([labels[classes[idx]]], scores[idx] * 100.0), False)
+            else:
+                draw_detection(img_out, boxes[idx], [labels[classes[idx]]], scores[idx] * 100.0, color, is_loitering=False)
+        render_time += time.perf_counter() - render_start
+
+        if time_series is not None:
+            time_series.update([labels[c] for c in classes], [], active_tracks=0)
+
+        if metadata_publisher is not None:
+            metadata_publisher.publish_frame(build_frame_metadata(
+                None, [[b[1], b[0], b[3], b[2]] for b in boxes], classes, scores, frame_shape=img_out.shape))
+
+    if deferred:
+        return img_out
+    if overlay_renderer is not None and overlay_items[0]:
+        render_start = time.perf_counter()
+        overlay_renderer.render_detections(img_out, *overlay_items)
+        render_time += time.perf_counter() - render_start
+    record_render_time(render_time, render, metrics, frame_trace)
 
     return img_out
 
 
+def render_overlays(image, overlay_items, overlay_renderer, line_counter=None, lane_manager=None):
+    """
+    Draw the zones and the overlays collected by `draw_detections(..., overlay_items=...)`.
+
+    Args:
+        image (np.ndarray): Frame to draw on.
+        overlay_items (tuple): Boxes, colours, top texts, bottom texts and loitering flags.
+        overlay_renderer (OverlayRenderer): Renderer owned by the calling thread (its caches are not thread-safe).
+        line_counter (LineCrossingManager, optional): Counting lines to draw.
+        lane_manager (LaneStatisticsManager, optional): Lanes to draw.
+
+    Returns:
+        np.ndarray: The annotated frame.
+    """
+    overlay_renderer.draw_zones(image, line_counter=line_counter, lane_manager=lane_manager)
+    if overlay_items[0]:
+        overlay_renderer.render_detections(image, *overlay_items)
+    return image
+
+
+def record_render_time(render_time, render, metrics=None, frame_trace=None):
+    """
+    Report the summed drawing time of one frame.
+
+    Args:
+        render_time (float): Seconds spent drawing.
+        render (bool): Whether overlays were drawn at all.
+        metrics (PipelineMetrics, optional): Receives the render stage latency.
+        frame_trace (FrameTrace, optional): Receives a render span of that length ending now.
+    """
+    if not render:
+        return
+    if metrics is not None:
+        metrics.observe("render", render_time)
+    if frame_trace is not None:
+        end = time.perf_counter()
+        frame_trace.mark("render", end - render_time, end)
+
+
+def queue_overlay_item(overlay_items, box, color, texts, is_loitering):
+    """
+    Queue one object for batched drawing by the overlay renderer.
+
+    Args:
+        overlay_items (tuple): Lists of boxes, colours, top texts, bottom texts and loitering flags.
+        box (list): [x1, y1, x2, y2] in image coordinates.
+        color (tuple): Box colour.
+        texts (tuple): Top and bottom text from `detection_texts`.
+        is_loitering (bool): Whether to draw the loitering banner.
+    """
+    boxes, colors, top_texts, bottom_texts, loitering = overlay_items
+    boxes.append(box)
+    colors.append(color)
+    top_texts.append(texts[0])
+    bottom_texts.append(texts[1])
+    loitering.append(is_loitering)
+
+
+def update_track_analytics(frame_shape, track_ids, footpoints, track_classes, track_speeds, track_loitering=None,
+                           line_counter=None, lane_manager=None, heatmap_manager=None, summary_manager=None,
+                           time_series=None, metadata_publisher=None):
+    """
+    Feed the footpoints of all active tracks of one frame to the analytics managers.
+
+    Args:
+        frame_shape (tuple): Shape of the frame the footpoints refer to.
+        track_ids (list): Track IDs of the active tracks.
+        footpoints (list): Bottom-center (x, y) of each track's box.
+        track_classes (list): Class name of each track.
+        track_speeds (list): Smoothed speed in km/h of each track, or None.
+        track_loitering (list, optional): Loitering flag of each track.
+        line_counter (LineCrossingManager, optional): Counter for virtual line crossings.
+        lane_manager (LaneStatisticsManager, optional): Per-lane traffic statistics.
+        heatmap_manager (OccupancyHeatmapManager, optional): Occupancy heatmap accumulator.
+        summary_manager (TrackSummaryManager, optional): Per-track running summaries.
+        time_series (TimeSeriesStore, optional): Rolling count and speed time series.
+        metadata_publisher (MetadataHub, optional): Channel receiving line crossing events.
+    """
+    points = np.array(footpoints, dtype=np.float64).reshape(-1, 2)
+
+    # Test all track movements against all counting lines in one pass
+    if line_counter is not None:
+        events = line_counter.update(track_ids, points, track_classes, track_speeds)
+        if metadata_publisher is not None:
+            for event in events:
+                metadata_publisher.publish_event(dict(event, type="line_crossing"))
+
+    # Bin all footpoints to lanes with one raster lookup
+    if lane_manager is not None:
+        lane_manager.update(track_ids, points, track_speeds, frame_shape)
+
+    if heatmap_manager is not None:
+        heatmap_manager.update(points, track_classes, frame_shape)
+
+    # Lanes double as zones for the per-track dwell times
+    if summary_manager is not None:
+        zones = lane_manager.get_track_lanes(track_ids) if lane_manager is not None else None
+        summary_manager.update(track_ids, footpoints, track_classes, track_speeds,
+                               zones=zones, loitering=track_loitering)
+
+    if time_series is not None:
+        time_series.update(track_classes, track_speeds)
+
+
 def find_best_matching_detection_index(track_box, detection_boxes):
     """
     Finds the index of the detection box with the highest IoU relative to the given tracking box.
@@ -0,0 +1,173 @@
+"""
+Decaying occupancy heatmap accumulated from tracked object footpoints
+"""
+import math
+import time
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+class OccupancyHeatmapManager:
+    """
+    Accumulates where tracked objects stand on a low-resolution grid with one layer per class.
+
+    Values decay exponentially over time. The decay is applied lazily: instead of
+    rescaling every cell each frame, new samples are added divided by a global scale
+    factor, and the true value of a cell is `grid * scale`. The grids are only
+    rescaled when the scale factor becomes too small, so per-frame cost is
+    O(active tracks) rather than O(pixels).
+    """
+    def __init__(self, cell_size: int = 16, half_life: float = 300.0, max_sample_interval: float = 0.5,
+                 renormalize_below: float = 1e-6):
+        """
+        Initialize occupancy heatmap manager
+
+        Args:
+            cell_size (int): Pixel size of one grid cell
+            half_life (float): Time in seconds after which accumulated occupancy has decayed to half
+            max_sample_interval (float): Maximum time in seconds credited to a single observation
+            renormalize_below (float): Scale factor below which the grids are rescaled in place
+        """
+        self.cell_size = cell_size
+        self.half_life = half_life
+        self.max_sample_interval = max_sample_interval
+        self.renormalize_below = renormalize_below
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all layers
+        """
+        with self.lock:
+            self.layers: Dict[str, np.ndarray] = {}  # class name -> grid in scaled units
+            self.grid_shape = None
+            self.frame_shape = None
+            self.reference_time = None  # Time at which scale == 1
+            self.scale = 1.0
+            self.last_timestamp = None
+
+    def _scale_at(self, timestamp: float) -> float:
+        """
+        Get the decay factor accumulated since the reference time
+        """
+        return math.exp(-(timestamp - self.reference_time) * math.log(2) / self.half_life)
+
+    def update(self, footpoints: np.ndarray, class_names: Sequence[str], frame_shape: Tuple[int, ...],
+               timestamp: Optional[float] = None):
+        """
+        Add the footpoints of all active tracks to the heatmap
+
+        Args:
+            footpoints: Array of shape (N, 2) with the current footpoint of each track
+            class_names: Class name of each track
+            frame_shape: Shape of the frame the footpoints refer to
+            timestamp: Timestamp of the frame, if None uses current time
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.lock:
+            height, width = frame_shape[:2]
+            if self.frame_shape != (height, width):
+                # Resolution changed (or first frame): start over with a matching grid
+                self.layers = {}
+                self.frame_shape = (height, width)
+                self.grid_shape = (-(-height // self.cell_size), -(-width // self.cell_size))
+                self.reference_time = timestamp
+                self.scale = 1.0
+
+            weight = 0.0
+            if self.last_timestamp is not None:
+                weight = min(max(timestamp - self.last_timestamp, 0.0), self.max_sample_interval)
+            self.last_timestamp = timestamp
+
+            self.scale = self._scale_at(timestamp)
+            if self.scale < self.renormalize_below:
+                for grid in self.layers.values():
+                    grid *= self.scale
+                self.reference_time = timestamp
+                self.scale = 1.0
+
+            points = np.asarray(footpoints, dtype=np.float64).reshape(-1, 2)
+            if weight <= 0.0 or len(points) == 0:
+                return
+
+            rows = np.clip((points[:, 1] // self.cell_size).astype(np.int64), 0, self.grid_shape[0] - 1)
+            cols = np.clip((points[:, 0] // self.cell_size).astype(np.int64), 0, self.grid_shape[1] - 1)
+            names = np.asarray(class_names)
+            scaled_weight = weight / self.scale
+            for class_name in set(class_names):
+                layer = self.layers.get(class_name)
+                if layer is None:
+                    layer = self.layers[class_name] = np.zeros(self.grid_shape, dtype=np.float64)
+                mask = names == class_name
+                np.add.at(layer, (rows[mask], cols[mask]), scaled_weight)
+
+    def get_grid(self, class_name: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Get the decayed occupancy grid in seconds
+
+        Args:
+            class_name: Layer to return, or None for the sum of all layers
+
+        Returns:
+            np.ndarray: Occupancy grid, or None if nothing has been accumulated yet
+        """
+        with self.lock:
+            return self._get_grid(class_name)
+
+    def _get_grid(self, class_name: Optional[str]) -> Optional[np.ndarray]:
+        """Same as get_grid; the caller holds the lock."""
+        if self.grid_shape is None:
+            return None
+        scale = self._scale_at(time.time())
+        if class_name is not None:
+            layer = self.layers.get(class_name)
+            return np.zeros(self.grid_shape) if layer is None else layer * scale
+        grid = np.zeros(self.grid_shape)
+        for layer in self.layers.values():
+            grid += layer
+        return grid * scale
+
+    def get_classes(self):
+        """
+        Get the class names that have a heatmap layer
+        """
+        with self.lock:
+            return sorted(self.layers)
+
+    def render(self, class_name: Optional[str] = None, background: Optional[np.ndarray] = None,
+               alpha: float = 0.5) -> Optional[np.ndarray]:
+        """
+        Render the heatmap as a colour image, optionally blended over a frame
+
+        Args:
+            class_name: Layer to render, or None for all classes combined
+            background: Frame to overlay the heatmap on, or None for the heatmap alone
+            alpha: Heatmap opacity when overlaying
+
+        Returns:
+            np.ndarray: BGR image at frame resolution, or None if nothing has been accumulated yet
+        """
+        # The frame shape changes together with the grid on a resolution change
+        with self.lock:
+            grid = self._get_grid(class_name)
+            frame_shape = self.frame_shape
+        if grid is None:
+            return None
+
+        peak = grid.max()
+        normalized = (grid / peak * 255.0) if peak > 0 else grid
+        heat = cv2.applyColorMap(normalized.astype(np.uint8), cv2.COLORMAP_JET)
+
+        if background is None:
+            height, width = frame_shape
+            return cv2.resize(heat, (width, height), interpolation=cv2.INTER_LINEAR)
+
+        height, width = background.shape[:2]
+        heat = cv2.resize(heat, (width, height), interpolation=cv2.INTER_LINEAR)
+        return cv2.addWeighted(background, 1.0 - alpha, heat, alpha, 0)
@@ -0,0 +1,325 @@
+"""
+Cached overlay renderer for server-side drawing of detections, lines and lanes
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from lane_statistics import LANE_COLOR
+from line_crossing import LINE_COLOR
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+WHITE = (255, 255, 255)
+LOITERING_COLOR = (0, 0, 255)
+LOITERING_TEXT = "Loitering"
+
+
+class TextSprite:
+    """
+    Pre-rasterized text with separate alpha masks for the black border and the fill
+    """
+    __slots__ = ("border", "fill", "width", "height", "ascent", "pad")
+
+    def __init__(self, border: np.ndarray, fill: np.ndarray, ascent: int, pad: int):
+        self.border = border
+        self.fill = fill
+        self.height, self.width = border.shape
+        self.ascent = ascent
+        self.pad = pad
+
+
+class OverlayRenderer:
+    """
+    Draws detection overlays with cached rasterization.
+
+    Text is composed from per-glyph sprites (rendered once with `cv2.putText`) and whole
+    strings that repeat across frames ("ID 12", class labels, "Loitering") are cached as
+    finished sprites, so a frame costs a few small alpha blends instead of two anti-aliased
+    `putText` calls per text item. Boxes of the same colour are drawn with one
+    `cv2.polylines` call. Static layers (counting line and lane outlines) are rendered once
+    into a cached layer and blended onto each frame until their inputs change; the live
+    counts next to them are drawn as sprites.
+    """
+    def __init__(self, font_scale: float = 0.5, max_cached_texts: int = 2048):
+        """
+        Args:
+            font_scale (float): Font scale of all labels.
+            max_cached_texts (int): Maximum number of whole-string sprites kept (least recently used are evicted).
+        """
+        self.font_scale = font_scale
+        self.max_cached_texts = max_cached_texts
+        self.glyphs: Dict[str, TextSprite] = {}
+        self.texts: "OrderedDict[str, TextSprite]" = OrderedDict()
+        self.layers: Dict[Hashable, Tuple[Hashable, np.ndarray, np.ndarray, np.ndarray]] = {}
+
+        # Line box shared by all glyphs so they can be placed side by side
+        (_, self.ascent), self.descent = cv2.getTextSize("Ag|", FONT, font_scale, 1)
+        self.pad = 2
+        (self.loitering_width, self.loitering_height), _ = cv2.getTextSize(LOITERING_TEXT, FONT, font_scale, 1)
+
+    def _glyph(self, char: str) -> TextSprite:
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            (width, _), _ = cv2.getTextSize(char, FONT, self.font_scale, 1)
+            shape = (self.ascent + self.descent + 2 * self.pad, width + 2 * self.pad)
+            origin = (self.pad, self.pad + self.ascent)
+            border = np.zeros(shape, dtype=np.uint8)
+            fill = np.zeros(shape, dtype=np.uint8)
+            cv2.putText(border, char, origin, FONT, self.font_scale, 255, 2, cv2.LINE_AA)
+            cv2.putText(fill, char, origin, FONT, self.font_scale, 255, 1, cv2.LINE_AA)
+            glyph = self.glyphs[char] = TextSprite(border, fill, self.ascent, self.pad)
+        return glyph
+
+    def text_sprite(self, text: str) -> TextSprite:
+        """
+        Get the sprite of a string, composing it from glyph sprites on a cache miss
+
+        Args:
+            text (str): Text to rasterize.
+
+        Returns:
+            TextSprite: Sprite with border and fill masks.
+        """
+        sprite = self.texts.get(text)
+        if sprite is not None:
+            self.texts.move_to_end(text)
+            return sprite
+
+        glyphs = [self._glyph(char) for char in text]
+        advances = [g.width - 2 * self.pad for g in glyphs]
+        height = self.ascent + self.descent + 2 * self.pad
+        border = np.zeros((height, sum(advances) + 2 * self.pad), dtype=np.uint8)
+        fill = np.zeros_like(border)
+        x = 0
+        for glyph, advance in zip(glyphs, advances):
+            # Neighbouring glyph boxes overlap by their padding, so combine instead of overwrite
+            np.maximum(border[:, x:x + glyph.width], glyph.border, out=border[:, x:x + glyph.width])
+            np.maximum(fill[:, x:x + glyph.width], glyph.fill, out=fill[:, x:x + glyph.width])
+            x += advance
+
+        sprite = self.texts[text] = TextSprite(border, fill, self.ascent, self.pad)
+        if len(self.texts) > self.max_cached_texts:
+            self.texts.popitem(last=False)
+        return sprite
+
+    def draw_text(self, image: np.ndarray, text: str, origin: Tuple[int, int], color: Tuple[int, int, int] = WHITE,
+                  border: bool = True):
+        """
+        Draw text at the same position `cv2.putText` would (origin is the bottom-left of the baseline)
+
+        Args:
+            image (np.ndarray): Image to draw on.
+            text (str): Text to draw.
+            origin (tuple): (x, y) of the text baseline start.
+            color (tuple): BGR fill colour.
+            border (bool): Whether to draw the black border.
+        """
+        if not text:
+            return
+        sprite = self.text_sprite(text)
+        x0 = int(origin[0]) - sprite.pad
+        y0 = int(origin[1]) - sprite.ascent - sprite.pad
+
+        # Clip the sprite to the image
+        h, w = image.shape[:2]
+        sx0, sy0 = max(0, -x0), max(0, -y0)
+        sx1, sy1 = min(sprite.width, w - x0), min(sprite.height, h - y0)
+        if sx0 >= sx1 or sy0 >= sy1:
+            return
+        roi = image[y0 + sy0:y0 + sy1, x0 + sx0:x0 + sx1]
+
+        out = roi.astype(np.float32)
+        if border:
+            alpha = sprite.border[sy0:sy1, sx0:sx1, None] * (1.0 / 255.0)
+            out *= 1.0 - alpha
+        alpha = sprite.fill[sy0:sy1, sx0:sx1, None] * (1.0 / 255.0)
+        out += (np.asarray(color, dtype=np.float32) - out) * alpha
+        roi[...] = out
+
+    def draw_boxes(self, image: np.ndarray, boxes: np.ndarray, colors: Sequence[Tuple[int, int, int]],
+                   thickness: int = 2):
+        """
+        Draw all boxes with one `cv2.polylines` call per distinct colour
+
+        Args:
+            image (np.ndarray): Image to draw on.
+            boxes (np.ndarray): Array of shape (N, 4) with [x1, y1, x2, y2] per box.
+            colors (list): BGR colour of each box.
+            thickness (int): Line thickness.
+        """
+        if len(boxes) == 0:
+            return
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+
+        by_color: Dict[tuple, List[np.ndarray]] = {}
+        for corner, color in zip(corners, colors):
+            by_color.setdefault(tuple(int(c) for c in color), []).append(corner)
+        for color, polygons in by_color.items():
+            cv2.polylines(image, polygons, True, color, thickness)
+
+    def draw_static_layer(self, image: np.ndarray, name: Hashable, key: Hashable,
+                          draw_fn: Callable[[np.ndarray], None]):
+        """
+        Composite a layer that only changes when `key` changes.
+
+        The layer is rendered by `draw_fn` onto a black and a white canvas; pixels that
+        differ from the background in either are part of the layer. A layer pixel of colour C
+        and coverage a is a*C on black and a*C + (1 - a)*255 on white, so anti-aliased edges
+        are blended onto later frames with their coverage instead of copied with the black.
+
+        Args:
+            image (np.ndarray): Image to draw on.
+            name (hashable): Layer name, each name caches one layer.
+            key (hashable): Value identifying the layer content; a new key re-renders the layer.
+            draw_fn (callable): Draws the layer onto the given image.
+        """
+        key = (key, image.shape)
+        cached = self.layers.get(name)
+        if cached is None or cached[0] != key:
+            black = np.zeros_like(image)
+            white = np.full_like(image, 255)
+            draw_fn(black)
+            draw_fn(white)
+            mask = np.any(black != 0, axis=2) | np.any(white != 255, axis=2)
+            index = np.flatnonzero(mask)
+            premultiplied = black.reshape(-1, image.shape[2])[index].astype(np.float32)
+            spread = white.reshape(-1, image.shape[2])[index].astype(np.float32) - premultiplied
+            alpha = np.clip(1.0 - spread.mean(axis=1, keepdims=True) / 255.0, 0.0, 1.0)
+            cached = self.layers[name] = (key, index, 1.0 - alpha, premultiplied)
+        _, index, transparency, premultiplied = cached
+        flat = image.reshape(-1, image.shape[2])
+        blended = flat[index] * transparency + premultiplied
+        flat[index] = np.minimum(blended + 0.5, 255.0).astype(np.uint8)
+
+    def draw_zones(self, image: np.ndarray, line_counter=None, lane_manager=None):
+        """
+        Draw the counting lines and lanes from cached layers
+
+        Args:
+            image (np.ndarray): Image to draw on.
+            line_counter (LineCrossingManager, optional): Counting lines; the live counts are drawn as sprites.
+            lane_manager (LaneStatisticsManager, optional): Lane outlines; the live counts are drawn as sprites.
+        """
+        if lane_manager is not None:
+            self.draw_static_layer(image, "lanes", lane_manager.version,
+                                   lambda canvas: lane_manager.draw_lanes(canvas, draw_counts=False))
+            for text, origin in lane_manager.get_count_labels():
+                self.draw_text(image, text, origin, LANE_COLOR)
+
+        if line_counter is not None:
+            self.draw_static_layer(image, "lines", line_counter.version,
+                                   lambda canvas: line_counter.draw_lines(canvas, draw_counts=False))
+            for text, origin in line_counter.get_count_labels():
+                self.draw_text(image, text, origin, LINE_COLOR)
+
+    def render_detections(self, image: np.ndarray, boxes: Sequence[Sequence[int]], colors: Sequence[tuple],
+                          top_texts: Sequence[str], bottom_texts: Sequence[Optional[str]],
+                          loitering: Sequence[bool]):
+        """
+        Draw the boxes and labels of all objects of a frame, laid out like `draw_detection`
+
+        Args:
+            image (np.ndarray): Image to draw on.
+            boxes (list): [x1, y1, x2, y2] of each object in image coordinates.
+            colors (list): BGR box colour of each object.
+            top_texts (list): Label drawn inside the top-left corner of each box.
+            bottom_texts (list): Label drawn inside the bottom-right corner (e.g. track ID), or None.
+            loitering (list): Whether to draw the loitering banner above each box.
+        """
+        self.draw_boxes(image, boxes, colors)
+        for (x1, y1, x2, y2), top, bottom, is_loitering in zip(boxes, top_texts, bottom_texts, loitering):
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            self.draw_text(image, top, (x1 + 4, y1 + 20))
+            if is_loitering:
+                banner_y = y1 - 5
+                cv2.rectangle(image, (x1, banner_y - self.loitering_height - 4),
+                              (x1 + self.loitering_width, banner_y + 4), LOITERING_COLOR, -1)
+                self.draw_text(image, LOITERING_TEXT, (x1, banner_y), border=False)
+            if bottom:
+                self.draw_text(image, bottom, (x2 - 50, y2 - 6))
+
+    def get_memory_stats(self) -> dict:
+        """
+        Get the sizes of the sprite and layer caches
+
+        Returns:
+            dict: Entry counts and approximate bytes of each cache.
+        """
+        sprites = list(self.glyphs.values()) + list(self.texts.values())
+        return {
+            "glyphs": len(self.glyphs),
+            "texts": len(self.texts),
+            "sprite_bytes": sum(s.border.nbytes + s.fill.nbytes for s in sprites),
+            "layers": len(self.layers),
+            "layer_bytes": sum(sum(array.nbytes for array in layer[1:]) for layer in self.layers.values())
+        }
+
+
+def benchmark(track_counts: Sequence[int] = (0, 5, 10, 25, 50, 100), iterations: int = 200,
+              frame_size: Tuple[int, int] = (720, 1280), seed: int = 0) -> List[dict]:
+    """
+    Measure overlay rendering time per frame with `draw_detection` and with the cached renderer
+
+    Args:
+        track_counts (list): Number of tracks per frame to measure.
+        iterations (int): Frames rendered per measurement.
+        frame_size (tuple): (height, width) of the frames.
+        seed (int): Seed of the random boxes, scores and speeds.
+
+    Returns:
+        list: One dict per track count with the mean milliseconds of both renderers.
+    """
+    from object_detection_post_process import draw_detection, detection_texts
+
+    rng = np.random.default_rng(seed)
+    height, width = frame_size
+    frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    results = []
+    for count in track_counts:
+        x1 = rng.integers(0, width - 100, size=count)
+        y1 = rng.integers(30, height - 100, size=count)
+        boxes = np.stack([x1, y1, x1 + rng.integers(30, 100, size=count), y1 + rng.integers(30, 100, size=count)], axis=1)
+        loitering = rng.random(count) < 0.1
+        frames_scores = rng.uniform(50, 100, size=(iterations, count))
+        frames_speeds = rng.uniform(0, 60, size=(iterations, count))
+
+        timings = {}
+        for name in ("draw_detection", "overlay_renderer"):
+            renderer = OverlayRenderer()
+            start = time.perf_counter()
+            for i in range(iterations):
+                image = frame.copy()
+                colors = [LOITERING_COLOR if loitering[j] else (0, 255, 0) for j in range(count)]
+                if name == "draw_detection":
+                    for j in range(count):
+                        bx1, by1, bx2, by2 = boxes[j]
+                        draw_detection(image, [by1, bx1, by2, bx2], ["person", f"ID {j}"], frames_scores[i, j],
+                                       colors[j], track=True, speed=frames_speeds[i, j], is_loitering=loitering[j])
+                else:
+                    texts = [detection_texts(["person", f"ID {j}"], frames_scores[i, j], track=True,
+                                             speed=frames_speeds[i, j]) for j in range(count)]
+                    renderer.render_detections(image, boxes, colors, [t[0] for t in texts], [t[1] for t in texts],
+                                               loitering)
+            timings[name] = (time.perf_counter() - start) / iterations * 1000.0
+
+        # Frame copies are common to both, so subtract them
+        copy_start = time.perf_counter()
+        for _ in range(iterations):
+            frame.copy()
+        copy_ms = (time.perf_counter() - copy_start) / iterations * 1000.0
+        results.append({
+            "tracks": count,
+            "draw_detection_ms": round(timings["draw_detection"] - copy_ms, 3),
+            "overlay_renderer_ms": round(timings["overlay_renderer"] - copy_ms, 3)
+        })
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'tracks':>6} {'draw_detection ms':>18} {'overlay_renderer ms':>20}")
+    for row in benchmark():
+        print(f"{row['tracks']:>6} {row['draw_detection_ms']:>18.3f} {row['overlay_renderer_ms']:>20.3f}")
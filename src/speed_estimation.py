@@ -137,6 +137,19 @@ class SpeedEstimationManager:
         self.fps = fps  # Store fps at the manager level
         self.track_timestamps = {}  # Keep track of timestamps for each track
         
+    def get_memory_stats(self) -> dict:
+        """
+        Get the number of tracks and entries held in the speed histories
+        """
+        estimator = self.speed_estimator
+        return {
+            "position_history_tracks": len(estimator.position_history),
+            "position_history_entries": sum(len(h) for h in estimator.position_history.values()),
+            "speed_history_tracks": len(estimator.speed_history),
+            "speed_history_entries": sum(len(h) for h in estimator.speed_history.values()),
+            "track_timestamps": len(self.track_timestamps)
+        }
+
     def estimate_speed(self, track_id: int, bbox: List[float], 
                       frame_timestamp: Optional[float] = None) -> Optional[float]:
         """
@@ -0,0 +1,172 @@
+"""
+Registry of detection streams: each camera or video has its own pipeline, tracker, analytics and outputs
+"""
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_STREAM = "default"
+STREAM_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,32}")
+
+
+class DetectionStream:
+    """
+    State of one stream: its config and pipeline, the analytics managers the pipeline feeds
+    and the outputs (stream hub, metadata hub, track summaries, time series) read by the API.
+    """
+    def __init__(self, stream_id: str, config: dict, frame_hub, metadata_hub, track_summary_sink,
+                 time_series_store):
+        """
+        Args:
+            stream_id (str): Stream id, used in the /api/streams/<id>/... endpoints.
+            config (dict): Configuration of the stream.
+            frame_hub (FrameHub): Hub broadcasting the annotated video of the stream.
+            metadata_hub (MetadataHub): Socket.IO channel of the stream's per-frame metadata and events.
+            track_summary_sink (MemorySummarySink): Finished track summaries, kept across pipeline restarts.
+            time_series_store (TimeSeriesStore): Rolling counts/speeds, kept across pipeline restarts.
+        """
+        self.id = stream_id
+        self.config = config
+        self.config_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.is_running = False
+        # Thread of the current (or last) pipeline; it outlives is_running while the pipeline stops
+        self.pipeline_thread = None
+        self.last_config_update = time.time()
+
+        self.frame_hub = frame_hub
+        self.metadata_hub = metadata_hub
+        self.track_summary_sink = track_summary_sink
+        self.time_series_store = time_series_store
+
+        # Analytics and stage graph of the current (or last) pipeline
+        self.line_crossing_manager = None
+        self.lane_statistics_manager = None
+        self.heatmap_manager = None
+        self.graph = None
+        # Frames fully processed by the current (or last) pipeline, for throughput reporting
+        self.stats = {"started_at": None, "stopped_at": None, "frames": 0}
+        # Post-processing CPU time per frame (moving average) for each overlay mode
+        self.overlay_cpu_ms = {"server": None, "client": None, "headless": None}
+        # Last track id allocated by the stream's tracker, so ids keep increasing across restarts
+        self.track_count = 0
+
+        # Shared-memory rings the pipeline publishes into: to the web process, and to local readers
+        self.frame_ring = None
+        self.shared_frame_ring = None
+
+    def qualify(self, name: str) -> str:
+        """
+        Prefix a stage, queue or probe name with the stream id, so streams don't collide in
+        the shared metrics, watchdog and memory report. Names of the default stream are unchanged.
+        """
+        return name if self.id == DEFAULT_STREAM else f"{self.id}/{name}"
+
+    def is_pipeline_alive(self) -> bool:
+        """Returns:
+            bool: Whether the pipeline thread still runs, including while it stops and releases its resources.
+        """
+        return self.pipeline_thread is not None and self.pipeline_thread.is_alive()
+
+    def get_recent_fps(self) -> float:
+        """Returns:
+            float: Frames processed over the last complete second, 0 when stopped.
+        """
+        return self.time_series_store.get_recent_fps() if self.is_running else 0.0
+
+    def get_info(self) -> dict:
+        """Returns:
+            dict: Id, source, running state, recent FPS and processed frames of the stream.
+        """
+        return {
+            "id": self.id,
+            "video_source": self.config.get("video_source"),
+            "running": self.is_running,
+            "fps": self.get_recent_fps(),
+            "frames_processed": self.stats["frames"]
+        }
+
+
+class StreamRegistry:
+    """
+    Streams by id. The default stream always exists and backs the endpoints without a stream id.
+    """
+    def __init__(self, factory: Callable[[str, dict], DetectionStream], default: DetectionStream,
+                 max_streams: int = 4):
+        """
+        Args:
+            factory (Callable): Creates a stream from its id and config.
+            default (DetectionStream): The default stream.
+            max_streams (int): Maximum number of streams, including the default one.
+        """
+        self.factory = factory
+        self.max_streams = max_streams
+        self.streams: Dict[str, DetectionStream] = {default.id: default}
+        self.lock = threading.Lock()
+
+    @property
+    def default(self) -> DetectionStream:
+        return self.streams[DEFAULT_STREAM]
+
+    def get(self, stream_id: str) -> Optional[DetectionStream]:
+        with self.lock:
+            return self.streams.get(stream_id)
+
+    def create(self, stream_id: str, config: dict) -> DetectionStream:
+        """
+        Add a stream.
+
+        Args:
+            stream_id (str): Letters, digits, "_" and "-", up to 32 characters.
+            config (dict): Configuration of the stream.
+
+        Returns:
+            DetectionStream: The new stream.
+
+        Raises:
+            ValueError: If the id is invalid or taken, or the stream limit is reached.
+        """
+        if not isinstance(stream_id, str) or not STREAM_ID_PATTERN.fullmatch(stream_id):
+            raise ValueError("Stream id must be 1-32 letters, digits, '_' or '-'")
+        with self.lock:
+            if stream_id in self.streams:
+                raise ValueError(f"Stream '{stream_id}' already exists")
+            if len(self.streams) >= self.max_streams:
+                raise ValueError(f"At most {self.max_streams} streams are supported")
+            stream = self.factory(stream_id, config)
+            self.streams[stream_id] = stream
+            return stream
+
+    def get_or_create(self, stream_id: str) -> DetectionStream:
+        """Get a stream, creating it with an empty config if needed (web process side of a pipeline process)."""
+        with self.lock:
+            stream = self.streams.get(stream_id)
+            if stream is None:
+                stream = self.streams[stream_id] = self.factory(stream_id, {})
+            return stream
+
+    def remove(self, stream_id: str) -> DetectionStream:
+        """
+        Remove a stopped stream.
+
+        Returns:
+            DetectionStream: The removed stream.
+
+        Raises:
+            KeyError: If the stream doesn't exist.
+            ValueError: If it is the default stream, still running or still stopping.
+        """
+        with self.lock:
+            stream = self.streams[stream_id]
+            if stream_id == DEFAULT_STREAM:
+                raise ValueError("The default stream can't be removed")
+            if stream.is_running:
+                raise ValueError(f"Stream '{stream_id}' is running, stop it first")
+            if stream.is_pipeline_alive():
+                raise ValueError(f"Stream '{stream_id}' is still stopping")
+            return self.streams.pop(stream_id)
+
+    def list(self) -> List[DetectionStream]:
+        with self.lock:
+            return list(self.streams.values())
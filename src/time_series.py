@@ -0,0 +1,254 @@
+"""
+In-memory multi-resolution time series of object counts and speeds
+"""
+import time
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class RollupLevel:
+    """
+    Fixed-size ring buffer of aggregates at one time resolution.
+
+    Each slot remembers which bucket it holds, so stale slots are recognized
+    (and reset on write) without a background sweep.
+    """
+    def __init__(self, resolution: float, num_buckets: int, max_classes: int, speed_bins: int):
+        """
+        Args:
+            resolution (float): Bucket length in seconds
+            num_buckets (int): Number of buckets kept (retention = resolution * num_buckets)
+            max_classes (int): Number of class columns
+            speed_bins (int): Number of speed histogram bins
+        """
+        self.resolution = resolution
+        self.num_buckets = num_buckets
+        self.bucket_ids = np.full(num_buckets, -1, dtype=np.int64)
+        self.frames = np.zeros(num_buckets, dtype=np.int64)
+        self.active_sum = np.zeros(num_buckets, dtype=np.int64)
+        self.active_max = np.zeros(num_buckets, dtype=np.int64)
+        self.class_sum = np.zeros((num_buckets, max_classes), dtype=np.int64)
+        self.class_max = np.zeros((num_buckets, max_classes), dtype=np.int64)
+        self.speed_sum = np.zeros(num_buckets, dtype=np.float64)
+        self.speed_count = np.zeros(num_buckets, dtype=np.int64)
+        self.speed_hist = np.zeros((num_buckets, speed_bins), dtype=np.int64)
+
+    @property
+    def retention(self) -> float:
+        return self.resolution * self.num_buckets
+
+    def add(self, timestamp: float, active: int, class_counts: np.ndarray, speed_sum: float,
+            speed_count: int, speed_hist: np.ndarray):
+        """
+        Fold one frame into the bucket of the given timestamp
+        """
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.num_buckets
+        if self.bucket_ids[slot] != bucket:
+            self.bucket_ids[slot] = bucket
+            self.frames[slot] = 0
+            self.active_sum[slot] = 0
+            self.active_max[slot] = 0
+            self.class_sum[slot] = 0
+            self.class_max[slot] = 0
+            self.speed_sum[slot] = 0.0
+            self.speed_count[slot] = 0
+            self.speed_hist[slot] = 0
+
+        self.frames[slot] += 1
+        self.active_sum[slot] += active
+        self.active_max[slot] = max(self.active_max[slot], active)
+        self.class_sum[slot] += class_counts
+        np.maximum(self.class_max[slot], class_counts, out=self.class_max[slot])
+        self.speed_sum[slot] += speed_sum
+        self.speed_count[slot] += speed_count
+        self.speed_hist[slot] += speed_hist
+
+    def snapshot(self, start: float, end: float) -> Tuple[np.ndarray, dict]:
+        """
+        Copy the valid buckets overlapping [start, end]
+
+        Returns:
+            Tuple of the bucket ids and a dict of copied field arrays
+        """
+        first = max(int(start // self.resolution), int(end // self.resolution) - self.num_buckets + 1)
+        ids = np.arange(first, int(end // self.resolution) + 1, dtype=np.int64)
+        slots = ids % self.num_buckets
+        valid = self.bucket_ids[slots] == ids
+        ids, slots = ids[valid], slots[valid]
+        return ids, {
+            "frames": self.frames[slots],
+            "active_sum": self.active_sum[slots],
+            "active_max": self.active_max[slots],
+            "class_sum": self.class_sum[slots],
+            "class_max": self.class_max[slots],
+            "speed_sum": self.speed_sum[slots],
+            "speed_count": self.speed_count[slots],
+            "speed_hist": self.speed_hist[slots]
+        }
+
+
+class TimeSeriesStore:
+    """
+    Keeps per-class counts, active-track counts and speed distributions at several resolutions.
+
+    Every frame is folded into the current bucket of each resolution (1 s / 1 min / 1 h by
+    default), so the coarser levels are rolled up incrementally. All levels are fixed-size
+    ring buffers, so memory is bounded regardless of uptime. Queries copy only the requested
+    buckets under a short lock and do all formatting outside of it.
+    """
+    DEFAULT_LEVELS = ((1.0, 3600), (60.0, 1440), (3600.0, 168))  # 1 h of seconds, 1 day of minutes, 1 week of hours
+
+    def __init__(self, levels: Sequence[Tuple[float, int]] = DEFAULT_LEVELS, max_classes: int = 16,
+                 speed_bin_width: float = 5.0, max_speed: float = 150.0):
+        """
+        Initialize time series store
+
+        Args:
+            levels (list): (resolution in seconds, number of buckets) of each rollup level, finest first
+            max_classes (int): Maximum number of distinct classes tracked
+            speed_bin_width (float): Width of one speed histogram bin in km/h
+            max_speed (float): Upper edge of the speed histogram in km/h (faster speeds go to the last bin)
+        """
+        self.max_classes = max_classes
+        self.speed_bin_width = speed_bin_width
+        self.speed_bins = max(1, int(np.ceil(max_speed / speed_bin_width)))
+        self.levels = [RollupLevel(res, n, max_classes, self.speed_bins) for res, n in levels]
+        self.class_index: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def get_memory_stats(self) -> dict:
+        """
+        Get the fixed size of the ring buffers
+        """
+        arrays = [value for level in self.levels for value in vars(level).values() if isinstance(value, np.ndarray)]
+        return {"levels": len(self.levels), "buffer_bytes": int(sum(a.nbytes for a in arrays)),
+                "classes": len(self.class_index)}
+
+    def update(self, class_names: Sequence[str], speeds: Sequence[Optional[float]],
+               active_tracks: Optional[int] = None, timestamp: Optional[float] = None):
+        """
+        Record the objects of one processed frame
+
+        Args:
+            class_names: Class name of each object in the frame
+            speeds: Speed in km/h of each object, or None if unknown
+            active_tracks: Number of active tracks, defaults to the number of objects
+            timestamp: Timestamp of the frame, if None uses current time
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if active_tracks is None:
+            active_tracks = len(class_names)
+
+        values = np.array([s for s in speeds if s is not None], dtype=np.float64)
+        bins = np.clip((values / self.speed_bin_width).astype(np.int64), 0, self.speed_bins - 1)
+        speed_hist = np.bincount(bins, minlength=self.speed_bins)
+        speed_sum = float(values.sum())
+
+        with self.lock:
+            class_counts = np.zeros(self.max_classes, dtype=np.int64)
+            for name in class_names:
+                idx = self.class_index.get(name)
+                if idx is None:
+                    if len(self.class_index) >= self.max_classes:
+                        continue
+                    idx = self.class_index[name] = len(self.class_index)
+                class_counts[idx] += 1
+
+            for level in self.levels:
+                level.add(timestamp, active_tracks, class_counts, speed_sum, len(values), speed_hist)
+
+    def _select_level(self, start: float, end: float, resolution: Optional[float]) -> RollupLevel:
+        """
+        Pick the requested level, or the finest level whose retention covers the range
+        """
+        if resolution is not None:
+            for level in self.levels:
+                if level.resolution == resolution:
+                    return level
+            raise ValueError(f"Unknown resolution {resolution}, available: {self.resolutions()}")
+
+        now = time.time()
+        for level in self.levels:
+            if now - start <= level.retention:
+                return level
+        return self.levels[-1]
+
+    def resolutions(self) -> List[float]:
+        return [level.resolution for level in self.levels]
+
+    def _percentile(self, hist: np.ndarray, q: float) -> Optional[float]:
+        total = hist.sum()
+        if total == 0:
+            return None
+        cumulative = np.cumsum(hist)
+        idx = min(int(np.searchsorted(cumulative, total * q / 100.0)), len(hist) - 1)
+        return (idx + 0.5) * self.speed_bin_width
+
+    def query(self, start: float, end: float, resolution: Optional[float] = None,
+              percentiles: Sequence[float] = (50, 90)) -> dict:
+        """
+        Get the aggregated points between two timestamps
+
+        Args:
+            start: Range start (unix seconds)
+            end: Range end (unix seconds)
+            resolution: Bucket length in seconds, or None to pick automatically
+            percentiles: Speed percentiles to report per point
+
+        Returns:
+            dict: Resolution and list of points, oldest first
+        """
+        level = self._select_level(start, end, resolution)
+        with self.lock:
+            ids, data = level.snapshot(start, end)
+            class_names = sorted(self.class_index, key=self.class_index.get)
+
+        now = time.time()
+        points = []
+        for i, bucket in enumerate(ids.tolist()):
+            frames = int(data["frames"][i])
+            if frames == 0:
+                continue
+            bucket_start = bucket * level.resolution
+            # The current bucket is still filling, so its rate uses the elapsed part only
+            elapsed = min(level.resolution, max(now - bucket_start, 1e-3))
+            speed_count = int(data["speed_count"][i])
+            points.append({
+                "t": bucket_start,
+                "frames": frames,
+                "fps": round(frames / elapsed, 2),
+                "active_tracks": {
+                    "mean": round(float(data["active_sum"][i]) / frames, 2),
+                    "max": int(data["active_max"][i])
+                },
+                "classes": {
+                    name: {
+                        "mean": round(float(data["class_sum"][i][idx]) / frames, 2),
+                        "max": int(data["class_max"][i][idx])
+                    }
+                    for idx, name in enumerate(class_names)
+                },
+                "speed": {
+                    "count": speed_count,
+                    "mean": round(float(data["speed_sum"][i]) / speed_count, 2) if speed_count else None,
+                    **{f"p{int(q)}": self._percentile(data["speed_hist"][i], q) for q in percentiles}
+                }
+            })
+
+        return {"resolution": level.resolution, "start": start, "end": end, "points": points}
+
+    def get_recent_fps(self) -> float:
+        """
+        Get the processed frame rate over the last complete second
+        """
+        level = self.levels[0]
+        now = time.time()
+        with self.lock:
+            ids, data = level.snapshot(now - level.resolution, now - level.resolution)
+        if len(ids) == 0:
+            return 0.0
+        return float(data["frames"][0]) / level.resolution
@@ -0,0 +1,296 @@
+"""
+Incremental per-track summaries emitted when the tracker removes a track
+"""
+import json
+import math
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimator using the P-square algorithm (Jain & Chlamtac, 1985).
+
+    Keeps five markers regardless of the number of samples, so each update is O(1).
+    """
+    __slots__ = ("p", "count", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p: float):
+        """
+        Initialize the estimator
+
+        Args:
+            p (float): Quantile to estimate, in (0, 1)
+        """
+        self.p = p
+        self.count = 0
+        self.heights: List[float] = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float):
+        """
+        Add one observation
+        """
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            q.append(x)
+            if self.count == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Adjust the three middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                parabolic = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                n[i] += step
+
+    def value(self) -> Optional[float]:
+        """
+        Get the current quantile estimate, or None if no observations were added
+        """
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            ordered = sorted(self.heights)
+            return ordered[min(int(self.p * len(ordered)), len(ordered) - 1)]
+        return self.heights[2]
+
+
+class TrackSummary:
+    """
+    Running aggregates of a single track, updated in O(1) per observation
+    """
+    __slots__ = ("track_id", "first_seen", "last_seen", "observations", "class_votes",
+                 "start_point", "last_point", "path_length", "speed_count", "speed_sum",
+                 "speed_max", "speed_quantile", "zone_dwell", "last_zone", "loitering")
+
+    def __init__(self, track_id: int, timestamp: float, footpoint: tuple, speed_percentile: float):
+        self.track_id = track_id
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.observations = 0
+        self.class_votes: Dict[str, int] = {}
+        self.start_point = footpoint
+        self.last_point = footpoint
+        self.path_length = 0.0
+        self.speed_count = 0
+        self.speed_sum = 0.0
+        self.speed_max = None
+        self.speed_quantile = P2Quantile(speed_percentile / 100.0)
+        self.zone_dwell: Dict[str, float] = {}
+        self.last_zone = None
+        self.loitering = False
+
+    def update(self, timestamp: float, footpoint: tuple, class_name: str, speed: Optional[float],
+               zone: Optional[str], loitering: bool):
+        """
+        Fold one observation into the running aggregates
+        """
+        self.observations += 1
+        self.class_votes[class_name] = self.class_votes.get(class_name, 0) + 1
+        self.path_length += math.hypot(footpoint[0] - self.last_point[0], footpoint[1] - self.last_point[1])
+        self.last_point = footpoint
+
+        if speed is not None:
+            self.speed_count += 1
+            self.speed_sum += speed
+            self.speed_max = speed if self.speed_max is None else max(self.speed_max, speed)
+            self.speed_quantile.add(speed)
+
+        # Dwell time is credited for intervals spent entirely in the same zone
+        if zone is not None and zone == self.last_zone:
+            self.zone_dwell[zone] = self.zone_dwell.get(zone, 0.0) + (timestamp - self.last_seen)
+        self.last_zone = zone
+        self.last_seen = timestamp
+        self.loitering = self.loitering or loitering
+
+    def to_record(self, end_reason: str) -> dict:
+        """
+        Build the compact record emitted for this track
+        """
+        percentile_key = f"p{int(round(self.speed_quantile.p * 100))}"
+        quantile = self.speed_quantile.value()
+        return {
+            "track_id": self.track_id,
+            "class": max(self.class_votes, key=self.class_votes.get) if self.class_votes else None,
+            "class_votes": dict(self.class_votes),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "duration": round(self.last_seen - self.first_seen, 3),
+            "observations": self.observations,
+            "start_point": [round(v, 1) for v in self.start_point],
+            "end_point": [round(v, 1) for v in self.last_point],
+            "path_length_px": round(self.path_length, 1),
+            "speed": None if self.speed_count == 0 else {
+                "mean": round(self.speed_sum / self.speed_count, 2),
+                "max": round(self.speed_max, 2),
+                percentile_key: round(quantile, 2)
+            },
+            "zone_dwell": {zone: round(seconds, 2) for zone, seconds in self.zone_dwell.items()},
+            "loitering": self.loitering,
+            "end_reason": end_reason
+        }
+
+
+class MemorySummarySink:
+    """
+    Keeps the most recent track summaries in memory
+    """
+    def __init__(self, maxlen: int = 1000):
+        """
+        Args:
+            maxlen (int): Maximum number of records to keep
+        """
+        self.records = deque(maxlen=maxlen)
+        self.lock = threading.Lock()
+
+    def __call__(self, record: dict):
+        with self.lock:
+            self.records.append(record)
+
+    def get_records(self, limit: int = 100) -> List[dict]:
+        """
+        Get the most recent records, oldest first
+        """
+        with self.lock:
+            return list(self.records)[-limit:]
+
+
+class JsonLinesSummarySink:
+    """
+    Appends track summaries to a JSON Lines file, kept open until `close`
+    """
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the file to append to
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        # Line-buffered, so each summary is on disk once its track ends
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def __call__(self, record: dict):
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class TrackSummaryManager:
+    """
+    Maintains per-track running aggregates and emits a record to the sinks when a track ends
+    """
+    def __init__(self, sinks: Optional[Sequence[Callable[[dict], None]]] = None, speed_percentile: float = 85.0):
+        """
+        Initialize track summary manager
+
+        Args:
+            sinks (list): Callables receiving each finished track record
+            speed_percentile (float): Speed percentile to estimate per track
+        """
+        self.sinks = list(sinks or [])
+        self.speed_percentile = speed_percentile
+        self.summaries: Dict[int, TrackSummary] = {}
+
+    def add_sink(self, sink: Callable[[dict], None]):
+        """
+        Register an additional sink for finished track records
+        """
+        self.sinks.append(sink)
+
+    def update(self, track_ids: Sequence[int], footpoints: Sequence[tuple], class_names: Sequence[str],
+               speeds: Sequence[Optional[float]], zones: Optional[Sequence[Optional[str]]] = None,
+               loitering: Optional[Sequence[bool]] = None, timestamp: Optional[float] = None):
+        """
+        Update the summaries of all active tracks of one frame
+
+        Args:
+            track_ids: Track IDs of the active tracks
+            footpoints: Footpoint (x, y) of each track
+            class_names: Class name of each track
+            speeds: Speed in km/h of each track, or None if unknown
+            zones: Zone (lane) name of each track, or None outside any zone
+            loitering: Loitering flag of each track
+            timestamp: Timestamp of the frame, if None uses current time
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        for i, track_id in enumerate(track_ids):
+            footpoint = (float(footpoints[i][0]), float(footpoints[i][1]))
+            summary = self.summaries.get(track_id)
+            if summary is None:
+                summary = self.summaries[track_id] = TrackSummary(track_id, timestamp, footpoint, self.speed_percentile)
+            summary.update(timestamp, footpoint, class_names[i], speeds[i],
+                           zones[i] if zones is not None else None,
+                           bool(loitering[i]) if loitering is not None else False)
+
+    def finalize(self, track_id: int, end_reason: str = "removed") -> Optional[dict]:
+        """
+        Emit the record of a finished track to all sinks and forget it
+
+        Args:
+            track_id: Unique identifier of the finished track
+            end_reason: Why the track ended
+
+        Returns:
+            dict: Emitted record, or None if the track was never observed
+        """
+        summary = self.summaries.pop(track_id, None)
+        if summary is None:
+            return None
+
+        record = summary.to_record(end_reason)
+        for sink in self.sinks:
+            try:
+                sink(record)
+            except Exception as e:
+                print(f"Track summary sink error: {e}")
+        return record
+
+    def on_track_removed(self, track):
+        """
+        Tracker callback invoked when a track is removed
+        """
+        self.finalize(track.track_id)
+
+    def flush(self, end_reason: str = "pipeline_stopped"):
+        """
+        Emit records for all tracks that are still open
+        """
+        for track_id in list(self.summaries):
+            self.finalize(track_id, end_reason)
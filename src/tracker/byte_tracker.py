@@ -48,10 +48,10 @@ class STrack(BaseTrack):
                 stracks[i].mean = mean
                 stracks[i].covariance = cov
 
-    def activate(self, kalman_filter, frame_id):
-        """Start a new tracklet"""
+    def activate(self, kalman_filter, frame_id, next_id=BaseTrack.next_id):
+        """Start a new tracklet, with an ID from `next_id` (by default the process-wide counter)"""
         self.kalman_filter = kalman_filter
-        self.track_id = self.next_id()
+        self.track_id = next_id()
         self.mean, self.covariance = self.kalman_filter.initiate(self.tlwh_to_xyah(self._tlwh))
 
         self.tracklet_len = 0
@@ -62,7 +62,7 @@ class STrack(BaseTrack):
         self.frame_id = frame_id
         self.start_frame = frame_id
 
-    def re_activate(self, new_track, frame_id, new_id=False):
+    def re_activate(self, new_track, frame_id, new_id=False, next_id=BaseTrack.next_id):
         self.mean, self.covariance = self.kalman_filter.update(
             self.mean, self.covariance, self.tlwh_to_xyah(new_track.tlwh)
         )
@@ -71,7 +71,7 @@ class STrack(BaseTrack):
         self.is_activated = True
         self.frame_id = frame_id
         if new_id:
-            self.track_id = self.next_id()
+            self.track_id = next_id()
         self.score = new_track.score
 
     def update(self, new_track, frame_id):
@@ -167,6 +167,12 @@ class BYTETracker(object):
         self.buffer_size = int(frame_rate / 30.0 * args.track_buffer)
         self.max_time_lost = self.buffer_size
         self.kalman_filter = KalmanFilter()
+        self.on_track_removed = None  # optional callback(track) invoked when a track is removed
+        self.track_count = 0  # IDs are allocated per tracker, so each stream numbers its tracks from 1
+
+    def next_id(self):
+        self.track_count += 1
+        return self.track_count
 
     def update(self, output_results):
         self.frame_id += 1
@@ -274,7 +280,7 @@ class BYTETracker(object):
             track = detections[inew]
             if track.score < self.det_thresh:
                 continue
-            track.activate(self.kalman_filter, self.frame_id)
+            track.activate(self.kalman_filter, self.frame_id, self.next_id)
             activated_starcks.append(track)
         """ Step 5: Update state"""
         for track in self.lost_stracks:
@@ -282,6 +288,10 @@ class BYTETracker(object):
                 track.mark_removed()
                 removed_stracks.append(track)
 
+        if self.on_track_removed is not None:
+            for track in removed_stracks:
+                self.on_track_removed(track)
+
         # print('Ramained match {} s'.format(t4-t3))
 
         self.tracked_stracks = [t for t in self.tracked_stracks if t.state == TrackState.Tracked]
@@ -297,6 +307,16 @@ class BYTETracker(object):
 
         return output_stracks
 
+    def get_memory_stats(self):
+        """Return the sizes of the track lists and the position histories they hold"""
+        stats = {}
+        for name, tracks in (("tracked", self.tracked_stracks), ("lost", self.lost_stracks),
+                             ("removed", self.removed_stracks)):
+            stats[f"{name}_stracks"] = len(tracks)
+            stats[f"{name}_history_entries"] = sum(len(t.position_history) for t in tracks)
+        stats["frame_id"] = self.frame_id
+        return stats
+
     def get_track_positions(self):
         """Return current positions of all active tracks"""
         positions = {}
@@ -0,0 +1,216 @@
+import threading
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class FrameHub:
+    """
+    Publish/subscribe hub for the annotated video stream.
+
+    The pipeline publishes each frame once; a dedicated encoder thread JPEG-encodes
+    the most recent frame once, and every subscriber reads the latest encoded bytes
+    by sequence number without consuming them for other subscribers. Encoding cost
+    is therefore independent of the number of viewers.
+
+    Publishing transfers ownership of the frame buffer to the hub (no copy is made).
+    Frames superseded by a newer one before the encoder picks them up are counted
+    as dropped-because-stale.
+    """
+
+    def __init__(self, jpeg_quality: int = 70, metrics=None, tracer=None):
+        """
+        Args:
+            jpeg_quality (int): JPEG quality used by the encoder (0-100).
+            metrics (PipelineMetrics, optional): Receives the encode latency and stale-frame drops.
+            tracer (FrameTracer, optional): Finishes the trace of each encoded frame.
+        """
+        self.jpeg_quality = jpeg_quality
+        self.metrics = metrics
+        self.tracer = tracer
+
+        self._frame_cond = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self._frame_trace = None
+        self._frame_seq = 0
+
+        self._jpeg_cond = threading.Condition()
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_seq = 0
+
+        self._encoder_thread = None
+        self._running = False
+
+        # Counters
+        self._published = 0
+        self._encoded = 0
+        self._dropped_stale = 0
+        self._delivered = 0
+        self._keepalives = 0
+        # Exponential moving average of the encoder's CPU time per frame
+        self._encode_cpu_ms = None
+
+    def start(self) -> None:
+        """Start the encoder thread if it is not running yet."""
+        if self._running:
+            return
+        self._running = True
+        self._encoder_thread = threading.Thread(target=self._encode_loop, name="frame-hub-encoder", daemon=True)
+        self._encoder_thread.start()
+
+    def stop(self) -> None:
+        """Stop the encoder thread."""
+        self._running = False
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        if self._encoder_thread is not None:
+            self._encoder_thread.join(timeout=1)
+
+    def publish(self, frame: np.ndarray, seq: Optional[int] = None, trace=None) -> int:
+        """
+        Publish a new annotated frame, transferring ownership of its buffer to the hub.
+
+        Args:
+            frame (np.ndarray): BGR frame. The hub keeps a reference, so the caller must not modify it afterwards.
+            seq (int, optional): Sequence number to tag the frame with, e.g. the one its metadata was
+                published under. Must increase; an out-of-order value falls back to the next number.
+            trace (FrameTrace, optional): Trace of the frame, completed once it is encoded.
+
+        Returns:
+            int: Sequence number of the published frame.
+        """
+        with self._frame_cond:
+            self._frame = frame
+            self._frame_trace = trace
+            self._frame_seq = max(seq, self._frame_seq + 1) if seq is not None else self._frame_seq + 1
+            self._published += 1
+            self._frame_cond.notify()
+            return self._frame_seq
+
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        """Returns:
+            np.ndarray or None: Most recently published raw frame.
+        """
+        with self._frame_cond:
+            return self._frame
+
+    def get_latest_jpeg(self) -> Tuple[int, Optional[bytes]]:
+        """Returns:
+            Tuple[int, Optional[bytes]]: Sequence number and bytes of the most recently encoded frame.
+        """
+        with self._jpeg_cond:
+            return self._jpeg_seq, self._jpeg
+
+    def wait_for_jpeg(self, last_seq: int, timeout: Optional[float] = None) -> Optional[Tuple[int, bytes]]:
+        """
+        Block until a frame newer than `last_seq` has been encoded.
+
+        Args:
+            last_seq (int): Sequence number of the last frame the subscriber received.
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            Tuple[int, bytes] or None: Sequence number and JPEG bytes, or None on timeout.
+        """
+        with self._jpeg_cond:
+            if not self._jpeg_cond.wait_for(lambda: self._jpeg_seq > last_seq, timeout=timeout):
+                return None
+            return self._jpeg_seq, self._jpeg
+
+    def record_delivery(self, keepalive: bool = False) -> None:
+        """
+        Count a frame handed to a subscriber.
+
+        Args:
+            keepalive (bool): Whether the frame was a re-send of already delivered bytes.
+        """
+        with self._jpeg_cond:
+            if keepalive:
+                self._keepalives += 1
+            else:
+                self._delivered += 1
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Published, encoded, dropped-because-stale and delivered frame counts.
+        """
+        with self._frame_cond:
+            published, encoded, dropped = self._published, self._encoded, self._dropped_stale
+        with self._jpeg_cond:
+            delivered, keepalives = self._delivered, self._keepalives
+            encode_cpu_ms = self._encode_cpu_ms
+        return {
+            "published": published,
+            "encoded": encoded,
+            "dropped_stale": dropped,
+            "delivered": delivered,
+            "keepalives": keepalives,
+            "encode_cpu_ms": None if encode_cpu_ms is None else round(encode_cpu_ms, 3)
+        }
+
+    def get_memory_stats(self) -> dict:
+        """Returns:
+            dict: Bytes held by the latest raw frame and the latest encoded JPEG.
+        """
+        with self._frame_cond:
+            frame_bytes = self._frame.nbytes if self._frame is not None else 0
+        with self._jpeg_cond:
+            jpeg_bytes = len(self._jpeg) if self._jpeg is not None else 0
+        return {"frame_bytes": frame_bytes, "jpeg_bytes": jpeg_bytes}
+
+    def clear(self) -> None:
+        """Drop the latest frame and encoded bytes, e.g. when the pipeline stops."""
+        with self._frame_cond:
+            self._frame = None
+            self._frame_trace = None
+        with self._jpeg_cond:
+            self._jpeg = None
+
+    def _encode_loop(self) -> None:
+        """Encode the most recent frame whenever a new one is published (latest wins)."""
+        encoded_seq = 0
+        # Frames published up to the last pick-up; sequence numbers can skip frames dropped before the hub
+        picked_up = 0
+        while self._running:
+            with self._frame_cond:
+                self._frame_cond.wait_for(lambda: self._frame_seq > encoded_seq or not self._running)
+                if not self._running:
+                    break
+                frame, seq, trace = self._frame, self._frame_seq, self._frame_trace
+                # Frames published since the last pick-up were never encoded
+                stale = max(self._published - picked_up - 1, 0)
+                picked_up = self._published
+                self._dropped_stale += stale
+                if frame is not None:
+                    self._encoded += 1
+            encoded_seq = seq
+            if stale and self.metrics is not None:
+                self.metrics.drop("encode", stale)
+            if frame is None:
+                continue
+
+            try:
+                cpu_start = time.thread_time()
+                start = time.perf_counter()
+                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                end = time.perf_counter()
+                if self.metrics is not None:
+                    self.metrics.observe("encode", end - start)
+                if trace is not None and self.tracer is not None:
+                    trace.mark("encode", start, end)
+                    self.tracer.finish(trace)
+                cpu_ms = (time.thread_time() - cpu_start) * 1000.0
+            except Exception as e:
+                print(f"Frame encoding error: {e}")
+                time.sleep(0.1)
+                continue
+            if not ret:
+                continue
+
+            with self._jpeg_cond:
+                self._jpeg = buffer.tobytes()
+                self._jpeg_seq = seq
+                self._encode_cpu_ms = cpu_ms if self._encode_cpu_ms is None else 0.95 * self._encode_cpu_ms + 0.05 * cpu_ms
+                self._jpeg_cond.notify_all()
@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+QUEUE_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class FrameQueue:
+    """
+    Bounded inter-stage queue with a drop policy and an age limit.
+
+    When the queue is full, "block" makes the producer wait (lossless backpressure),
+    "drop_oldest" evicts the oldest queued item and "drop_newest" discards the new one.
+    Independently, items whose capture timestamp is older than `max_age_ms` are
+    discarded by the consumer instead of being processed late. None (the end-of-stream
+    signal) is never dropped and always accepted.
+
+    Drops are counted per reason and reported to the pipeline metrics under the queue name.
+    Implements the subset of the `queue.Queue` interface used by the pipeline.
+    """
+
+    def __init__(self, name: str, maxsize: int = 8, policy: str = "block", max_age_ms: Optional[float] = None,
+                 timestamp_fn: Optional[Callable[[Any], Optional[float]]] = None, metrics=None):
+        """
+        Args:
+            name (str): Queue name used for the drop counters.
+            maxsize (int): Maximum number of queued items.
+            policy (str): "block", "drop_oldest" or "drop_newest".
+            max_age_ms (float, optional): Discard items captured longer ago than this.
+            timestamp_fn (Callable, optional): Returns the perf_counter capture time of an item (or None).
+            metrics (PipelineMetrics, optional): Receives the drop counts.
+
+        Raises:
+            ValueError: If the policy or size is invalid.
+        """
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}', expected one of {QUEUE_POLICIES}")
+        if maxsize < 1:
+            raise ValueError("Queue maxsize must be at least 1")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.max_age = max_age_ms / 1000.0 if max_age_ms else None
+        self.timestamp_fn = timestamp_fn
+        self.metrics = metrics
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._put = 0
+        self._got = 0
+        self._dropped_full = 0
+        self._dropped_stale = 0
+        self._blocked_seconds = 0.0
+
+    def _drop(self, reason: str) -> None:
+        # Called with the condition held
+        if reason == "full":
+            self._dropped_full += 1
+        else:
+            self._dropped_stale += 1
+        if self.metrics is not None:
+            self.metrics.drop(self.name)
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Enqueue an item according to the policy.
+
+        Args:
+            item: Item to enqueue, or None to signal the end of the stream.
+            block (bool): With the "block" policy, wait for space instead of raising at once.
+            timeout (float, optional): Maximum seconds to wait for space.
+
+        Raises:
+            queue.Full: With the "block" policy, if no space became available.
+        """
+        with self._cond:
+            if item is not None and len(self._items) >= self.maxsize:
+                if self.policy == "drop_newest":
+                    self._drop("full")
+                    return
+                if self.policy == "drop_oldest":
+                    while len(self._items) >= self.maxsize and self._items[0] is not None:
+                        self._items.popleft()
+                        self._drop("full")
+                else:
+                    if not block:
+                        raise queue.Full
+                    start = time.monotonic()
+                    full = not self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout)
+                    self._blocked_seconds += time.monotonic() - start
+                    if full:
+                        raise queue.Full
+            self._items.append(item)
+            self._put += 1
+            self._cond.notify_all()
+
+    def put_nowait(self, item: Any) -> None:
+        self.put(item, block=False)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """
+        Dequeue the oldest item that is not older than the age limit.
+
+        Args:
+            block (bool): Wait for an item instead of raising at once.
+            timeout (float, optional): Maximum seconds to wait.
+
+        Returns:
+            The item (None signals the end of the stream).
+
+        Raises:
+            queue.Empty: If no item became available.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                while not self._items:
+                    if not block:
+                        raise queue.Empty
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise queue.Empty
+                    self._cond.wait(remaining)
+                item = self._items.popleft()
+                self._cond.notify_all()
+                if item is not None and self.max_age is not None and self.timestamp_fn is not None:
+                    captured_at = self.timestamp_fn(item)
+                    if captured_at is not None and time.perf_counter() - captured_at > self.max_age:
+                        self._drop("stale")
+                        continue
+                self._got += 1
+                return item
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def drain(self, keep: int = 1) -> int:
+        """
+        Drop the oldest items until at most `keep` remain, keeping the end-of-stream signal.
+
+        Args:
+            keep (int): Number of newest items to keep.
+
+        Returns:
+            int: Number of dropped items.
+        """
+        dropped = 0
+        with self._cond:
+            kept = deque(item for item in self._items if item is None)
+            items = [item for item in self._items if item is not None]
+            for _ in items[:max(len(items) - keep, 0)]:
+                self._drop("full")
+                dropped += 1
+            kept.extendleft(reversed(items[max(len(items) - keep, 0):]))
+            self._items = kept
+            self._cond.notify_all()
+        return dropped
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Policy, depth and put/get/drop counts, and the total time producers spent blocked.
+        """
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "maxsize": self.maxsize,
+                "max_age_ms": None if self.max_age is None else self.max_age * 1000.0,
+                "depth": len(self._items),
+                "put": self._put,
+                "got": self._got,
+                "dropped_full": self._dropped_full,
+                "dropped_stale": self._dropped_stale,
+                "blocked_s": round(self._blocked_seconds, 3)
+            }
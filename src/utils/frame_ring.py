@@ -0,0 +1,292 @@
+import json
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Union
+
+import numpy as np
+
+# Ring header: magic, layout version, slot count, metadata capacity, frame capacity, last committed sequence number
+RING_MAGIC = b"YFRG"
+RING_VERSION = 1
+RING_HEADER = struct.Struct("<4sHHIQQ")
+RING_HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 20
+
+# Slot header: sequence number, wall-clock timestamp, frame sequence number of the application,
+# frame height, width and channels, frame and metadata lengths. The sequence number is repeated
+# at CHECK_SEQ_OFFSET so readers can detect a slot overwritten while they copied it
+SLOT_HEADER = struct.Struct("<QdqIIIQI")
+SLOT_HEADER_SIZE = 64
+CHECK_SEQ_OFFSET = 56
+SEQ = struct.Struct("<Q")
+
+
+class RingFrame:
+    """
+    One frame read from a FrameRing.
+    """
+    __slots__ = ("seq", "frame_seq", "timestamp", "frame", "metadata")
+
+    def __init__(self, seq: int, frame_seq: int, timestamp: float, frame: Optional[np.ndarray],
+                 metadata: Optional[dict]):
+        self.seq = seq
+        self.frame_seq = frame_seq
+        self.timestamp = timestamp
+        self.frame = frame
+        self.metadata = metadata
+
+
+class FrameRing:
+    """
+    Fixed-slot ring of raw frames and their metadata in named shared memory.
+
+    A single writer fills the slots round-robin and commits each one by storing its
+    sequence number in the slot header (before and after the payload) and then in the
+    ring header. Readers never wait for each other or hold back the writer: they pick
+    the most recently committed slot (latest wins) and discard the copy if the writer
+    overwrote the slot meanwhile. Frames are uint8 arrays (e.g. BGR images); metadata
+    is stored as JSON. A slot without a frame carries metadata only.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        magic, version, self.slots, self.metadata_capacity, self.frame_capacity, _ = \
+            RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise ValueError(f"Shared memory '{shm.name}' is not a version {RING_VERSION} frame ring")
+        self.slot_size = -(-(SLOT_HEADER_SIZE + self.frame_capacity + self.metadata_capacity) // 64) * 64
+        self._write_seq = SEQ.unpack_from(shm.buf, WRITE_SEQ_OFFSET)[0]
+
+        # Counters of this side of the ring
+        self.written = 0
+        self.read = 0
+        self.skipped = 0
+        self.torn = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(cls, name: Optional[str] = None, slots: int = 4, frame_capacity: int = 1920 * 1080 * 3,
+               metadata_capacity: int = 256 * 1024) -> "FrameRing":
+        """
+        Create a ring, replacing a stale one left behind under the same name.
+
+        Args:
+            name (str, optional): Shared memory name, random if None.
+            slots (int): Number of slots; readers are torn only if the writer laps the whole ring during a copy.
+            frame_capacity (int): Maximum frame size in bytes.
+            metadata_capacity (int): Maximum size of the JSON metadata in bytes.
+
+        Returns:
+            FrameRing: The ring, owned by the caller (see `unlink`).
+        """
+        if slots < 2:
+            raise ValueError("A frame ring needs at least 2 slots")
+        slot_size = -(-(SLOT_HEADER_SIZE + frame_capacity + metadata_capacity) // 64) * 64
+        size = RING_HEADER_SIZE + slots * slot_size
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, RING_VERSION, slots, metadata_capacity, frame_capacity, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, untrack: bool = True) -> "FrameRing":
+        """
+        Attach to an existing ring as a writer or reader.
+
+        Args:
+            name (str): Shared memory name of the ring.
+            untrack (bool): Keep this process's resource tracker from removing the ring when the
+                process exits. Pass False in processes spawned by the creator, which share its tracker.
+
+        Returns:
+            FrameRing: The ring; closing it leaves the shared memory in place.
+
+        Raises:
+            FileNotFoundError: If no ring exists under that name.
+            ValueError: If the shared memory isn't a compatible frame ring.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        if untrack:
+            # Attaching registers the segment with this process's resource tracker, which would
+            # unlink it when the process exits; only the creator decides when it goes away
+            resource_tracker.unregister(shm._name, "shared_memory")
+        try:
+            return cls(shm, owner=False)
+        except ValueError:
+            shm.close()
+            raise
+
+    def _slot_offset(self, seq: int) -> int:
+        return RING_HEADER_SIZE + (seq % self.slots) * self.slot_size
+
+    def write(self, frame: Optional[np.ndarray], metadata: Union[dict, bytes, None] = None, frame_seq: int = 0) -> int:
+        """
+        Copy a frame and its metadata into the next slot and commit it.
+
+        Args:
+            frame (np.ndarray, optional): uint8 frame of shape (height, width) or (height, width, channels).
+            metadata (dict or bytes, optional): Metadata, serialized as JSON unless already bytes.
+            frame_seq (int): Application sequence number of the frame, e.g. the one its metadata was published under.
+
+        Returns:
+            int: Ring sequence number of the slot.
+
+        Raises:
+            ValueError: If the frame or metadata exceeds the slot capacity.
+        """
+        if frame is not None:
+            frame = np.ascontiguousarray(frame, dtype=np.uint8)
+            if frame.nbytes > self.frame_capacity:
+                raise ValueError(f"Frame of {frame.nbytes} bytes exceeds the ring capacity of {self.frame_capacity}")
+        if metadata is not None and not isinstance(metadata, bytes):
+            metadata = json.dumps(metadata).encode()
+        if metadata is not None and len(metadata) > self.metadata_capacity:
+            raise ValueError(f"Metadata of {len(metadata)} bytes exceeds the ring capacity of {self.metadata_capacity}")
+
+        buf = self.shm.buf
+        seq = self._write_seq + 1
+        offset = self._slot_offset(seq)
+        # Invalidate the slot first so a reader copying it notices the overwrite
+        SEQ.pack_into(buf, offset, 0)
+        SEQ.pack_into(buf, offset + CHECK_SEQ_OFFSET, 0)
+
+        data = offset + SLOT_HEADER_SIZE
+        frame_len = 0
+        height = width = channels = 0
+        if frame is not None:
+            frame_len = frame.nbytes
+            height, width = frame.shape[:2]
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            np.frombuffer(buf, dtype=np.uint8, count=frame_len, offset=data)[:] = frame.reshape(-1)
+        meta_len = 0
+        if metadata is not None:
+            meta_len = len(metadata)
+            meta_offset = data + self.frame_capacity
+            buf[meta_offset:meta_offset + meta_len] = metadata
+
+        SLOT_HEADER.pack_into(buf, offset, 0, time.time(), frame_seq, height, width, channels, frame_len, meta_len)
+        SEQ.pack_into(buf, offset + CHECK_SEQ_OFFSET, seq)
+        SEQ.pack_into(buf, offset, seq)
+        SEQ.pack_into(buf, WRITE_SEQ_OFFSET, seq)
+        self._write_seq = seq
+        self.written += 1
+        return seq
+
+    def latest_seq(self) -> int:
+        """Returns:
+            int: Sequence number of the most recently committed slot (0 before the first write).
+        """
+        return SEQ.unpack_from(self.shm.buf, WRITE_SEQ_OFFSET)[0]
+
+    def read_latest(self, last_seq: int = 0, copy: bool = True) -> Optional[RingFrame]:
+        """
+        Read the most recently committed slot if it is newer than `last_seq`.
+
+        Args:
+            last_seq (int): Ring sequence number of the last slot the reader received.
+            copy (bool): Copy the frame out of shared memory. A view stays valid only until
+                the writer wraps around to its slot, see `is_current`.
+
+        Returns:
+            RingFrame or None: The newest frame, or None if there is none or it was overwritten while reading.
+        """
+        buf = self.shm.buf
+        for _ in range(3):
+            seq = self.latest_seq()
+            if seq <= last_seq:
+                return None
+            offset = self._slot_offset(seq)
+            slot_seq, timestamp, frame_seq, height, width, channels, frame_len, meta_len = \
+                SLOT_HEADER.unpack_from(buf, offset)
+            if slot_seq != seq:
+                self.torn += 1
+                continue
+
+            data = offset + SLOT_HEADER_SIZE
+            frame = None
+            if frame_len:
+                frame = np.frombuffer(buf, dtype=np.uint8, count=frame_len, offset=data)
+                frame = frame.reshape((height, width, channels) if channels > 1 else (height, width))
+                if copy:
+                    frame = frame.copy()
+            metadata = bytes(buf[data + self.frame_capacity:data + self.frame_capacity + meta_len]) if meta_len else None
+
+            # The writer may have lapped the ring during the copy
+            if SEQ.unpack_from(buf, offset)[0] != seq or SEQ.unpack_from(buf, offset + CHECK_SEQ_OFFSET)[0] != seq:
+                self.torn += 1
+                continue
+            if last_seq:
+                self.skipped += seq - last_seq - 1
+            self.read += 1
+            return RingFrame(seq, frame_seq, timestamp, frame, json.loads(metadata) if metadata else None)
+        return None
+
+    def is_current(self, item: RingFrame) -> bool:
+        """
+        Check that the slot of a frame read without copying hasn't been overwritten yet.
+
+        Args:
+            item (RingFrame): Frame returned by `read_latest(copy=False)`.
+
+        Returns:
+            bool: True if the frame view still holds the data of that slot.
+        """
+        return SEQ.unpack_from(self.shm.buf, self._slot_offset(item.seq))[0] == item.seq
+
+    def wait(self, last_seq: int = 0, timeout: Optional[float] = None, poll_interval: float = 0.002,
+             copy: bool = True) -> Optional[RingFrame]:
+        """
+        Block until a slot newer than `last_seq` is committed and read it.
+
+        Args:
+            last_seq (int): Ring sequence number of the last slot the reader received.
+            timeout (float, optional): Maximum time to wait in seconds.
+            poll_interval (float): Seconds between checks of the ring header.
+            copy (bool): Copy the frame out of shared memory, see `read_latest`.
+
+        Returns:
+            RingFrame or None: The newest frame, or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            item = self.read_latest(last_seq, copy)
+            if item is not None:
+                return item
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Ring layout and this side's written/read/skipped/torn slot counts.
+        """
+        return {
+            "name": self.name,
+            "slots": self.slots,
+            "frame_capacity": self.frame_capacity,
+            "metadata_capacity": self.metadata_capacity,
+            "latest_seq": self.latest_seq(),
+            "written": self.written,
+            "read": self.read,
+            "skipped": self.skipped,
+            "torn": self.torn
+        }
+
+    def close(self) -> None:
+        """Detach from the shared memory."""
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Remove the shared memory (creator only); attached processes keep their mapping until they close it."""
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Reader client for the shared-memory frame ring published with the `shm_ring` option.
+
+Usage from another process on the same machine:
+
+    from utils.frame_ring_reader import FrameRingReader
+
+    with FrameRingReader("yolo_frames") as reader:
+        for item in reader:
+            # item.frame: BGR frame (None when the pipeline runs headless)
+            # item.metadata: {"seq", "ts", "size", "rows": [[id, x1, y1, x2, y2, cls, score, speed, loitering], ...]}
+            ...
+
+Or as a command line monitor: python src/utils/frame_ring_reader.py yolo_frames
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, Optional
+
+# Allow running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frame_ring import FrameRing, RingFrame
+
+
+class FrameRingReader:
+    """
+    Latest-wins reader of a frame ring: every read returns the newest frame, skipping the ones
+    published in between, so a slow reader never holds back the pipeline or other readers.
+
+    The ring is attached when it first appears and attached again after the writer has been
+    idle for a while, since a restarted pipeline replaces the shared memory under the same name.
+    """
+
+    def __init__(self, name: str, copy: bool = True, reattach_after: float = 2.0, poll_interval: float = 0.002):
+        """
+        Args:
+            name (str): Shared memory name of the ring (the `shm_ring` option).
+            copy (bool): Copy frames out of shared memory. With False, frames are zero-copy views that
+                stay valid only until the writer wraps around to their slot (see `is_current`).
+            reattach_after (float): Seconds without a new frame after which the ring is attached again.
+            poll_interval (float): Seconds between checks for a new frame.
+        """
+        self.name = name
+        self.copy = copy
+        self.reattach_after = reattach_after
+        self.poll_interval = poll_interval
+        self.ring: Optional[FrameRing] = None
+        self.last_seq = 0
+        self._last_frame_at = time.monotonic()
+
+    def _attach(self) -> bool:
+        try:
+            ring = FrameRing.attach(self.name)
+        except FileNotFoundError:
+            return False
+        if self.ring is not None:
+            if ring.latest_seq() < self.last_seq:
+                # Replaced by a new writer, whose sequence numbers start over
+                self.last_seq = 0
+            try:
+                self.ring.close()
+            except BufferError:
+                # Zero-copy frames of the old ring are still referenced; the mapping goes with them
+                pass
+        self.ring = ring
+        return True
+
+    def read(self, timeout: Optional[float] = None) -> Optional[RingFrame]:
+        """
+        Wait for a frame newer than the last one returned.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait, None to wait indefinitely.
+
+        Returns:
+            RingFrame or None: The newest frame (seq, frame_seq, timestamp, frame, metadata), or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if self.ring is None or now - self._last_frame_at > self.reattach_after:
+                self._last_frame_at = now
+                self._attach()
+            if self.ring is not None:
+                item = self.ring.read_latest(self.last_seq, self.copy)
+                if item is not None:
+                    self.last_seq = item.seq
+                    self._last_frame_at = now
+                    return item
+            if deadline is not None and now >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def is_current(self, item: RingFrame) -> bool:
+        """
+        Args:
+            item (RingFrame): Frame read with copy=False.
+
+        Returns:
+            bool: True if its zero-copy view hasn't been overwritten yet; check after using the view.
+        """
+        return self.ring is not None and self.ring.is_current(item)
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Ring layout and this reader's read/skipped/torn counts (empty before the ring appeared).
+        """
+        return self.ring.get_stats() if self.ring is not None else {}
+
+    def close(self) -> None:
+        """Detach from the ring (frames read with copy=False must be released first)."""
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __iter__(self) -> Iterator[RingFrame]:
+        while True:
+            yield self.read()
+
+    def __enter__(self) -> "FrameRingReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the frames and detections published to a frame ring.")
+    parser.add_argument("name", help="Shared memory name of the ring (the shm_ring option)")
+    parser.add_argument("--count", type=int, default=0, help="Stop after this many frames (0 runs until interrupted)")
+    args = parser.parse_args()
+
+    received = 0
+    started = time.monotonic()
+    with FrameRingReader(args.name, copy=False) as reader:
+        try:
+            for item in reader:
+                received += 1
+                shape = "headless" if item.frame is None else "x".join(str(d) for d in item.frame.shape)
+                objects = len(item.metadata["rows"]) if item.metadata else 0
+                age_ms = (time.time() - item.timestamp) * 1000.0
+                stats = reader.get_stats()
+                print(f"seq {item.seq} frame {item.frame_seq} {shape} objects {objects} age {age_ms:.1f} ms "
+                      f"skipped {stats['skipped']} rate {received / (time.monotonic() - started):.1f}/s")
+                del item
+                if args.count and received >= args.count:
+                    break
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class FrameTrace:
+    """
+    Small per-frame record carried through the pipeline queues.
+
+    Timestamps are `time.perf_counter()` values; each stage appends one
+    (name, start, end) span when the frame leaves it.
+    """
+    __slots__ = ("seq", "captured_at", "spans")
+
+    def __init__(self, seq: int, captured_at: float):
+        self.seq = seq
+        self.captured_at = captured_at
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def mark(self, stage: str, start: float, end: Optional[float] = None) -> None:
+        """
+        Record the time the frame spent in a stage.
+
+        Args:
+            stage (str): Stage name.
+            start (float): perf_counter value when the frame entered the stage.
+            end (float, optional): perf_counter value when it left, defaults to now.
+        """
+        self.spans.append((stage, start, time.perf_counter() if end is None else end))
+
+    @property
+    def latency(self) -> float:
+        """Returns:
+            float: Seconds from capture to the end of the last recorded stage.
+        """
+        return (self.spans[-1][2] if self.spans else self.captured_at) - self.captured_at
+
+
+class FrameTracer:
+    """
+    Creates frame traces, keeps recent glass-to-glass latencies and records traces on demand.
+
+    Latencies of the last `history` finished frames are always kept for percentiles.
+    Full traces are only retained while a recording is active, and are exported in
+    the Chrome trace-event format (viewable in chrome://tracing or Perfetto).
+    """
+
+    def __init__(self, history: int = 1000, max_recorded: int = 20000):
+        """
+        Args:
+            history (int): Number of recent frame latencies kept for percentiles.
+            max_recorded (int): Maximum number of traces kept by one recording.
+        """
+        self.max_recorded = max_recorded
+        self._seq = 0
+        self._latencies = deque(maxlen=history)
+        self._recording: Optional[List[FrameTrace]] = None
+        self._recording_until = 0.0
+        self._lock = threading.Lock()
+
+    def new_trace(self, captured_at: Optional[float] = None) -> FrameTrace:
+        """
+        Start the trace of a newly captured frame.
+
+        Args:
+            captured_at (float, optional): perf_counter value of the capture, defaults to now.
+
+        Returns:
+            FrameTrace: Trace to carry along with the frame.
+        """
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        return FrameTrace(seq, time.perf_counter() if captured_at is None else captured_at)
+
+    def finish(self, trace: Optional[FrameTrace]) -> None:
+        """
+        Complete a trace once its frame has left the last stage.
+
+        Args:
+            trace (FrameTrace or None): Finished trace (None is ignored).
+        """
+        if trace is None:
+            return
+        with self._lock:
+            self._latencies.append(trace.latency)
+            if self._recording is not None:
+                if trace.captured_at <= self._recording_until and len(self._recording) < self.max_recorded:
+                    self._recording.append(trace)
+
+    def record(self, duration: float) -> List[FrameTrace]:
+        """
+        Record the traces of all frames captured during the next `duration` seconds.
+
+        Blocks for the duration plus a short grace period for frames still in flight.
+
+        Args:
+            duration (float): Recording length in seconds.
+
+        Returns:
+            List[FrameTrace]: Recorded traces in completion order.
+
+        Raises:
+            RuntimeError: If another recording is already active.
+        """
+        with self._lock:
+            if self._recording is not None:
+                raise RuntimeError("A trace recording is already in progress")
+            self._recording = []
+            self._recording_until = time.perf_counter() + duration
+        try:
+            time.sleep(duration + 0.5)
+        finally:
+            with self._lock:
+                traces, self._recording = self._recording, None
+        return traces
+
+    def latency_percentiles(self, percentiles: Sequence[float] = (50, 90, 99)) -> dict:
+        """
+        Get glass-to-glass latency percentiles over the recent frames.
+
+        Args:
+            percentiles (Sequence[float]): Percentiles to report.
+
+        Returns:
+            dict: Frame count and {"p50_ms": ..., ...}.
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+        return self.percentiles_of(latencies, percentiles)
+
+    @staticmethod
+    def percentiles_of(latencies: Sequence[float], percentiles: Sequence[float] = (50, 90, 99)) -> dict:
+        """
+        Compute latency percentiles (nearest rank) of the given latencies in seconds.
+
+        Returns:
+            dict: Frame count and {"p50_ms": ..., ...}.
+        """
+        latencies = sorted(latencies)
+        result = {"frames": len(latencies)}
+        for p in percentiles:
+            if latencies:
+                idx = min(int(round(p / 100.0 * (len(latencies) - 1))), len(latencies) - 1)
+                result[f"p{int(p)}_ms"] = round(latencies[idx] * 1000.0, 3)
+            else:
+                result[f"p{int(p)}_ms"] = None
+        return result
+
+    @staticmethod
+    def to_chrome_trace(traces: Sequence[FrameTrace]) -> Dict:
+        """
+        Convert traces to the Chrome trace-event JSON format.
+
+        Each stage gets its own track; a "frame" track shows every frame from capture
+        to its last stage, so overlapping frames and stage gaps (queue waits) are visible.
+
+        Args:
+            traces (Sequence[FrameTrace]): Traces to export.
+
+        Returns:
+            dict: {"traceEvents": [...], "displayTimeUnit": "ms"}
+        """
+        events = []
+        if not traces:
+            return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+        # Capture spans begin before the capture timestamp, so start at the earliest span
+        origin = min(min([trace.captured_at] + [start for _, start, _ in trace.spans]) for trace in traces)
+        stage_tids: Dict[str, int] = {"frame": 0}
+        for trace in traces:
+            for stage, _, _ in trace.spans:
+                stage_tids.setdefault(stage, len(stage_tids))
+
+        for stage, tid in stage_tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": stage}})
+
+        for trace in traces:
+            end = trace.spans[-1][2] if trace.spans else trace.captured_at
+            events.append({
+                "name": f"frame {trace.seq}", "ph": "X", "pid": 1, "tid": 0,
+                "ts": (trace.captured_at - origin) * 1e6, "dur": (end - trace.captured_at) * 1e6,
+                "args": {"seq": trace.seq, "latency_ms": round(trace.latency * 1000.0, 3)}
+            })
+            for stage, start, stop in trace.spans:
+                events.append({
+                    "name": stage, "ph": "X", "pid": 1, "tid": stage_tids[stage],
+                    "ts": (start - origin) * 1e6, "dur": (stop - start) * 1e6,
+                    "args": {"seq": trace.seq}
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
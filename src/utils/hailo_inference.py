@@ -46,6 +46,15 @@ class HailoInfer:
         self.last_infer_job = None
 
 
+    def set_priority(self, priority: int) -> None:
+        """
+        Change the scheduler priority of the model within the shared VDevice context.
+
+        Args:
+            priority (int): Scheduler priority value, higher values are scheduled first.
+        """
+        self.configured_model.set_scheduler_priority(priority)
+
     def _set_input_type(self, input_type: Optional[str] = None) -> None:
         """
         Set the input type for the HEF model. If the model has multiple inputs,
@@ -0,0 +1,716 @@
+import queue
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.mosaic import compose_mosaic, tile_detections
+
+
+class SharedInference:
+    """
+    One inference model shared by the pipelines of all streams.
+
+    The model is opened when the first stream acquires it and closed when the last one
+    releases it, so streams can start and stop independently. Jobs are submitted under
+    a lock (submission only queues an asynchronous job, the accelerator runs them back
+    to back); each stream waits for its own last job before it ends.
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        """
+        Args:
+            factory (Callable): Opens the model, e.g. `lambda: HailoInfer(hef_path, 1)`.
+        """
+        self.factory = factory
+        self._infer = None
+        self._users = 0
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self.submitted = 0
+
+    def acquire(self) -> "SharedInference":
+        """Open the model if no stream uses it yet and register one more user."""
+        with self._lock:
+            if self._infer is None:
+                self._infer = self.factory()
+            self._users += 1
+        return self
+
+    def release(self) -> None:
+        """Unregister a user and close the model once none is left."""
+        with self._lock:
+            self._users -= 1
+            if self._users > 0 or self._infer is None:
+                return
+            infer, self._infer = self._infer, None
+        infer.close()
+
+    def get_input_shape(self) -> Tuple[int, ...]:
+        return self._infer.get_input_shape()
+
+    def run(self, input_batch: List[np.ndarray], inference_callback_fn) -> Optional[object]:
+        """
+        Submit an asynchronous inference job.
+
+        Args:
+            input_batch (List[np.ndarray]): Preprocessed model inputs.
+            inference_callback_fn (Callable): Called with the completion info and `bindings_list`.
+
+        Returns:
+            The job handle, to wait for with `job.wait(timeout_ms)`.
+        """
+        with self._submit_lock:
+            self._infer.run(input_batch, inference_callback_fn)
+            self.submitted += len(input_batch)
+            return self._infer.last_infer_job
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Whether the model is open, the number of streams using it and the submitted frames.
+        """
+        with self._lock:
+            return {"open": self._infer is not None, "streams": self._users, "submitted": self.submitted}
+
+
+class StreamSchedule:
+    """Scheduling settings, queue and counters of one stream in the InferenceScheduler."""
+
+    def __init__(self, stream_id: str, owner: object = None):
+        self.stream_id = stream_id
+        # Run of the stream that registered the schedule (see InferenceScheduler.configure_stream)
+        self.owner = owner
+        self.weight = 1.0
+        self.priority = 0
+        self.target_fps: Optional[float] = None
+        self.policy = "drop"
+        self.max_pending = 2
+        # Mosaic group the stream's frames are tiled into; its queue then holds the tile waiting for the next mosaic
+        self.group: Optional["MosaicGroup"] = None
+        # Waiting jobs: (input batch, callback, on_drop, enqueue time, tiles of a mosaic job or None)
+        self.pending: Deque[tuple] = deque()
+        # Virtual time of the stream: advances by frames / weight with each dispatched job
+        self.pass_value = 0.0
+        # Earliest dispatch time of the next job under the target frame rate
+        self.next_due = 0.0
+        self.inflight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.deferred = 0
+        self.completions: Deque[float] = deque()
+        self.delays: Deque[float] = deque(maxlen=500)
+        self.registered_at = time.perf_counter()
+        # Completed jobs whose callback waits for the stream's result thread (None for a mosaic group's schedule)
+        self.results: Optional[queue.SimpleQueue] = None
+
+    def get_stats(self, now: float, window: float) -> dict:
+        while self.completions and self.completions[0] < now - window:
+            self.completions.popleft()
+        delays = sorted(self.delays)
+
+        def delay_ms(q):
+            return round(delays[min(int(q * len(delays)), len(delays) - 1)] * 1000.0, 2) if delays else None
+
+        return {
+            "weight": self.weight,
+            "priority": self.priority,
+            "target_fps": self.target_fps,
+            "policy": self.policy,
+            "pending": len(self.pending),
+            "inflight": self.inflight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "deferred": self.deferred,
+            "fps": round(len(self.completions) / max(min(window, now - self.registered_at), 1e-3), 2),
+            "queue_delay_ms": {
+                "avg": round(sum(delays) / len(delays) * 1000.0, 2) if delays else None,
+                "p50": delay_ms(0.5),
+                "p95": delay_ms(0.95),
+                "max": round(delays[-1] * 1000.0, 2) if delays else None
+            }
+        }
+
+
+class MosaicGroup:
+    """
+    Streams whose frames are tiled into one model input (see utils.mosaic), each in a slot of its own.
+
+    A member's preprocessed tile waits in the member's queue until every member has one, or
+    until the oldest has waited `mosaic_wait`; the composed mosaic is then queued in the
+    group's own schedule, which the dispatcher treats like a stream combining the scheduling
+    settings of the members.
+    """
+
+    def __init__(self, name: str, grid: int):
+        """
+        Args:
+            name (str): Group name.
+            grid (int): Tiles per row and per column.
+        """
+        self.name = name
+        self.grid = grid
+        # Member stream id -> tile index
+        self.slots: Dict[str, int] = {}
+        self.schedule = StreamSchedule(f"mosaic:{name}")
+        self.mosaics = 0
+        self.tiles = 0
+
+    def free_slot(self) -> Optional[int]:
+        used = set(self.slots.values())
+        return next((index for index in range(self.grid * self.grid) if index not in used), None)
+
+    def get_stats(self, now: float, window: float) -> dict:
+        stats = self.schedule.get_stats(now, window)
+        stats.update(grid=self.grid, members=dict(self.slots), mosaics=self.mosaics,
+                     tiles_per_mosaic=round(self.tiles / self.mosaics, 2) if self.mosaics else None)
+        return stats
+
+
+class InferenceScheduler(SharedInference):
+    """
+    Shared inference model with weighted fair scheduling of the jobs of several streams.
+
+    Each stream submits into its own small queue; a dispatcher thread keeps at most
+    `max_inflight` jobs on the accelerator and picks the next one from the streams that
+    have a job waiting and are not ahead of their target frame rate: the highest priority
+    first (strictly), then the stream with the least frames served relative to its weight
+    (stride scheduling), so a busy stream can't starve the others. A full queue either
+    drops its oldest job ("drop", for live sources, keeping latency bounded) or makes the
+    submitter wait ("defer", for files, which then run at their share of the accelerator).
+
+    The model itself has a single HailoRT scheduler priority within the shared VDevice
+    group; it follows the highest priority of the registered streams, so the streams
+    compete with models of other processes at the level of their most important one.
+
+    Callbacks run on a result thread per stream, never on the model's completion thread: a
+    stream whose post-processing blocks (e.g. a lossless output queue) only holds back its own
+    results, and its next jobs wait in its queue once `max_stream_backlog` are unfinished.
+
+    Streams of a mosaic group submit preprocessed tiles instead of full model inputs: the
+    tiles of the members are composed into one input, inferred once, and the detections
+    are split back per tile before each member's callback (see `MosaicGroup`).
+    """
+
+    POLICIES = ("drop", "defer")
+    MAX_PRIORITY = 31
+    MAX_GRID = 4
+
+    def __init__(self, factory: Callable[[], object], max_inflight: int = 2, fps_window: float = 5.0,
+                 mosaic_wait: float = 0.05, max_stream_backlog: int = 4):
+        """
+        Args:
+            factory (Callable): Opens the model, e.g. `lambda: HailoInfer(hef_path, 1)`.
+            max_inflight (int): Jobs submitted to the accelerator at once; the rest wait in the stream queues.
+            max_stream_backlog (int): Jobs of one stream in flight or with their results not yet taken by its
+                callback; further jobs of the stream wait in its queue.
+            fps_window (float): Seconds over which the achieved frame rate of each stream is measured.
+            mosaic_wait (float): Seconds a tile waits for the tiles of the other members of its mosaic group
+                before the mosaic is inferred with the slots of the late members left empty.
+        """
+        super().__init__(factory)
+        self.max_inflight = max_inflight
+        self.fps_window = fps_window
+        self.mosaic_wait = mosaic_wait
+        self.max_stream_backlog = max_stream_backlog
+        self.streams: Dict[str, StreamSchedule] = {}
+        self.groups: Dict[str, MosaicGroup] = {}
+        self.inflight = 0
+        self.priority = None
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._closing = False
+        # Virtual time of the last dispatched job; a stream that was idle restarts from it
+        self._virtual_time = 0.0
+
+    def acquire(self) -> "InferenceScheduler":
+        """Open the model and start the dispatcher if no stream uses it yet, and register one more user."""
+        with self._lock:
+            if self._infer is None:
+                self._infer = self.factory()
+                self.priority = None
+                self._closing = False
+                self._dispatcher = threading.Thread(target=self._dispatch, name="inference-scheduler", daemon=True)
+                self._dispatcher.start()
+            self._users += 1
+        return self
+
+    def release(self) -> None:
+        """Unregister a user; once none is left, stop the dispatcher and close the model."""
+        with self._lock:
+            self._users -= 1
+            if self._users > 0 or self._infer is None:
+                return
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self._dispatcher.join(timeout=5.0)
+            infer, self._infer = self._infer, None
+        infer.close()
+
+    def configure_stream(self, stream_id: str, weight: float = 1.0, priority: int = 0,
+                         target_fps: Optional[float] = None, policy: str = "drop", max_pending: int = 2,
+                         mosaic_group: Optional[str] = None, mosaic_grid: int = 2, owner: object = None) -> None:
+        """
+        Register a stream or update its scheduling settings.
+
+        Args:
+            stream_id (str): Stream id.
+            weight (float): Share of the accelerator relative to the other streams of the same priority.
+            priority (int): 0 to 31; waiting jobs of higher priority streams are always dispatched first.
+            target_fps (float, optional): Maximum inference rate of the stream, None for no limit.
+            policy (str): "drop" or "defer", what a full queue does with a new job.
+            max_pending (int): Jobs waiting in the stream's queue before the policy applies.
+            mosaic_group (str, optional): Mosaic group to tile the stream's frames into, None to infer them alone.
+                The stream then submits tiles of 1/grid of the model input size.
+            mosaic_grid (int): Tiles per row and per column of the mosaic group, 2 to 4.
+            owner (object, optional): Token of the run registering the stream. A registration of another
+                owner is replaced, its waiting jobs dropped; None updates the current registration.
+
+        Raises:
+            ValueError: If a setting is invalid, or the mosaic group is full or has another grid.
+        """
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        if not 0 <= priority <= self.MAX_PRIORITY:
+            raise ValueError(f"priority must be between 0 and {self.MAX_PRIORITY}")
+        if target_fps is not None and target_fps <= 0:
+            raise ValueError("target_fps must be positive")
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {list(self.POLICIES)}")
+        if mosaic_group is not None and not 2 <= mosaic_grid <= self.MAX_GRID:
+            raise ValueError(f"mosaic_grid must be between 2 and {self.MAX_GRID}")
+        dropped = []
+        with self._cond:
+            state = self.streams.get(stream_id)
+            # A registration of an earlier run is replaced; its result thread ends after its queued results
+            stale = state if state is not None and owner is not None and state.owner is not owner else None
+            current = state.group if state is not None else None
+            group = self.groups.get(mosaic_group) if mosaic_group is not None else None
+            if group is not None and group.grid != mosaic_grid:
+                raise ValueError(f"Mosaic group '{mosaic_group}' has a {group.grid}x{group.grid} grid")
+            if group is not None and group is not current and group.free_slot() is None:
+                raise ValueError(f"Mosaic group '{mosaic_group}' is full")
+            if stale is not None:
+                dropped = self._unregister(stale)
+                state = current = None
+            if state is None:
+                state = self.streams[stream_id] = StreamSchedule(stream_id, owner)
+                state.pass_value = self._virtual_time
+                state.results = queue.SimpleQueue()
+                threading.Thread(target=self._run_results, args=(state,), name=f"inference-results-{stream_id}",
+                                 daemon=True).start()
+            state.weight = float(weight)
+            state.priority = int(priority)
+            state.target_fps = float(target_fps) if target_fps is not None else None
+            state.policy = policy
+            if current is not None and current is not group:
+                dropped.extend(self._leave_group(state))
+            if mosaic_group is not None and state.group is None:
+                self._join_group(state, mosaic_group, mosaic_grid)
+            # A member holds one tile at a time; its jobs queue up in the group's schedule
+            state.max_pending = 1 if state.group is not None else max(1, int(max_pending))
+            if state.group is not None:
+                self._update_group(state.group)
+            self._cond.notify_all()
+        for job in dropped:
+            self._drop(job[2], job[0])
+
+    def remove_stream(self, stream_id: str, owner: object = None) -> None:
+        """
+        Unregister a stream, dropping its waiting jobs; results already completed are still delivered.
+
+        Args:
+            stream_id (str): Stream id.
+            owner (object, optional): Only remove the registration of this run; None removes any.
+        """
+        with self._cond:
+            state = self._registered(stream_id, owner)
+            if state is None:
+                return
+            dropped = self._unregister(state)
+            self._cond.notify_all()
+        for job in dropped:
+            self._drop(job[2], job[0])
+
+    def submit(self, stream_id: str, input_batch: List[np.ndarray], inference_callback_fn,
+               on_drop: Optional[Callable[[int], None]] = None, owner: object = None) -> bool:
+        """
+        Queue an asynchronous inference job of a registered stream.
+
+        Args:
+            stream_id (str): Stream id.
+            input_batch (List[np.ndarray]): Preprocessed model inputs, or the single tile of a mosaic group member.
+            inference_callback_fn (Callable): Called with the completion info and `bindings_list`; for a mosaic
+                group member also with `results_list`, the detections of its tile.
+            on_drop (Callable, optional): Called with the number of frames of a job that is dropped.
+            owner (object, optional): Run submitting the job; the job is dropped if the stream is registered by
+                another one. None submits to any registration.
+
+        Returns:
+            bool: False if the stream isn't registered (the job is dropped).
+        """
+        with self._cond:
+            state = self._registered(stream_id, owner)
+            group = state.group if state is not None else None
+            # A member that is ahead of the others sends its incomplete mosaic rather than waiting or dropping
+            early = None
+            if group is not None and state.pending:
+                early = self._take_tiles(group, time.perf_counter(), force=True)
+        if early is not None:
+            self._enqueue_mosaic(group, early, block=True)
+        dropped = None
+        tiles = None
+        with self._cond:
+            state = self._registered(stream_id, owner)
+            if state is not None and len(state.pending) >= state.max_pending and state.policy == "defer":
+                state.deferred += 1
+                while state is self.streams.get(stream_id) and len(state.pending) >= state.max_pending:
+                    self._cond.wait(0.5)
+            if state is None or state is not self.streams.get(stream_id):
+                dropped = (input_batch, inference_callback_fn, on_drop, None, None)
+            else:
+                if len(state.pending) >= state.max_pending:
+                    # Drop policy: the oldest waiting job makes room, the freshest frames are kept
+                    dropped = state.pending.popleft()
+                    state.dropped += len(dropped[0])
+                elif not state.pending and state.inflight == 0:
+                    # Back from idle: no credit for the time it didn't use the accelerator
+                    state.pass_value = max(state.pass_value, self._virtual_time)
+                now = time.perf_counter()
+                state.pending.append((input_batch, inference_callback_fn, on_drop, now, None))
+                state.submitted += len(input_batch)
+                group = state.group
+                if group is not None:
+                    tiles = self._take_tiles(group, now)
+                self._cond.notify_all()
+        if dropped is not None:
+            self._drop(dropped[2], dropped[0])
+        if tiles is not None:
+            self._enqueue_mosaic(group, tiles, block=True)
+        return state is not None
+
+    def flush(self, stream_id: str, timeout: float = 10.0, owner: object = None) -> bool:
+        """
+        Wait until the jobs of a stream were dispatched and completed.
+
+        Args:
+            stream_id (str): Stream id.
+            timeout (float): Seconds to wait at most.
+            owner (object, optional): Only wait for the registration of this run; None waits for any.
+
+        Returns:
+            bool: True if none is left.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                state = self._registered(stream_id, owner)
+                if state is None or (not state.pending and state.inflight == 0):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Model state, jobs in flight, the applied HailoRT priority and, per stream, the scheduling
+                settings, queue, counts, achieved frame rate and queueing delay (enqueue to dispatch) percentiles;
+                per mosaic group, the same for its mosaics plus its grid, members and tiles per mosaic.
+        """
+        stats = super().get_stats()
+        now = time.perf_counter()
+        with self._cond:
+            stats.update(inflight=self.inflight, max_inflight=self.max_inflight, priority=self.priority,
+                         per_stream={stream_id: state.get_stats(now, self.fps_window)
+                                     for stream_id, state in self.streams.items()},
+                         mosaics={name: group.get_stats(now, self.fps_window) for name, group in self.groups.items()})
+        return stats
+
+    def _drop(self, on_drop: Optional[Callable[[int], None]], input_batch: list) -> None:
+        if on_drop is not None:
+            try:
+                on_drop(len(input_batch))
+            except Exception as e:
+                print(f"Inference drop callback error: {e}")
+
+    def _next_job(self, now: float) -> Tuple[Optional[StreamSchedule], Optional[float]]:
+        """Pick the stream to dispatch from, or return how long to wait for a paced stream to become due."""
+        if self.inflight >= self.max_inflight:
+            return None, None
+        best = None
+        wait = None
+        schedules = [state for state in self.streams.values() if state.group is None]
+        schedules.extend(group.schedule for group in self.groups.values())
+        for state in schedules:
+            if not state.pending or state.inflight >= self.max_stream_backlog:
+                continue
+            if state.next_due > now:
+                wait = min(wait, state.next_due - now) if wait is not None else state.next_due - now
+                continue
+            if best is None or (state.priority, -state.pass_value) > (best.priority, -best.pass_value):
+                best = state
+        return best, wait
+
+    def _registered(self, stream_id: str, owner: object) -> Optional[StreamSchedule]:
+        """The schedule of a stream if it is registered by `owner` (any run for None)."""
+        state = self.streams.get(stream_id)
+        if state is None or (owner is not None and state.owner is not owner):
+            return None
+        return state
+
+    def _unregister(self, state: StreamSchedule) -> List[tuple]:
+        """Remove a schedule and end its result thread; returns its waiting jobs."""
+        if state.group is not None:
+            dropped = self._leave_group(state)
+        else:
+            dropped = list(state.pending)
+            state.pending.clear()
+        del self.streams[state.stream_id]
+        # Ends the result thread after the results queued before
+        state.results.put(None)
+        return dropped
+
+    def _join_group(self, state: StreamSchedule, name: str, grid: int) -> None:
+        group = self.groups.get(name)
+        if group is None:
+            group = self.groups[name] = MosaicGroup(name, grid)
+            group.schedule.pass_value = self._virtual_time
+        group.slots[state.stream_id] = group.free_slot()
+        state.group = group
+
+    def _leave_group(self, state: StreamSchedule) -> List[tuple]:
+        """Free the slot of a member; returns its waiting tile, and the queued mosaics if the group is now empty."""
+        group, state.group = state.group, None
+        del group.slots[state.stream_id]
+        dropped = list(state.pending)
+        state.pending.clear()
+        if group.slots:
+            self._update_group(group)
+        else:
+            del self.groups[group.name]
+            dropped.extend(group.schedule.pending)
+            group.schedule.pending.clear()
+        return dropped
+
+    def _update_group(self, group: MosaicGroup) -> None:
+        """A mosaic serves all members: it gets their summed weight, highest priority and highest target rate."""
+        members = [self.streams[stream_id] for stream_id in group.slots]
+        schedule = group.schedule
+        schedule.weight = sum(member.weight for member in members)
+        schedule.priority = max(member.priority for member in members)
+        rates = [member.target_fps for member in members]
+        schedule.target_fps = None if None in rates else max(rates)
+        schedule.policy = "defer" if all(member.policy == "defer" for member in members) else "drop"
+
+    def _take_tiles(self, group: MosaicGroup, now: float, force: bool = False) -> Optional[List[tuple]]:
+        """
+        Take the waiting tiles of a group once every member has one, the oldest waited `mosaic_wait` or `force`.
+        Returns (member, slot, tile, callback, on_drop, enqueue time) per tile, or None.
+        """
+        members = [self.streams[stream_id] for stream_id in group.slots]
+        waiting = self._waiting_members(group)
+        if not waiting:
+            return None
+        if (not force and len(waiting) < len(members)
+                and min(member.pending[0][3] for member in waiting) > now - self.mosaic_wait):
+            return None
+        tiles = []
+        for member in waiting:
+            input_batch, callback, on_drop, enqueued_at, _ = member.pending.popleft()
+            member.inflight += 1
+            tiles.append((member, group.slots[member.stream_id], input_batch[0], callback, on_drop, enqueued_at))
+        return tiles
+
+    def _waiting_members(self, group: MosaicGroup) -> List[StreamSchedule]:
+        """Members with a tile waiting, except those whose backlog of unfinished jobs is full."""
+        members = (self.streams[stream_id] for stream_id in group.slots)
+        return [member for member in members if member.pending and member.inflight < self.max_stream_backlog]
+
+    def _due_mosaics(self, now: float) -> Tuple[List[tuple], Optional[float]]:
+        """Take the incomplete mosaics whose oldest tile waited long enough, or return how long until the next."""
+        due = []
+        wait = None
+        for group in self.groups.values():
+            if len(group.schedule.pending) >= group.schedule.max_pending:
+                # The group is behind; late tiles wait for their mosaic to fill up instead
+                continue
+            tiles = self._take_tiles(group, now)
+            if tiles is not None:
+                due.append((group, tiles))
+                continue
+            oldest = [member.pending[0][3] for member in self._waiting_members(group)]
+            if oldest:
+                remaining = min(oldest) + self.mosaic_wait - now
+                wait = min(wait, remaining) if wait is not None else remaining
+        return due, wait
+
+    def _enqueue_mosaic(self, group: MosaicGroup, tiles: List[tuple], block: bool) -> None:
+        """Compose the tiles into one model input and queue it in the group's schedule, under its policy."""
+        dropped = None
+        try:
+            height, width, _ = self.get_input_shape()
+            mosaic = compose_mosaic({slot: tile for _, slot, tile, _, _, _ in tiles}, group.grid, width, height)
+        except Exception as e:
+            print(f"Mosaic composition error: {e}")
+            self._drop_mosaic(tiles, 1)
+            return
+        job = ([mosaic], partial(self._mosaic_completed, group, tiles), partial(self._drop_mosaic, tiles),
+               time.perf_counter(), tiles)
+        schedule = group.schedule
+        with self._cond:
+            if block and schedule.policy == "defer" and len(schedule.pending) >= schedule.max_pending:
+                schedule.deferred += 1
+                while (self.groups.get(group.name) is group and not self._closing
+                       and len(schedule.pending) >= schedule.max_pending):
+                    self._cond.wait(0.5)
+            if self.groups.get(group.name) is not group:
+                dropped = job
+            else:
+                if len(schedule.pending) >= schedule.max_pending:
+                    dropped = schedule.pending.popleft()
+                    schedule.dropped += 1
+                elif not schedule.pending and schedule.inflight == 0:
+                    schedule.pass_value = max(schedule.pass_value, self._virtual_time)
+                schedule.pending.append(job)
+                schedule.submitted += 1
+                group.mosaics += 1
+                group.tiles += len(tiles)
+                self._cond.notify_all()
+        if dropped is not None:
+            self._drop(dropped[2], dropped[0])
+
+    def _drop_mosaic(self, tiles: List[tuple], frames: int) -> None:
+        with self._cond:
+            for member, *_ in tiles:
+                member.inflight -= 1
+                member.dropped += 1
+            self._cond.notify_all()
+        for _, _, tile, _, on_drop, _ in tiles:
+            self._drop(on_drop, [tile])
+
+    def _apply_priority(self) -> None:
+        priority = max((state.priority for state in self.streams.values()), default=0)
+        if priority != self.priority and hasattr(self._infer, "set_priority"):
+            try:
+                self._infer.set_priority(priority)
+                self.priority = priority
+            except Exception as e:
+                print(f"Error setting inference priority: {e}")
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closing:
+                        return
+                    now = time.perf_counter()
+                    due, mosaic_wait = self._due_mosaics(now)
+                    if due:
+                        break
+                    state, wait = self._next_job(now)
+                    if state is not None:
+                        break
+                    waits = [w for w in (wait, mosaic_wait) if w is not None]
+                    self._cond.wait(min(waits) if waits else None)
+                if not due:
+                    input_batch, callback, on_drop, enqueued_at, tiles = state.pending.popleft()
+                    frames = len(input_batch)
+                    self._virtual_time = state.pass_value
+                    state.pass_value += frames / state.weight
+                    if state.target_fps is not None:
+                        # Up to one interval of lateness is caught up, so dispatch jitter doesn't lower the rate
+                        state.next_due = max(state.next_due, now - 1.0 / state.target_fps) + frames / state.target_fps
+                    state.delays.append(now - enqueued_at)
+                    for member, _, _, _, _, tile_enqueued_at in tiles or ():
+                        member.delays.append(now - tile_enqueued_at)
+                    state.inflight += 1
+                    self.inflight += 1
+                    self._apply_priority()
+                    # Room in the queue for a deferred submitter
+                    self._cond.notify_all()
+            if due:
+                # Composed outside the lock, then dispatched on a later turn like any other job
+                for group, group_tiles in due:
+                    self._enqueue_mosaic(group, group_tiles, block=False)
+                continue
+            try:
+                with self._submit_lock:
+                    self._infer.run(input_batch, partial(self._completed, state, frames, callback))
+                    self.submitted += frames
+            except Exception as e:
+                print(f"Inference submit error: {e}")
+                with self._cond:
+                    state.inflight -= 1
+                    self.inflight -= 1
+                    state.dropped += frames
+                    self._cond.notify_all()
+                self._drop(on_drop, input_batch)
+
+    def _completed(self, state: StreamSchedule, frames: int, callback, completion_info, bindings_list) -> None:
+        """Completion of a job on the model's thread: free its slot and hand the results off, never blocking."""
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+        if state.results is not None:
+            state.results.put((callback, frames, (completion_info,), {"bindings_list": bindings_list}))
+            return
+        # A mosaic: split here, each member's callback runs on its own result thread
+        try:
+            callback(completion_info, bindings_list=bindings_list)
+        finally:
+            with self._cond:
+                self._record_completion(state, frames)
+
+    def _mosaic_completed(self, group: MosaicGroup, tiles: List[tuple], completion_info, bindings_list) -> None:
+        """Split the detections of a mosaic per tile and queue them for the callback of each member."""
+        results = None
+        try:
+            if not completion_info.exception:
+                results = bindings_list[0].output().get_buffer()
+        except Exception as e:
+            print(f"Error reading mosaic results: {e}")
+        for member, slot, tile, callback, on_drop, _ in tiles:
+            try:
+                results_list = [tile_detections(results, group.grid, slot)] if results is not None else None
+            except Exception as e:
+                print(f"Error splitting mosaic results for stream {member.stream_id}: {e}")
+                results_list = None
+            if results_list is None and not completion_info.exception:
+                with self._cond:
+                    member.dropped += 1
+                    self._record_completion(member, 0)
+                self._drop(on_drop, [tile])
+                continue
+            member.results.put((callback, 1, (completion_info,),
+                                {"bindings_list": bindings_list, "results_list": results_list}))
+
+    def _run_results(self, state: StreamSchedule) -> None:
+        """Result thread of a stream: run the callbacks of its completed jobs in order."""
+        while True:
+            item = state.results.get()
+            if item is None:
+                return
+            callback, frames, args, kwargs = item
+            try:
+                callback(*args, **kwargs)
+            except Exception as e:
+                print(f"Inference callback error in stream {state.stream_id}: {e}")
+            finally:
+                # Released after the callback, so a flushed stream has emitted all of its results
+                with self._cond:
+                    self._record_completion(state, frames)
+
+    def _record_completion(self, state: StreamSchedule, frames: int) -> None:
+        state.inflight -= 1
+        state.completed += frames
+        done = time.perf_counter()
+        state.completions.extend([done] * frames)
+        while state.completions and state.completions[0] < done - self.fps_window:
+            state.completions.popleft()
+        self._cond.notify_all()
@@ -0,0 +1,144 @@
+import gc
+import resource
+import threading
+import tracemalloc
+from typing import Callable, Dict, Optional
+
+
+def read_process_memory() -> dict:
+    """
+    Read the process memory usage.
+
+    Returns:
+        dict: Current and peak resident set size in bytes (current is None where /proc is unavailable).
+    """
+    rss, peak = None, None
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if peak is None:
+        # ru_maxrss is in kilobytes on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+class MemoryInspector:
+    """
+    Reports the sizes of the pipeline's long-lived structures and diffs tracemalloc snapshots.
+
+    Components register probes (callables returning a dict of sizes) and the report
+    calls them on demand, so there is no cost between requests. tracemalloc is only
+    started when a baseline snapshot is requested, because tracing slows every allocation.
+    """
+
+    def __init__(self):
+        self.probes: Dict[str, Callable[[], dict]] = {}
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+        self._lock = threading.Lock()
+
+    def register(self, name: str, probe: Optional[Callable[[], dict]]) -> None:
+        """
+        Register (or remove, with probe=None) a structure size probe.
+
+        Args:
+            name (str): Name of the component.
+            probe (Callable): Returns a dict of sizes/counts.
+        """
+        with self._lock:
+            if probe is None:
+                self.probes.pop(name, None)
+            else:
+                self.probes[name] = probe
+
+    def report(self) -> dict:
+        """Returns:
+            dict: Process memory, GC generation counts, probe results and tracemalloc status.
+        """
+        with self._lock:
+            probes = dict(self.probes)
+        structures = {}
+        for name, probe in probes.items():
+            try:
+                structures[name] = probe()
+            except Exception as e:
+                structures[name] = {"error": str(e)}
+
+        tracing = tracemalloc.is_tracing()
+        return {
+            "process": read_process_memory(),
+            "gc": {"counts": gc.get_count(), "objects": len(gc.get_objects())},
+            "structures": structures,
+            "tracemalloc": {
+                "tracing": tracing,
+                "baseline": self._baseline is not None,
+                "traced_bytes": tracemalloc.get_traced_memory()[0] if tracing else None
+            }
+        }
+
+    def take_baseline(self, frames: int = 10) -> None:
+        """
+        Start tracemalloc if needed and take the baseline snapshot for `diff`.
+
+        Args:
+            frames (int): Traceback depth stored per allocation when tracing is started here.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._started_tracing = True
+            self._baseline = tracemalloc.take_snapshot()
+
+    def diff(self, limit: int = 20, group_by: str = "lineno") -> dict:
+        """
+        Compare a new snapshot with the baseline.
+
+        Args:
+            limit (int): Number of top allocation sites to return.
+            group_by (str): "lineno", "filename" or "traceback".
+
+        Returns:
+            dict: Total growth and the top allocation sites by size growth.
+
+        Raises:
+            RuntimeError: If no baseline snapshot was taken.
+        """
+        with self._lock:
+            baseline = self._baseline
+        if baseline is None or not tracemalloc.is_tracing():
+            raise RuntimeError("No baseline snapshot, take one first")
+
+        snapshot = tracemalloc.take_snapshot()
+        # Exclude tracemalloc's own bookkeeping
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = snapshot.filter_traces(filters).compare_to(baseline.filter_traces(filters), group_by)
+
+        top = []
+        for stat in stats[:limit]:
+            frames = stat.traceback.format() if group_by == "traceback" else None
+            top.append({
+                "location": str(stat.traceback[0]) if group_by != "filename" else stat.traceback[0].filename,
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+                **({"traceback": frames} if frames else {})
+            })
+        return {
+            "total_size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": top
+        }
+
+    def stop_tracing(self) -> None:
+        """Drop the baseline and stop tracemalloc if it was started by `take_baseline`."""
+        with self._lock:
+            self._baseline = None
+            if self._started_tracing and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._started_tracing = False
@@ -0,0 +1,76 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Fill value of empty tiles, the same gray as the letterbox padding of default_preprocess
+MOSAIC_FILL = 114
+
+
+def tile_size(width: int, height: int, grid: int) -> Tuple[int, int]:
+    """
+    Size of one tile of a mosaic.
+
+    Args:
+        width (int): Model input width.
+        height (int): Model input height.
+        grid (int): Tiles per row and per column.
+
+    Returns:
+        Tuple[int, int]: Tile width and height.
+    """
+    return width // grid, height // grid
+
+
+def compose_mosaic(tiles: Dict[int, np.ndarray], grid: int, width: int, height: int) -> np.ndarray:
+    """
+    Place preprocessed tiles into one model input, row by row; missing tiles stay gray.
+
+    Args:
+        tiles (Dict[int, np.ndarray]): Tile index -> image of the tile size (see `tile_size`).
+        grid (int): Tiles per row and per column.
+        width (int): Model input width.
+        height (int): Model input height.
+
+    Returns:
+        np.ndarray: Mosaic image of the model input size.
+    """
+    mosaic = np.full((height, width, 3), MOSAIC_FILL, dtype=np.uint8)
+    tile_w, tile_h = tile_size(width, height, grid)
+    for index, tile in tiles.items():
+        row, col = divmod(index, grid)
+        mosaic[row * tile_h:(row + 1) * tile_h, col * tile_w:(col + 1) * tile_w] = tile
+    return mosaic
+
+
+def tile_detections(detections: list, grid: int, index: int, tolerance: float = 0.01) -> List[np.ndarray]:
+    """
+    Map the NMS detections of a mosaic back to one of its tiles.
+
+    Boxes are normalized [ymin, xmin, ymax, xmax, score] rows per class. Boxes that cross
+    the tile borders (objects cut by the tiling, or spanning two cameras) are dropped;
+    the others are rescaled so they are normalized to the tile, as if the tile had been
+    the whole model input.
+
+    Args:
+        detections (list): Per-class detections of the mosaic, as returned by the model.
+        grid (int): Tiles per row and per column.
+        index (int): Tile index, row by row.
+        tolerance (float): Overshoot of a tile border, in tile units, still accepted (and clipped).
+
+    Returns:
+        List[np.ndarray]: Per-class detections of the tile.
+    """
+    row, col = divmod(index, grid)
+    offset = np.array([row, col, row, col], dtype=np.float32)
+    tiled = []
+    for class_detections in detections:
+        boxes = np.asarray(class_detections, dtype=np.float32).reshape(-1, 5)
+        if len(boxes) == 0:
+            tiled.append(boxes)
+            continue
+        coords = boxes[:, :4] * grid - offset
+        inside = np.all((coords >= -tolerance) & (coords <= 1.0 + tolerance), axis=1)
+        tile_boxes = boxes[inside].copy()
+        tile_boxes[:, :4] = np.clip(coords[inside], 0.0, 1.0)
+        tiled.append(tile_boxes)
+    return tiled
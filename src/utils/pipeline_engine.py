@@ -0,0 +1,423 @@
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from utils.frame_queue import FrameQueue
+
+
+class Stage:
+    """
+    One node of a pipeline graph: an input channel and the workers consuming it.
+
+    A stage function is called as `fn(item, emit)` for every input item and passes
+    its outputs (zero, one or several) to `emit`. Outputs emitted while the function
+    runs are forwarded when it returns, so downstream stages never see an item before
+    its stage timing is recorded; outputs emitted later from another thread (e.g. an
+    asynchronous inference callback) are forwarded immediately.
+
+    An ordered stage numbers its input items as they are dequeued and holds the outputs
+    of each item in a reorder buffer until those of all earlier items were forwarded, so
+    several workers can process consecutive frames while downstream stages (e.g. a
+    tracker) still see them in capture order. Outputs emitted after the stage function
+    returned bypass the reorder buffer.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any, Callable[[Any], None]], None], workers: int = 1,
+                 channel: Optional[FrameQueue] = None, metric: Optional[str] = None,
+                 on_end: Optional[Callable[[Callable[[Any], None]], None]] = None, ordered: bool = False):
+        """
+        Args:
+            name (str): Stage name, also used for heartbeats and error counters.
+            fn (Callable): Stage function `fn(item, emit)`.
+            workers (int): Number of worker threads. Several workers only preserve the order if ordered.
+            channel (FrameQueue): Input channel (None for sources).
+            metric (str, optional): Pipeline metrics stage recording the time spent in `fn` per item.
+            on_end (Callable, optional): Called as `on_end(emit)` by the last worker to finish, e.g.
+                to flush a partial batch or wait for in-flight asynchronous work.
+            ordered (bool): Forward outputs in input order, whatever worker finishes first.
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.channel = channel
+        self.metric = metric
+        self.on_end = on_end
+        self.ordered = ordered
+        self.upstream: List["Stage"] = []
+        self.downstream: List["Stage"] = []
+        self.threads: List[threading.Thread] = []
+        self.lock = threading.Lock()
+        self.ends_received = 0
+        self.closing = False
+        self.running_workers = 0
+        self.processed = 0
+        self.errors = 0
+        # Reorder buffer: input sequence number -> outputs, released in sequence
+        self.order_lock = threading.Lock()
+        self.release_lock = threading.Lock()
+        self.next_seq = 0
+        self.next_release = 0
+        self.reorder: Dict[int, List[Any]] = {}
+
+
+class Pipeline:
+    """
+    Runs a graph of stages, one or more threads each, connected by bounded channels.
+
+    Sources are generators producing items; other stages consume their input channel
+    (a FrameQueue, so every edge has a size and drop policy). An item emitted by a stage
+    is put into the channel of each downstream stage. The end of the stream is signalled
+    with None: a stage finishes once every upstream stage has ended and its queue is
+    empty, then calls its `on_end` hook and signals its own downstream stages.
+
+    `drain` stops the sources and lets queued items flow through to the sinks; `cancel`
+    makes every worker exit at once and discards queued items. Each worker beats the
+    watchdog (if any) and runs under its supervisor, every channel is watched for
+    backlogs, and stage functions are timed into the pipeline metrics and the frame
+    traces of their items.
+    """
+
+    def __init__(self, metrics=None, watchdog=None, trace_fn: Optional[Callable[[Any], Iterable]] = None,
+                 stall_after: float = 5.0, max_consecutive_errors: int = 10):
+        """
+        Args:
+            metrics (PipelineMetrics, optional): Receives stage latencies and error drops.
+            watchdog (PipelineWatchdog, optional): Receives heartbeats and supervises the workers.
+            trace_fn (Callable, optional): Returns the frame traces of an item (or an empty iterable).
+            stall_after (float): Heartbeat timeout of stages not registered with the watchdog beforehand.
+            max_consecutive_errors (int): Failed items in a row after which a worker is restarted.
+        """
+        self.metrics = metrics
+        self.watchdog = watchdog
+        self.stall_after = stall_after
+        self.trace_fn = trace_fn
+        self.max_consecutive_errors = max_consecutive_errors
+        self.stages: Dict[str, Stage] = {}
+        self._last_added: Optional[Stage] = None
+        self._stopping = threading.Event()
+        self._cancelled = threading.Event()
+        self._started = False
+
+    @property
+    def running(self) -> bool:
+        """Whether the sources should keep producing."""
+        return not self._stopping.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _connect(self, stage: Stage, after) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage name '{stage.name}'")
+        if after is None:
+            after = [self._last_added] if self._last_added is not None else []
+        elif isinstance(after, str):
+            after = [after]
+        for upstream in after:
+            upstream = self.stages[upstream] if isinstance(upstream, str) else upstream
+            upstream.downstream.append(stage)
+            stage.upstream.append(upstream)
+        self.stages[stage.name] = stage
+        self._last_added = stage
+        return stage
+
+    def add_source(self, name: str, generator_fn: Callable[[], Iterable]) -> Stage:
+        """
+        Add a source stage.
+
+        Args:
+            name (str): Stage name.
+            generator_fn (Callable): Returns an iterable of items. It should stop once
+                `pipeline.running` is False, since it is only checked between items.
+
+        Returns:
+            Stage: The new stage.
+        """
+        return self._connect(Stage(name, generator_fn), after=[])
+
+    def add_stage(self, name: str, fn: Callable[[Any, Callable[[Any], None]], None], workers: int = 1,
+                  channel: Optional[dict] = None, metric: Optional[str] = None,
+                  on_end: Optional[Callable[[Callable[[Any], None]], None]] = None, after=None,
+                  ordered: bool = False) -> Stage:
+        """
+        Add a processing or sink stage.
+
+        Args:
+            name (str): Stage name.
+            fn (Callable): Stage function `fn(item, emit)`.
+            workers (int): Number of worker threads.
+            channel (dict, optional): FrameQueue settings of the input channel (name, maxsize,
+                policy, max_age_ms, timestamp_fn). Defaults to a small blocking queue.
+            metric (str, optional): Pipeline metrics stage timing `fn`.
+            on_end (Callable, optional): End-of-stream hook `on_end(emit)`.
+            after (str or list, optional): Upstream stage name(s), defaults to the last added stage.
+            ordered (bool): Restore the input order of the outputs of several workers.
+
+        Returns:
+            Stage: The new stage.
+        """
+        settings = dict({"name": name, "maxsize": 4, "policy": "block"}, **(channel or {}))
+        channel_queue = FrameQueue(metrics=self.metrics, **settings)
+        return self._connect(Stage(name, fn, workers, channel_queue, metric, on_end, ordered), after)
+
+    def batch_stage(self, name: str, batch_size: int, channel: Optional[dict] = None, after=None) -> Stage:
+        """
+        Add a stage grouping consecutive items into lists of `batch_size` (the last one may be shorter).
+
+        Returns:
+            Stage: The new stage.
+        """
+        pending: List[Any] = []
+
+        def collect(item, emit):
+            pending.append(item)
+            if len(pending) >= batch_size:
+                emit(pending[:])
+                pending.clear()
+
+        def flush(emit):
+            if pending and not self.cancelled:
+                emit(pending[:])
+            pending.clear()
+
+        return self.add_stage(name, collect, workers=1, channel=channel, on_end=flush, after=after)
+
+    @property
+    def channels(self) -> Dict[str, FrameQueue]:
+        """Input channels of all non-source stages, by channel name."""
+        return {stage.channel.name: stage.channel for stage in self.stages.values() if stage.channel is not None}
+
+    def _forward(self, stage: Stage, item: Any) -> None:
+        for downstream in stage.downstream:
+            while True:
+                try:
+                    downstream.channel.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    if self._cancelled.is_set():
+                        return
+
+    def _beat(self, stage: Stage) -> None:
+        if self.watchdog is not None:
+            self.watchdog.beat(stage.name)
+
+    def _supervised(self, stage: Stage, loop: Callable[[], None]) -> None:
+        if self.watchdog is not None:
+            self.watchdog.supervise(stage.name, loop, should_run=lambda: not self._cancelled.is_set())
+        else:
+            try:
+                loop()
+            except Exception:
+                traceback.print_exc()
+
+    def _run_source(self, stage: Stage) -> None:
+        def loop():
+            for item in stage.fn():
+                self._beat(stage)
+                if self._stopping.is_set():
+                    break
+                with stage.lock:
+                    stage.processed += 1
+                self._forward(stage, item)
+
+        try:
+            self._supervised(stage, loop)
+        finally:
+            self._forward(stage, None)
+
+    def _process(self, stage: Stage, item: Any) -> List[Any]:
+        owner = threading.get_ident()
+        collecting = True
+        outputs = []
+
+        def emit(output):
+            if collecting and threading.get_ident() == owner:
+                outputs.append(output)
+            else:
+                self._forward(stage, output)
+
+        start = time.perf_counter()
+        try:
+            stage.fn(item, emit)
+        finally:
+            collecting = False
+        end = time.perf_counter()
+        if stage.metric is not None and self.metrics is not None:
+            self.metrics.observe(stage.metric, end - start)
+            if self.trace_fn is not None:
+                for trace in self.trace_fn(item):
+                    if trace is not None:
+                        trace.mark(stage.metric, start, end)
+        with stage.lock:
+            stage.processed += 1
+        return outputs
+
+    def _release(self, stage: Stage, seq: int, outputs: List[Any]) -> None:
+        # Forwarding under the lock keeps the order and blocks the workers when downstream is full
+        with stage.release_lock:
+            stage.reorder[seq] = outputs
+            while stage.next_release in stage.reorder:
+                for output in stage.reorder.pop(stage.next_release):
+                    self._forward(stage, output)
+                stage.next_release += 1
+
+    def _take(self, stage: Stage):
+        if not stage.ordered:
+            return stage.channel.get(timeout=0.5), None
+        # Dequeue and numbering are atomic so sequence numbers follow the channel order
+        with stage.order_lock:
+            item = stage.channel.get(timeout=0.5)
+            if item is None:
+                return None, None
+            seq = stage.next_seq
+            stage.next_seq += 1
+        return item, seq
+
+    def _run_worker(self, stage: Stage) -> None:
+        def loop():
+            consecutive_errors = 0
+            while not self._cancelled.is_set():
+                self._beat(stage)
+                try:
+                    item, seq = self._take(stage)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    with stage.lock:
+                        if not stage.closing:
+                            stage.ends_received += 1
+                            stage.closing = stage.ends_received >= len(stage.upstream)
+                        closing = stage.closing
+                    if closing:
+                        stage.channel.put(None)  # Let the sibling workers see the end too
+                        return
+                    continue
+                outputs = []
+                try:
+                    outputs = self._process(stage, item)
+                    consecutive_errors = 0
+                except Exception as e:
+                    with stage.lock:
+                        stage.errors += 1
+                    consecutive_errors += 1
+                    if self.metrics is not None:
+                        self.metrics.drop(stage.name)
+                    print(f"Error in pipeline stage {stage.name}: {e}")
+                    if consecutive_errors >= self.max_consecutive_errors:
+                        raise
+                finally:
+                    # A failed item releases an empty slot so the reorder buffer doesn't wait for it
+                    if seq is not None:
+                        self._release(stage, seq, outputs)
+                    else:
+                        for output in outputs:
+                            self._forward(stage, output)
+
+        try:
+            self._supervised(stage, loop)
+        finally:
+            with stage.lock:
+                stage.running_workers -= 1
+                last = stage.running_workers == 0
+            if last:
+                if stage.on_end is not None:
+                    try:
+                        stage.on_end(lambda output: self._forward(stage, output))
+                    except Exception as e:
+                        print(f"Error ending pipeline stage {stage.name}: {e}")
+                self._forward(stage, None)
+
+    def start(self) -> None:
+        """Start one thread per source and `workers` threads per stage."""
+        if self._started:
+            raise RuntimeError("Pipeline already started")
+        self._started = True
+        if self.watchdog is not None:
+            for stage in self.stages.values():
+                if stage.name not in self.watchdog.stages:
+                    self.watchdog.add_stage(stage.name, self.stall_after)
+                # A channel that stays full means its stage is the bottleneck; lossy channels are
+                # drained, blocking ones are lossless by choice and only raise the alarm
+                channel = stage.channel
+                if channel is not None:
+                    self.watchdog.add_queue(channel.name, channel.qsize, max(channel.maxsize - 1, 1),
+                                            on_backlog=(lambda name, c=channel: c.drain())
+                                            if channel.policy != "block" else None)
+        for stage in self.stages.values():
+            if stage.channel is None:
+                stage.threads = [threading.Thread(target=self._run_source, args=(stage,), name=stage.name,
+                                                  daemon=True)]
+            else:
+                stage.running_workers = stage.workers
+                stage.threads = [
+                    threading.Thread(target=self._run_worker, args=(stage,), daemon=True,
+                                     name=stage.name if stage.workers == 1 else f"{stage.name}-{i}")
+                    for i in range(stage.workers)
+                ]
+        for stage in self.stages.values():
+            for thread in stage.threads:
+                thread.start()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for all stages to finish.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait in total.
+
+        Returns:
+            bool: True if every stage finished.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for stage in self.stages.values():
+            for thread in stage.threads:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                thread.join(remaining)
+                if thread.is_alive():
+                    return False
+        return True
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop the sources and let the queued items flow through to the sinks.
+
+        Args:
+            timeout (float, optional): Seconds to wait before cancelling the remaining work.
+
+        Returns:
+            bool: True if the pipeline drained completely.
+        """
+        self._stopping.set()
+        if self.join(timeout):
+            return True
+        self.cancel()
+        return False
+
+    def cancel(self) -> None:
+        """Stop all stages as soon as possible, discarding queued items."""
+        self._stopping.set()
+        self._cancelled.set()
+
+    def unregister(self) -> None:
+        """Remove the stages and channels of this pipeline from the watchdog once it has stopped."""
+        if self.watchdog is not None:
+            self.watchdog.remove([*self.stages, *self.channels])
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Per-stage workers, processed item and error counts and input channel stats.
+        """
+        return {
+            name: {
+                "workers": stage.workers if stage.channel is not None else 1,
+                "alive_workers": sum(thread.is_alive() for thread in stage.threads),
+                "processed": stage.processed,
+                "errors": stage.errors,
+                "reorder_pending": len(stage.reorder),
+                "channel": stage.channel.get_stats() if stage.channel is not None else None
+            }
+            for name, stage in self.stages.items()
+        }
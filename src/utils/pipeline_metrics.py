@@ -0,0 +1,215 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency bucket upper bounds in seconds (0.5 ms to 1 s), shared by all stages
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+PIPELINE_STAGES: Tuple[str, ...] = ("capture", "preprocess", "inference", "postprocess", "tracking", "render", "encode")
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (Prometheus semantics: cumulative on export).
+
+    Recording is one bisect and three increments under a lock, cheap enough to
+    record every frame of every stage.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets (Sequence[float]): Sorted bucket upper bounds in seconds (+Inf is implicit).
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record one value.
+
+        Args:
+            value (float): Observed latency in seconds.
+        """
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """Returns:
+            Tuple[List[int], float, int]: Per-bucket (non-cumulative) counts, sum and count.
+        """
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile by linear interpolation within its bucket.
+
+        Args:
+            q (float): Quantile in [0, 1].
+
+        Returns:
+            float or None: Estimated value in seconds, or None without observations.
+        """
+        counts, _, total = self.snapshot()
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower  # +Inf bucket: report its lower bound
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class PipelineMetrics:
+    """
+    Per-stage latency histograms, throughput and drop counters, and queue depth gauges.
+
+    Counters are monotonic for the lifetime of the process (pipeline restarts keep
+    accumulating), as Prometheus expects. Gauges are read through callables when
+    exported, so queue depths cost nothing between scrapes.
+    """
+
+    def __init__(self, stages: Sequence[str] = PIPELINE_STAGES, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            stages (Sequence[str]): Names of the pipeline stages.
+            buckets (Sequence[float]): Latency bucket upper bounds in seconds.
+        """
+        self.stages = tuple(stages)
+        self.histograms: Dict[str, Histogram] = {stage: Histogram(buckets) for stage in self.stages}
+        self.frames: Dict[str, int] = {stage: 0 for stage in self.stages}
+        self.dropped: Dict[str, int] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Record the latency of one frame in a stage and count the frame.
+
+        Args:
+            stage (str): Stage name.
+            seconds (float): Time the frame spent in the stage.
+        """
+        self.histograms[stage].observe(seconds)
+        with self._lock:
+            self.frames[stage] += 1
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """Context manager recording the duration of its block for a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def drop(self, stage: str, n: int = 1) -> None:
+        """
+        Count frames dropped by a stage.
+
+        Args:
+            stage (str): Stage (or queue) that dropped the frames.
+            n (int): Number of dropped frames.
+        """
+        with self._lock:
+            self.dropped[stage] = self.dropped.get(stage, 0) + n
+
+    def set_gauge(self, name: str, fn: Optional[Callable[[], float]]) -> None:
+        """
+        Register (or remove, with fn=None) a gauge read when metrics are exported.
+
+        Args:
+            name (str): Gauge name, e.g. a queue name.
+            fn (Callable): Returns the current value.
+        """
+        with self._lock:
+            if fn is None:
+                self.gauges.pop(name, None)
+            else:
+                self.gauges[name] = fn
+
+    def _read_gauges(self) -> Dict[str, float]:
+        with self._lock:
+            gauges = dict(self.gauges)
+        values = {}
+        for name, fn in gauges.items():
+            try:
+                values[name] = float(fn())
+            except Exception:
+                continue
+        return values
+
+    def summary(self) -> dict:
+        """Returns:
+            dict: Per-stage frame counts and latency mean/p50/p95/p99 in ms, drops and queue depths.
+        """
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            _, total_seconds, count = histogram.snapshot()
+            stages[stage] = {
+                "frames": count,
+                "mean_ms": round(total_seconds / count * 1000.0, 3) if count else None,
+                **{
+                    f"p{int(q * 100)}_ms": None if value is None else round(value * 1000.0, 3)
+                    for q, value in ((q, histogram.quantile(q)) for q in (0.5, 0.95, 0.99))
+                }
+            }
+        with self._lock:
+            dropped = dict(self.dropped)
+        return {"stages": stages, "dropped": dropped, "queues": self._read_gauges()}
+
+    def render_prometheus(self, extra_gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """
+        Export all metrics in the Prometheus text exposition format.
+
+        Args:
+            extra_gauges (dict): Additional gauges as {name: (help text, value)}.
+
+        Returns:
+            str: Metrics text.
+        """
+        lines = [
+            "# HELP pipeline_stage_latency_seconds Time a frame spends in each pipeline stage.",
+            "# TYPE pipeline_stage_latency_seconds histogram"
+        ]
+        for stage, histogram in self.histograms.items():
+            counts, total_seconds, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'pipeline_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'pipeline_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'pipeline_stage_latency_seconds_sum{{stage="{stage}"}} {total_seconds}')
+            lines.append(f'pipeline_stage_latency_seconds_count{{stage="{stage}"}} {count}')
+
+        with self._lock:
+            frames = dict(self.frames)
+            dropped = dict(self.dropped)
+        lines += ["# HELP pipeline_frames_total Frames completed per pipeline stage.",
+                  "# TYPE pipeline_frames_total counter"]
+        lines += [f'pipeline_frames_total{{stage="{stage}"}} {n}' for stage, n in frames.items()]
+        lines += ["# HELP pipeline_frames_dropped_total Frames dropped per stage.",
+                  "# TYPE pipeline_frames_dropped_total counter"]
+        lines += [f'pipeline_frames_dropped_total{{stage="{stage}"}} {n}' for stage, n in dropped.items()]
+        lines += ["# HELP pipeline_queue_depth Items waiting in each pipeline queue.",
+                  "# TYPE pipeline_queue_depth gauge"]
+        lines += [f'pipeline_queue_depth{{queue="{name}"}} {value}' for name, value in self._read_gauges().items()]
+
+        for name, (help_text, value) in (extra_gauges or {}).items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,303 @@
+import itertools
+import multiprocessing
+import threading
+import time
+import traceback
+from typing import Any, Callable
+
+from utils.frame_ring import FrameRing
+
+
+class PipelineProcess:
+    """
+    Runs the detection pipeline in a child process, so it doesn't share a GIL with the web server.
+
+    The child is started with `target(conn, ring_name)` and serves requests sent over the
+    pipe (see `PipelineProcessLink`), pushing events back on it. Frames and their metadata
+    come through a FrameRing; a reader thread here hands the most recent slot to `on_frame`
+    (latest wins, so a busy web process skips frames instead of slowing the pipeline).
+    The child can announce further rings it created under a key (e.g. one per stream), which
+    get a reader of their own. The child is restarted with backoff if it exits unexpectedly.
+    """
+
+    def __init__(self, target: Callable, ring, on_frame: Callable, on_event: Callable[[dict], None],
+                 max_restarts: int = 5, backoff: float = 1.0):
+        """
+        Args:
+            target (Callable): Module-level entry point of the child, called with the pipe and the ring name.
+            ring (FrameRing): Ring created by this process; it is unlinked by `stop`.
+            on_frame (Callable): Called with the ring key (None for `ring`) and each RingFrame read from it.
+            on_event (Callable): Called with each event dict sent by the child.
+            max_restarts (int): Restarts allowed before the child is given up.
+            backoff (float): Seconds before the first restart, doubled for each further one.
+        """
+        self.target = target
+        self.ring = ring
+        self.on_frame = on_frame
+        self.on_event = on_event
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        # Spawn rather than fork: the web process already runs threads
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._stopping = threading.Event()
+        # Ring key -> (ring, stop event, reader thread)
+        self._readers = {}
+        self.restarts = 0
+        self.requests = 0
+        self.failed_requests = 0
+        self.events = 0
+
+    def start(self) -> None:
+        """Start the child process and the frame reader thread."""
+        self._spawn()
+        self._start_reader(None, self.ring)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask the child to stop, terminate it if it doesn't exit in time and remove the ring."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        with self._lock:
+            conn, process = self._conn, self._process
+            self._conn = None
+        if conn is not None:
+            try:
+                conn.send(("shutdown",))
+            except (OSError, ValueError):
+                pass
+        if process is not None:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+        for key in list(self._readers):
+            self.detach_ring(key)
+        self.ring.close()
+        self.ring.unlink()
+
+    def attach_ring(self, key: Any, name: str) -> None:
+        """
+        Read a ring created by the child, replacing the reader of an earlier ring under the same key.
+
+        Args:
+            key: Identifies the ring in `on_frame` calls.
+            name (str): Shared memory name of the ring.
+        """
+        self.detach_ring(key)
+        try:
+            # The child shares this process's resource tracker, which removes the ring if the child doesn't
+            ring = FrameRing.attach(name, untrack=False)
+        except (OSError, ValueError) as e:
+            print(f"Error attaching frame ring '{name}': {e}")
+            return
+        self._start_reader(key, ring)
+
+    def detach_ring(self, key: Any) -> None:
+        """Stop reading the ring under a key; the main ring is only closed by `stop`."""
+        with self._lock:
+            reader = self._readers.pop(key, None)
+        if reader is None:
+            return
+        ring, stopped, thread = reader
+        stopped.set()
+        thread.join(timeout=1.0)
+        if ring is not self.ring:
+            ring.close()
+
+    def call(self, payload: Any, timeout: float = 30.0) -> Any:
+        """
+        Send a request to the child and wait for its reply.
+
+        Args:
+            payload: Picklable request, passed to the child's handler.
+            timeout (float): Maximum seconds to wait for the reply.
+
+        Returns:
+            The handler's result.
+
+        Raises:
+            RuntimeError: If the child is not running or the handler raised.
+            TimeoutError: If no reply arrived in time.
+        """
+        waiter = [threading.Event(), False, None]
+        with self._lock:
+            if self._conn is None:
+                raise RuntimeError("Pipeline process is not running")
+            request_id = next(self._ids)
+            self._pending[request_id] = waiter
+            self.requests += 1
+            try:
+                self._conn.send(("request", request_id, payload))
+            except (OSError, ValueError) as e:
+                self._pending.pop(request_id, None)
+                raise RuntimeError(f"Pipeline process is not reachable: {e}")
+        if not waiter[0].wait(timeout):
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self.failed_requests += 1
+            raise TimeoutError(f"Pipeline process did not reply within {timeout} s")
+        _, ok, result = waiter
+        if not ok:
+            self.failed_requests += 1
+            raise RuntimeError(result)
+        return result
+
+    def get_stats(self) -> dict:
+        """Returns:
+            dict: Child pid and liveness, restart/request/event counts and the ring reader counters.
+        """
+        process = self._process
+        return {
+            "pid": process.pid if process is not None else None,
+            "alive": process is not None and process.is_alive(),
+            "restarts": self.restarts,
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "events": self.events,
+            "ring": self.ring.get_stats(),
+            "rings": {str(key): reader[0].get_stats() for key, reader in list(self._readers.items())
+                      if key is not None}
+        }
+
+    def _spawn(self) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=self.target, args=(child_conn, self.ring.name),
+                                        name="pipeline-process", daemon=True)
+        process.start()
+        child_conn.close()
+        with self._lock:
+            self._process, self._conn = process, parent_conn
+        threading.Thread(target=self._receive, args=(parent_conn,), name="pipeline-process-link", daemon=True).start()
+
+    def _receive(self, conn) -> None:
+        """Dispatch replies and events from the child; restart it when the pipe breaks."""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "response":
+                _, request_id, ok, result = message
+                with self._lock:
+                    waiter = self._pending.pop(request_id, None)
+                if waiter is not None:
+                    waiter[1], waiter[2] = ok, result
+                    waiter[0].set()
+            elif message[0] == "ring":
+                self.attach_ring(message[1], message[2])
+            elif message[0] == "event":
+                self.events += 1
+                try:
+                    self.on_event(message[1])
+                except Exception as e:
+                    print(f"Pipeline process event error: {e}")
+
+        # The child exited: fail the requests still waiting for it
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._conn is conn:
+                self._conn = None
+        for waiter in pending.values():
+            waiter[1], waiter[2] = False, "Pipeline process exited"
+            waiter[0].set()
+        conn.close()
+        if self._stopping.is_set():
+            return
+
+        process = self._process
+        exitcode = None
+        if process is not None:
+            process.join(1.0)
+            exitcode = process.exitcode
+        if self.restarts >= self.max_restarts:
+            print(f"Pipeline process exited with code {exitcode}, giving up after {self.restarts} restarts")
+            return
+        delay = self.backoff * (2 ** self.restarts)
+        self.restarts += 1
+        print(f"Pipeline process exited with code {exitcode}, restarting in {delay} s")
+        if not self._stopping.wait(delay):
+            self._spawn()
+
+    def _start_reader(self, key: Any, ring) -> None:
+        stopped = threading.Event()
+        name = "frame-ring-reader" if key is None else f"frame-ring-reader-{key}"
+        thread = threading.Thread(target=self._read_frames, args=(key, ring, stopped), name=name, daemon=True)
+        with self._lock:
+            self._readers[key] = (ring, stopped, thread)
+        thread.start()
+
+    def _read_frames(self, key: Any, ring, stopped: threading.Event) -> None:
+        last_seq = ring.latest_seq()
+        while not self._stopping.is_set() and not stopped.is_set():
+            try:
+                item = ring.wait(last_seq, timeout=0.5)
+                if item is None:
+                    continue
+                last_seq = item.seq
+                self.on_frame(key, item)
+            except Exception as e:
+                print(f"Frame ring reader error: {e}")
+                time.sleep(0.1)
+
+
+class PipelineProcessLink:
+    """
+    Child side of a PipelineProcess: serves requests and sends events to the parent.
+
+    Each request is handled on its own thread, so a long request (e.g. a profile) doesn't
+    hold up the others.
+    """
+
+    def __init__(self, conn):
+        """
+        Args:
+            conn (multiprocessing.connection.Connection): Child end of the pipe.
+        """
+        self.conn = conn
+        self._send_lock = threading.Lock()
+
+    def serve(self, handler: Callable[[Any], Any]) -> None:
+        """
+        Handle requests until the parent asks to shut down or goes away.
+
+        Args:
+            handler (Callable): Called with each request payload; its result is sent back.
+        """
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == "shutdown":
+                return
+            if message[0] == "request":
+                threading.Thread(target=self._handle, args=(handler, message[1], message[2]),
+                                 name="pipeline-process-request", daemon=True).start()
+
+    def _handle(self, handler: Callable[[Any], Any], request_id: int, payload: Any) -> None:
+        try:
+            reply = ("response", request_id, True, handler(payload))
+        except Exception as e:
+            traceback.print_exc()
+            reply = ("response", request_id, False, str(e))
+        self._send(reply)
+
+    def _send(self, message: tuple) -> None:
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except (OSError, ValueError) as e:
+                print(f"Pipeline process link error: {e}")
+
+    def publish_event(self, event: dict) -> None:
+        """Forward an event to the parent."""
+        self._send(("event", event))
+
+    def announce_ring(self, key: Any, name: str) -> None:
+        """Have the parent read a frame ring created by this process (see `PipelineProcess.attach_ring`)."""
+        self._send(("ring", key, name))
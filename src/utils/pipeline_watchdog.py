@@ -0,0 +1,324 @@
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+
+class StageHealth:
+    """
+    Heartbeat state of one pipeline stage.
+    """
+    __slots__ = ("name", "stall_after", "on_stall", "last_beat", "beats", "active",
+                 "stalled_since", "stalls", "errors", "restarts", "last_recovery")
+
+    def __init__(self, name: str, stall_after: float, on_stall: Optional[Callable[[str], None]]):
+        self.name = name
+        self.stall_after = stall_after
+        self.on_stall = on_stall
+        self.last_beat = time.monotonic()
+        self.beats = 0
+        self.active = False
+        self.stalled_since = None
+        self.stalls = 0
+        self.errors = 0
+        self.restarts = 0
+        self.last_recovery = 0.0
+
+
+class QueueHealth:
+    """
+    Depth history and alarm state of one pipeline queue.
+    """
+    __slots__ = ("name", "depth_fn", "max_depth", "on_backlog", "depths", "backlogged", "growing", "alarms")
+
+    def __init__(self, name: str, depth_fn: Callable[[], int], max_depth: int,
+                 on_backlog: Optional[Callable[[str], None]], sustain: int):
+        self.name = name
+        self.depth_fn = depth_fn
+        self.max_depth = max_depth
+        self.on_backlog = on_backlog
+        self.depths = deque(maxlen=sustain)
+        self.backlogged = False
+        self.growing = False
+        self.alarms = 0
+
+
+class PipelineWatchdog:
+    """
+    Watches stage heartbeats and queue depths, raises alarms and runs recovery actions.
+
+    Stages call `beat` once per loop iteration (two attribute stores, cheap enough for
+    every frame). A background thread checks every `check_interval` seconds:
+    an active stage without a heartbeat for its `stall_after` seconds is reported as
+    stalled and its recovery action is run (again at most once per `stall_after`); a
+    queue above its maximum depth for `sustain` consecutive checks is reported as a
+    backlog and its recovery action (usually draining) is run. Stage loops run through
+    `supervise`, which restarts them with backoff when they raise.
+
+    Events are kept in a bounded history and forwarded to the optional sinks.
+    """
+
+    def __init__(self, check_interval: float = 1.0, sustain: int = 3, max_events: int = 500,
+                 sinks: Sequence[Callable[[dict], None]] = ()):
+        """
+        Args:
+            check_interval (float): Seconds between watchdog checks.
+            sustain (int): Consecutive checks a queue must stay above its limit (or keep growing) to alarm.
+            max_events (int): Number of events kept in the history.
+            sinks (Sequence[Callable]): Called with every event dict.
+        """
+        self.check_interval = check_interval
+        self.sustain = sustain
+        self.sinks = list(sinks)
+        self.stages: Dict[str, StageHealth] = {}
+        self.queues: Dict[str, QueueHealth] = {}
+        self.events = deque(maxlen=max_events)
+        self._event_id = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the background checking thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background checking thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 1.0)
+            self._thread = None
+
+    def add_stage(self, name: str, stall_after: float = 5.0,
+                  on_stall: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Register a stage.
+
+        Args:
+            name (str): Stage name.
+            stall_after (float): Seconds without a heartbeat after which the stage is stalled.
+            on_stall (Callable, optional): Recovery action, called with the stage name.
+        """
+        with self._lock:
+            self.stages[name] = StageHealth(name, stall_after, on_stall)
+
+    def add_queue(self, name: str, depth_fn: Callable[[], int], max_depth: int,
+                  on_backlog: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Register a queue.
+
+        Args:
+            name (str): Queue name.
+            depth_fn (Callable): Returns the current number of queued items.
+            max_depth (int): Depth above which the queue is backlogged.
+            on_backlog (Callable, optional): Recovery action, called with the queue name.
+        """
+        with self._lock:
+            self.queues[name] = QueueHealth(name, depth_fn, max_depth, on_backlog, self.sustain)
+
+    def clear(self) -> None:
+        """Forget all stages and queues (the event history is kept), e.g. when the pipeline stops."""
+        with self._lock:
+            self.stages = {}
+            self.queues = {}
+
+    def remove(self, names: Iterable[str]) -> None:
+        """Forget the given stages and queues, e.g. when one of several pipelines stops."""
+        with self._lock:
+            for name in names:
+                self.stages.pop(name, None)
+                self.queues.pop(name, None)
+
+    def beat(self, name: str) -> None:
+        """
+        Record a heartbeat of a stage.
+
+        Args:
+            name (str): Stage name.
+        """
+        stage = self.stages.get(name)
+        if stage is not None:
+            stage.last_beat = time.monotonic()
+            stage.beats += 1
+
+    def supervise(self, name: str, loop: Callable[[], None], should_run: Callable[[], bool],
+                  max_restarts: int = 5, backoff: float = 1.0) -> bool:
+        """
+        Run a stage loop in the calling thread, restarting it when it raises.
+
+        The stage only counts as active (and can stall) while its loop runs.
+
+        Args:
+            name (str): Stage name.
+            loop (Callable): Stage loop; returning normally ends the stage.
+            should_run (Callable): Returns False once the pipeline is stopping.
+            max_restarts (int): Restarts allowed before the stage is given up.
+            backoff (float): Seconds before the first restart, doubled for each further one.
+
+        Returns:
+            bool: True if the loop ended normally, False if it was given up.
+        """
+        stage = self.stages.get(name)
+        restarts = 0
+        try:
+            while True:
+                if stage is not None:
+                    stage.active = True
+                    stage.last_beat = time.monotonic()
+                try:
+                    loop()
+                    return True
+                except Exception as e:
+                    traceback.print_exc()
+                    if stage is not None:
+                        stage.errors += 1
+                        stage.active = False
+                    if restarts >= max_restarts or not should_run():
+                        self.emit("stage_failed", stage=name, error=str(e), restarts=restarts)
+                        return False
+                    delay = backoff * (2 ** restarts)
+                    restarts += 1
+                    self.emit("stage_restarting", stage=name, error=str(e), attempt=restarts, delay_s=delay)
+                    if self._stop.wait(delay) or not should_run():
+                        return False
+                    if stage is not None:
+                        stage.restarts += 1
+        finally:
+            if stage is not None:
+                stage.active = False
+                stage.stalled_since = None
+
+    def emit(self, event_type: str, **fields) -> dict:
+        """
+        Record an event and forward it to the sinks.
+
+        Args:
+            event_type (str): Event type, e.g. "stage_stalled".
+            **fields: Event details.
+
+        Returns:
+            dict: The event.
+        """
+        with self._lock:
+            self._event_id += 1
+            event = {"id": self._event_id, "type": event_type, "timestamp": time.time(), **fields}
+            self.events.append(event)
+        print(f"Watchdog: {event_type} {fields}")
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"Watchdog event sink error: {e}")
+        return event
+
+    def _recover(self, action: Optional[Callable[[str], None]], name: str, kind: str) -> None:
+        if action is None:
+            return
+        try:
+            action(name)
+            self.emit("recovery", target=name, action=kind)
+        except Exception as e:
+            self.emit("recovery_failed", target=name, action=kind, error=str(e))
+
+    def check(self) -> None:
+        """Run one round of stall and backlog checks."""
+        now = time.monotonic()
+        with self._lock:
+            stages = list(self.stages.values())
+            queues = list(self.queues.values())
+
+        for stage in stages:
+            if not stage.active:
+                continue
+            silent = now - stage.last_beat
+            if silent > stage.stall_after:
+                if stage.stalled_since is None:
+                    stage.stalled_since = stage.last_beat
+                    stage.stalls += 1
+                    self.emit("stage_stalled", stage=stage.name, silent_s=round(silent, 3))
+                if now - stage.last_recovery >= stage.stall_after:
+                    stage.last_recovery = now
+                    self._recover(stage.on_stall, stage.name, "stall")
+            elif stage.stalled_since is not None:
+                self.emit("stage_recovered", stage=stage.name,
+                          stalled_s=round(stage.last_beat - stage.stalled_since, 3))
+                stage.stalled_since = None
+
+        for queue in queues:
+            try:
+                depth = int(queue.depth_fn())
+            except Exception:
+                continue
+            queue.depths.append(depth)
+            full = len(queue.depths) == queue.depths.maxlen
+            growing = full and depth > queue.max_depth // 2 and \
+                all(a < b for a, b in zip(queue.depths, list(queue.depths)[1:]))
+            if full and min(queue.depths) > queue.max_depth:
+                if not queue.backlogged:
+                    queue.backlogged = True
+                    queue.alarms += 1
+                    self.emit("queue_backlog", queue=queue.name, depth=depth, max_depth=queue.max_depth)
+                self._recover(queue.on_backlog, queue.name, "drain")
+            elif growing and not queue.growing:
+                self.emit("queue_growing", queue=queue.name, depths=list(queue.depths))
+            elif queue.backlogged and depth <= queue.max_depth:
+                queue.backlogged = False
+                self.emit("queue_recovered", queue=queue.name, depth=depth)
+            queue.growing = growing
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Watchdog check error: {e}")
+
+    def get_events(self, limit: int = 100, since: Optional[int] = None) -> List[dict]:
+        """
+        Get recent events, oldest first.
+
+        Args:
+            limit (int): Maximum number of events.
+            since (int, optional): Only events with a larger id.
+
+        Returns:
+            List[dict]: Events.
+        """
+        with self._lock:
+            events = [e for e in self.events if since is None or e["id"] > since]
+        return events[-limit:] if limit > 0 else []
+
+    def get_status(self) -> dict:
+        """Returns:
+            dict: Per-stage heartbeat age/stall/restart counts and per-queue depth/alarm state.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stages = list(self.stages.values())
+            queues = list(self.queues.values())
+        return {
+            "stages": {
+                s.name: {
+                    "active": s.active,
+                    "beats": s.beats,
+                    "heartbeat_age_s": round(now - s.last_beat, 3),
+                    "stalled": s.stalled_since is not None,
+                    "stalls": s.stalls,
+                    "errors": s.errors,
+                    "restarts": s.restarts
+                } for s in stages
+            },
+            "queues": {
+                q.name: {
+                    "depth": q.depths[-1] if q.depths else None,
+                    "max_depth": q.max_depth,
+                    "backlogged": q.backlogged,
+                    "alarms": q.alarms
+                } for q in queues
+            }
+        }
@@ -247,9 +247,12 @@ def get_labels(labels_path: str) -> list:
         return class_names
 
 
+# Fixed colour per ID, looked up instead of reseeding NumPy's global RNG on every call
+ID_COLOR_TABLE = np.random.default_rng(0).integers(0, 255, size=(256, 3), dtype=np.uint8)
+
+
 def id_to_color(idx):
-    np.random.seed(idx)
-    return np.random.randint(0, 255, size=3, dtype=np.uint8)
+    return ID_COLOR_TABLE[idx % len(ID_COLOR_TABLE)]
 
 
 